@@ -1,24 +1,39 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import pandas as pd
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, send_file,
+                   Response, stream_with_context)
 import os
-import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
-import io
+from student_store import StudentStore
+from student_reports import TASK_SIZE, ReportCache, ZipStats, iter_reports_zip, iter_rows, row_hash
+from student_storage import convert
+import click
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET', 'dev-secret')
 
 # CSV path - adjust if necessary
-CSV_PATH = r"C:\Users\yashv\BATCH82\MyPythonAssignment\student_cleaned.csv"
+CSV_PATH = os.environ.get('STUDENT_CSV_PATH', r"C:\Users\yashv\BATCH82\MyPythonAssignment\student_cleaned.csv")
+# data file actually served; point it at a .feather/.parquet file made with
+# `flask convert-students` to skip CSV parsing (CSV remains the default)
+DATA_PATH = os.environ.get('STUDENT_DATA_PATH', CSV_PATH)
+
+# optional SQL backend (e.g. sqlite:///students.db); load it with `flask import-students`
+DB_URL = os.environ.get('STUDENT_DB_URL')
+
+if DB_URL:
+    from student_db import SQLStudentStore
+    store = SQLStudentStore(DB_URL)
+else:
+    # parsed once per process, reloaded only when the file changes on disk
+    store = StudentStore(DATA_PATH)
+
+
+# rendered student reports, keyed by id + row hash; see student_reports.py
+reports = ReportCache(os.environ.get('STUDENT_REPORT_CACHE', os.path.join(app.instance_path, 'report_cache')))
 
 
 def load_students():
-    if not os.path.exists(CSV_PATH):
-        return pd.DataFrame()
-    df = pd.read_csv(CSV_PATH)
-    # normalize
-    df.columns = df.columns.str.strip().str.lower()
-    return df
+    """Already-normalized student DataFrame -- shared, do not modify in place."""
+    return store.frame()
 
 
 @app.route('/')
@@ -44,20 +59,18 @@ def login():
             flash('Admin logged in.', 'success')
             return redirect(url_for('students'))
 
-        df = load_students()
-        if df.empty:
+        if store.is_empty():
             flash('No student data found. Please register first.', 'warning')
             return redirect(url_for('register'))
 
         # match by email only for student login
-        email_col = next((c for c in df.columns if 'email' in c), None)
+        email_col = store.email_col
         if email_col is None:
             flash('Email column not found in CSV.', 'danger')
             return redirect(url_for('login'))
 
-        matched = df[df[email_col].astype(str).str.lower() == email]
-        if not matched.empty:
-            user = matched.iloc[0].to_dict()
+        user = store.find_by_email(email)
+        if user is not None:
             # verify stored password
             stored_pw = user.get('password')
             if not stored_pw:
@@ -67,7 +80,7 @@ def login():
                 flash('Invalid password.', 'danger')
                 return redirect(url_for('login'))
 
-            id_col = next((c for c in df.columns if c == 'id' or 'id' in c), None)
+            id_col = store.id_col
             session['user'] = {
                 'email': user.get(email_col),
                 'id': str(user.get(id_col)) if id_col else '',
@@ -93,50 +106,24 @@ def register():
             flash('All fields are required.', 'danger')
             return redirect(url_for('register'))
 
-        df = load_students()
-        # Ensure columns exist
-        if df.empty:
-            df = pd.DataFrame(columns=['name', 'email', 'id'])
-        else:
-            df.columns = df.columns.str.strip().str.lower()
-
-        email_col = next((c for c in df.columns if 'email' in c), 'email')
-        id_col = next((c for c in df.columns if c == 'id' or 'id' in c), 'id')
-
-        # check duplicate email
-        if not df.empty and (df[email_col].astype(str).str.lower() == email).any():
-            flash('Email already registered.', 'danger')
-            return redirect(url_for('register'))
-
-        # generate a new id: try numeric increment, otherwise use uuid
-        if id_col in df.columns and not df.empty:
-            try:
-                max_id = pd.to_numeric(df[id_col], errors='coerce').dropna().astype(int).max()
-                new_id = str(int(max_id) + 1) if pd.notna(max_id) else '1'
-            except Exception:
-                new_id = uuid.uuid4().hex[:8]
-        else:
-            new_id = uuid.uuid4().hex[:8]
+        email_col = store.email_col or 'email'
 
         # store hashed password
         pw_hash = generate_password_hash(password)
 
-        # append the new user
-        new_row = {email_col: email, id_col: new_id, 'name': name, 'password': pw_hash}
-        new_df = pd.DataFrame([new_row])
-        # ensure new_df columns align with df
-        for c in df.columns:
-            if c not in new_df.columns:
-                new_df[c] = None
-        new_df = new_df[df.columns.tolist()]
-        df = pd.concat([df, new_df], ignore_index=True)
+        # append the new user; the duplicate check and the id from the store's
+        # cached counter happen under the same file lock as the write
+        new_row = {email_col: email, 'name': name, 'password': pw_hash}
         try:
-            df.to_csv(CSV_PATH, index=False)
-            flash('Account created. You can now log in.', 'success')
-            return redirect(url_for('login'))
+            created = store.append(new_row, email=email)
         except Exception as e:
             flash('Failed to save user: ' + str(e), 'danger')
             return redirect(url_for('register'))
+        if created is None:
+            flash('Email already registered.', 'danger')
+            return redirect(url_for('register'))
+        flash('Account created. You can now log in.', 'success')
+        return redirect(url_for('login'))
 
     return render_template('register.html')
 
@@ -158,19 +145,9 @@ def login_required(fn):
 @login_required
 def dashboard():
     user = session.get('user')
-    df = load_students()
     # show only the logged-in user's row
     email = user.get('email')
-    if df.empty:
-        student = None
-    else:
-        df.columns = df.columns.str.strip().str.lower()
-        email_col = next((c for c in df.columns if 'email' in c), None)
-        if email_col:
-            matched = df[df[email_col].astype(str).str.lower() == str(email).lower()]
-            student = matched.to_dict(orient='records')[0] if not matched.empty else None
-        else:
-            student = None
+    student = store.find_by_email(email)
 
     return render_template('dashboard.html', user=user, student=student)
 
@@ -183,16 +160,9 @@ def students():
     if df.empty:
         records = []
     else:
-        # normalize columns
-        df.columns = df.columns.str.strip().str.lower()
         if q:
-            # build mask across all non-password columns
-            mask = pd.Series([False] * len(df))
-            for col in df.columns:
-                if col == 'password':
-                    continue
-                mask = mask | df[col].astype(str).str.lower().str.contains(q, na=False)
-            df = df[mask]
+            # one pass over the precomputed search column
+            df = store.search(q)
         records = df.to_dict(orient='records')
 
     return render_template('students.html', students=records, q=q)
@@ -206,31 +176,27 @@ def edit_student(student_id):
         flash('Admin access required.', 'danger')
         return redirect(url_for('students'))
 
-    df = load_students()
-    if df.empty:
+    if store.is_empty():
         flash('No student data found.', 'danger')
         return redirect(url_for('students'))
 
-    df.columns = df.columns.str.strip().str.lower()
-    id_col = next((c for c in df.columns if c == 'id' or 'id' in c), None)
+    id_col = store.id_col
     if not id_col:
         flash('ID column not found.', 'danger')
         return redirect(url_for('students'))
 
-    matched = df[df[id_col].astype(str) == str(student_id)]
-    if matched.empty:
+    student = store.find_by_id(student_id)
+    if student is None:
         flash('Student not found.', 'danger')
         return redirect(url_for('students'))
 
-    student = matched.iloc[0].to_dict()
-
     # prepare columns for rendering (preserve CSV column order)
-    columns = list(df.columns)
+    columns = store.columns
     id_col = id_col
 
     if request.method == 'POST':
-        # update all columns from form
-        idx = matched.index[0]
+        # collect all columns from form, then apply them in one write
+        changes = {}
         for col in columns:
             if col == id_col:
                 continue
@@ -240,13 +206,16 @@ def edit_student(student_id):
             val = val.strip()
             if col == 'password':
                 if val:
-                    df.at[idx, col] = generate_password_hash(val)
+                    changes[col] = generate_password_hash(val)
                 # if empty, keep existing
             else:
-                df.at[idx, col] = val
+                changes[col] = val
 
         try:
-            df.to_csv(CSV_PATH, index=False)
+            if not store.update(student_id, changes):
+                flash('Student not found.', 'danger')
+                return redirect(url_for('students'))
+            reports.invalidate(student_id)
             flash('Student updated.', 'success')
             return redirect(url_for('students'))
         except Exception as e:
@@ -261,65 +230,67 @@ def edit_student(student_id):
 def download_student_pdf(student_id):
     # permission: admin or the same user
     user = session.get('user')
-    df = load_students()
-    if df.empty:
+    if store.is_empty():
         flash('No student data available.', 'danger')
         return redirect(url_for('students'))
 
-    df.columns = df.columns.str.strip().str.lower()
-    id_col = next((c for c in df.columns if c == 'id' or 'id' in c), None)
-    email_col = next((c for c in df.columns if 'email' in c), None)
+    id_col = store.id_col
+    email_col = store.email_col
     if not id_col:
         flash('ID column not found.', 'danger')
         return redirect(url_for('students'))
 
-    matched = df[df[id_col].astype(str) == str(student_id)]
-    if matched.empty:
+    student = store.find_by_id(student_id)
+    if student is None:
         flash('Student not found.', 'danger')
         return redirect(url_for('students'))
 
-    student = matched.iloc[0].to_dict()
-
     # check permission
     if not (user.get('is_admin') or (email_col and user.get('email') and str(student.get(email_col)).lower() == str(user.get('email')).lower())):
         flash('You do not have permission to download this student PDF.', 'danger')
         return redirect(url_for('students'))
 
-    # generate PDF using reportlab (import inside to avoid startup errors)
+    # the ETag is the row hash: a browser that has this version gets a 304
+    # without the PDF being read or rendered
+    digest = row_hash(student)
+    if request.if_none_match.contains(digest):
+        return app.response_class(status=304, headers={'ETag': f'"{digest}"'})
+
     try:
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import A4
-    except Exception:
-        flash('reportlab is required to generate PDFs. Install it: pip install reportlab', 'danger')
+        path, digest = reports.get(student, student_id, email_col)
+    except RuntimeError as e:
+        flash(str(e), 'danger')
         return redirect(url_for('students'))
 
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    x = 50
-    y = height - 50
-    c.setFont('Helvetica-Bold', 16)
-    c.drawString(x, y, f"Student Report: {student.get('name') or student.get(email_col) or student_id}")
-    y -= 30
-    c.setFont('Helvetica', 12)
-    for k, v in student.items():
-        if k == 'password':
-            continue
-        text = f"{k.capitalize()}: {v}"
-        c.drawString(x, y, text)
-        y -= 18
-        if y < 50:
-            c.showPage()
-            y = height - 50
-            c.setFont('Helvetica', 12)
-
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return (buffer.getvalue(), 200, {
-        'Content-Type': 'application/pdf',
-        'Content-Disposition': f'attachment; filename=student_{student_id}.pdf'
-    })
+    resp = send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'student_{student_id}.pdf', etag=digest, conditional=True)
+    # personal data that changes on edit: browsers keep it but must revalidate
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+@app.route('/students/reports.zip')
+@login_required
+def download_all_reports():
+    if not session.get('user').get('is_admin'):
+        flash('Admin access required.', 'danger')
+        return redirect(url_for('students'))
+    df = load_students()
+    if df.empty or not store.id_col:
+        flash('No student data available.', 'danger')
+        return redirect(url_for('students'))
+
+    stats = ZipStats()
+
+    def generate():
+        yield from iter_reports_zip(iter_rows(df), store.id_col, store.email_col,
+                                    reports.cache_dir, stats=stats)
+        app.logger.info('reports.zip: %d reports in %.1fs (%.0f reports/s)',
+                        stats.reports, stats.elapsed, stats.rate)
+
+    return Response(stream_with_context(generate()), mimetype='application/zip',
+                    headers={'Content-Disposition': 'attachment; filename=student_reports.zip'})
 
 
 @app.route('/logout/')
@@ -329,5 +300,81 @@ def logout():
     return redirect(url_for('login'))
 
 
+@app.cli.command('warm-reports')
+def warm_reports():
+    """Pre-render the PDF report of every student into the report cache."""
+    df = load_students()
+    id_col, email_col = store.id_col, store.email_col
+    if df.empty or not id_col:
+        print('No student data.')
+        return
+    rendered = 0
+    for student in df.to_dict(orient='records'):
+        path = reports.path_for(student[id_col], row_hash(student))
+        if not os.path.exists(path):
+            reports.get(student, student[id_col], email_col)
+            rendered += 1
+    print(f'{rendered} report(s) rendered, {len(df) - rendered} already cached in {reports.cache_dir}.')
+
+
+@app.cli.command('export-reports')
+@click.argument('dest')
+@click.option('--workers', type=int, default=None, help='Render processes (default: one per CPU core).')
+def export_reports(dest, workers):
+    """Write every student's PDF report into a ZIP file."""
+    df = load_students()
+    if df.empty or not store.id_col:
+        print('No student data.')
+        return
+    total = len(df)
+
+    def progress(stats):
+        if stats.reports % 1000 < TASK_SIZE or stats.reports == total:
+            print(f'  {stats.reports}/{total} reports ({stats.rate:.0f} reports/s)')
+
+    stats = ZipStats()
+    with open(dest, 'wb') as f:
+        for chunk in iter_reports_zip(iter_rows(df), store.id_col, store.email_col,
+                                      reports.cache_dir, workers=workers, stats=stats, progress=progress):
+            f.write(chunk)
+    print(f'Wrote {stats.reports} reports ({stats.bytes / 1e6:.1f} MB) to {dest} '
+          f'in {stats.elapsed:.1f}s: {stats.rate:.0f} reports/s.')
+
+
+@app.cli.command('compact-students')
+def compact_students():
+    """Rewrite the student CSV in one pass (run periodically, e.g. from cron)."""
+    rows = store.compact()
+    print(f'Compacted {DATA_PATH}: {rows} rows')
+
+
+@app.cli.command('convert-students')
+@click.argument('dest')
+@click.option('--src', default=CSV_PATH, show_default=True, help='Existing data file to convert.')
+def convert_students(dest, src):
+    """Convert the student data to another format, e.g. students.feather."""
+    rows = convert(src, dest)
+    print(f'Wrote {rows} rows to {dest}. Set STUDENT_DATA_PATH={dest} to use it.')
+
+
+@app.cli.command('import-students')
+@click.option('--src', default=CSV_PATH, show_default=True, help='CSV file to load.')
+def import_students(src):
+    """(Re)build the STUDENT_DB_URL table from a CSV file."""
+    if not DB_URL:
+        raise click.UsageError('Set STUDENT_DB_URL first, e.g. sqlite:///students.db')
+    from student_db import import_csv
+    imported, skipped = import_csv(store, src)
+    print(f'Imported {imported} students ({skipped} duplicate id/email rows skipped).')
+
+
+@app.cli.command('export-students')
+@click.argument('dest')
+def export_students(dest):
+    """Write the current student data to a CSV file."""
+    store.frame().to_csv(dest, index=False)
+    print(f'Exported students to {dest}.')
+
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,70 @@
+"""Throughput of the parallel "all reports" ZIP (student_reports.iter_reports_zip).
+
+Renders N synthetic students into a ZIP with 1..cores render processes,
+starting from an empty report cache each time, then once more with the
+cache warm.
+
+Usage:
+    python scripts/bench_reports_zip.py [--students 10000] [--workers 1 2 4]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+import pandas as pd
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from student_reports import ZipStats, iter_reports_zip, iter_rows
+
+
+def make_frame(n):
+    return pd.DataFrame({
+        'id': [str(i) for i in range(1, n + 1)],
+        'name': [f'Student {i}' for i in range(n)],
+        'email': [f'student{i}@example.com' for i in range(n)],
+        'city': ['Delhi', 'Mumbai', 'Pune', 'Chennai'] * (n // 4) + ['Delhi'] * (n % 4),
+        'score': [str(i % 100) for i in range(n)],
+    })
+
+
+def run(df, cache_dir, workers, out_path):
+    stats = ZipStats()
+    with open(out_path, 'wb') as f:
+        for chunk in iter_reports_zip(iter_rows(df), 'id', 'email', cache_dir, workers=workers, stats=stats):
+            f.write(chunk)
+    with zipfile.ZipFile(out_path) as zf:
+        assert len(zf.namelist()) == len(df)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='*',
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    df = make_frame(args.students)
+    tmp = tempfile.mkdtemp()
+    out = os.path.join(tmp, 'reports.zip')
+    print(f'{args.students} students, {os.cpu_count()} CPU core(s)')
+    try:
+        for workers in args.workers:
+            cache_dir = os.path.join(tmp, f'cache{workers}')
+            stats = run(df, cache_dir, workers, out)
+            print(f'  cold cache, {workers} worker(s): {stats.elapsed:6.1f}s  {stats.rate:7.0f} reports/s  '
+                  f'{stats.bytes / 1e6:.1f} MB')
+        stats = run(df, cache_dir, workers, out)
+        print(f'  warm cache, {workers} worker(s): {stats.elapsed:6.1f}s  {stats.rate:7.0f} reports/s')
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
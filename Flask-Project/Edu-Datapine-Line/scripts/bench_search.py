@@ -0,0 +1,71 @@
+"""Benchmark /students search: old per-column loop vs the precomputed search column.
+
+Usage:
+    python scripts/bench_search.py [rows ...]      (default: 10000 100000 1000000)
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from student_store import build_search_text
+
+QUERIES = ['student42', '@example.com', 'zzz-no-match', 'delhi']
+
+
+def make_frame(n):
+    rng = np.random.default_rng(0)
+    cities = np.array(['delhi', 'mumbai', 'pune', 'chennai', 'kolkata'])
+    return pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'name': [f'Student{i}' for i in range(n)],
+        'email': [f'student{i}@example.com' for i in range(n)],
+        'city': cities[rng.integers(0, len(cities), n)],
+        'score': rng.integers(0, 100, n),
+        'password': 'pbkdf2:sha256:hash',
+    })
+
+
+def old_search(df, q):
+    mask = pd.Series([False] * len(df))
+    for col in df.columns:
+        if col == 'password':
+            continue
+        mask = mask | df[col].astype(str).str.lower().str.contains(q, na=False)
+    return df[mask]
+
+
+def new_search(df, text, q):
+    return df[text.str.contains(q, regex=False).values]
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(sizes):
+    print(f"{'rows':>9} {'query':>14} {'loop ms':>9} {'column ms':>10} {'speedup':>8}")
+    for n in sizes:
+        df = make_frame(n)
+        build, text = best_of(lambda: build_search_text(df), repeat=1)
+        print(f"{n:>9} {'(build once)':>14} {'':>9} {build * 1000:>10.1f}")
+        for q in QUERIES:
+            old_t, old_rows = best_of(lambda: old_search(df, q))
+            new_t, new_rows = best_of(lambda: new_search(df, text, q))
+            assert len(old_rows) == len(new_rows), (q, len(old_rows), len(new_rows))
+            print(f"{n:>9} {q:>14} {old_t * 1000:>9.1f} {new_t * 1000:>10.1f} {old_t / new_t:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
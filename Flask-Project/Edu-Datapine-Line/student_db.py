@@ -0,0 +1,205 @@
+"""Optional SQL backend for the student data (SQLAlchemy; SQLite by default).
+
+Enabled by setting ``STUDENT_DB_URL``, e.g. ``sqlite:///students.db``.  It
+exposes the same methods as ``student_store.StudentStore`` so the routes do
+not care which one they talk to, but every write is a single transaction and
+lookups go through indexes:
+
+* a unique index on the id column (plus one on ``CAST(id AS INTEGER)`` so
+  allocating the next id is an index lookup),
+* a unique index on ``lower(email)``.
+
+The table is created from the CSV's columns by ``import_csv`` (``flask
+import-students``); all values are stored as text, like the CSV.
+``flask export-students`` writes it back out.
+"""
+import warnings
+
+import pandas as pd
+from sqlalchemy import (Column, Index, Integer, MetaData, Table, Text, cast, create_engine,
+                        func, inspect, select, text)
+from sqlalchemy.exc import IntegrityError, SAWarning
+
+from student_store import HIDDEN_COLUMNS
+
+TABLE = 'students'
+_FIELD_SEP = '\x1f'
+
+
+class SQLStudentStore:
+    def __init__(self, url):
+        self.engine = create_engine(url)
+        self._table = None
+
+    @property
+    def table(self):
+        """Reflected students table, or None before the first import."""
+        if self._table is None and inspect(self.engine).has_table(TABLE):
+            with warnings.catch_warnings():
+                # the lower(email)/CAST(id) expression indexes cannot be reflected; not needed here
+                warnings.filterwarnings('ignore', 'Skipped unsupported reflection', SAWarning)
+                self._table = Table(TABLE, MetaData(), autoload_with=self.engine)
+        return self._table
+
+    @property
+    def columns(self):
+        return [c.name for c in self.table.columns] if self.table is not None else []
+
+    @property
+    def email_col(self):
+        return next((c for c in self.columns if 'email' in c), None)
+
+    @property
+    def id_col(self):
+        return next((c for c in self.columns if c == 'id' or 'id' in c), None)
+
+    def _col(self, name):
+        return self.table.c[name]
+
+    def is_empty(self):
+        if self.table is None:
+            return True
+        with self.engine.connect() as conn:
+            return conn.execute(select(1).select_from(self.table).limit(1)).first() is None
+
+    def frame(self):
+        if self.table is None:
+            return pd.DataFrame()
+        with self.engine.connect() as conn:
+            return pd.read_sql(select(self.table), conn)
+
+    def invalidate(self):
+        self._table = None
+
+    def _one(self, where):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(self.table).where(where).limit(1)).mappings().first()
+        return dict(row) if row is not None else None
+
+    def find_by_email(self, email):
+        col = self.email_col
+        if col is None:
+            return None
+        return self._one(func.lower(self._col(col)) == str(email).strip().lower())
+
+    def find_by_id(self, student_id):
+        col = self.id_col
+        if col is None:
+            return None
+        return self._one(self._col(col) == str(student_id).strip())
+
+    def search(self, q):
+        """Same semantics as StudentStore.search, evaluated inside SQLite."""
+        q = str(q).lower()
+        if not q or self.table is None:
+            return self.frame()
+        cols = [self._col(c) for c in self.columns if c not in HIDDEN_COLUMNS]
+        haystack = func.coalesce(cols[0], '')
+        for col in cols[1:]:
+            haystack = haystack.op('||')(_FIELD_SEP).op('||')(func.coalesce(col, ''))
+        stmt = select(self.table).where(func.instr(func.lower(haystack), q) > 0)
+        with self.engine.connect() as conn:
+            return pd.read_sql(stmt, conn)
+
+    def _add_columns(self, names):
+        with self.engine.begin() as conn:
+            for name in names:
+                conn.execute(text(f'ALTER TABLE {TABLE} ADD COLUMN "{name}" TEXT'))
+        self.invalidate()
+
+    def append(self, row, email=None):
+        """Insert one student; returns None if the email is already taken."""
+        if self.table is None:
+            raise RuntimeError('students table missing; run "flask import-students" first')
+        id_col = self.id_col or 'id'
+        row = {k: (None if v is None else str(v)) for k, v in row.items()}
+        missing = [k for k in row if k not in self.columns]
+        if missing:
+            self._add_columns(missing)
+        for _ in range(3):
+            if email is not None and self.find_by_email(email) is not None:
+                return None
+            try:
+                with self.engine.begin() as conn:
+                    new_row = dict(row)
+                    if not new_row.get(id_col):
+                        next_id = conn.execute(
+                            select(func.coalesce(func.max(cast(self._col(id_col), Integer)), 0) + 1)
+                        ).scalar()
+                        new_row[id_col] = str(next_id)
+                    conn.execute(self.table.insert().values(**new_row))
+                return new_row
+            except IntegrityError:
+                # lost a race for the id or the email; re-check and retry
+                continue
+        return None
+
+    def update(self, student_id, changes):
+        """Update one student in a single transaction; False if not found.
+
+        Raises ValueError if the change would duplicate another student's email.
+        """
+        changes = {k: v for k, v in changes.items() if k in self.columns}
+        try:
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    self.table.update().where(self._col(self.id_col) == str(student_id).strip()).values(**changes)
+                )
+        except IntegrityError:
+            raise ValueError('that email is already used by another student')
+        return result.rowcount == 1
+
+    def save(self, df):
+        """Replace all rows with ``df`` (one transaction)."""
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete())
+            _insert_frame(conn, self.table, df)
+
+    def compact(self):
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('VACUUM'))
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self.table)).scalar()
+
+
+def _insert_frame(conn, table, df):
+    names = [c.name for c in table.columns]
+    records = [{k: (None if pd.isna(v) else str(v)) for k, v in rec.items() if k in names}
+               for rec in df.to_dict(orient='records')]
+    if records:
+        conn.execute(table.insert(), records)
+
+
+def import_csv(store, path):
+    """(Re)create the students table from a CSV; returns (imported, skipped).
+
+    Rows whose id or email repeats an earlier row are skipped, matching the
+    file store where the first occurrence wins; blank ids/emails are kept.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip().str.lower()
+    email_col = next((c for c in df.columns if 'email' in c), None)
+    id_col = next((c for c in df.columns if c == 'id' or 'id' in c), None)
+    total = len(df)
+    # blank keys are stored as NULL and never collide, so they are not duplicates
+    if email_col:
+        key = df[email_col].str.strip().str.lower()
+        df = df[~(key.duplicated(keep='first') & key.ne(''))]
+    if id_col:
+        key = df[id_col].str.strip()
+        df = df[~(key.duplicated(keep='first') & key.ne(''))]
+
+    metadata = MetaData()
+    table = Table(TABLE, metadata, *[Column(c, Text) for c in df.columns])
+    if id_col:
+        Index('ix_students_id', table.c[id_col], unique=True)
+        Index('ix_students_id_num', cast(table.c[id_col], Integer))
+    if email_col:
+        Index('ix_students_email', func.lower(table.c[email_col]), unique=True)
+    with store.engine.begin() as conn:
+        table.drop(conn, checkfirst=True)
+        metadata.create_all(conn)
+        _insert_frame(conn, table, df.mask(df == ''))
+    store.invalidate()
+    return len(df), total - len(df)
+
@@ -0,0 +1,223 @@
+"""Student PDF reports, rendered once and cached on disk.
+
+A report only depends on the student's row, so the cache key is the student
+id plus a hash of the row (``row_hash``): an edited row simply misses the
+cache, and ``edit_student`` also calls ``ReportCache.invalidate`` so the old
+file does not linger.  The row hash doubles as the HTTP ETag, which lets the
+download route answer ``If-None-Match`` with 304 without opening the file.
+
+Files live in ``STUDENT_REPORT_CACHE`` (default ``instance/report_cache``)
+as ``<id hash>-<row hash>.pdf``; ``flask warm-reports`` pre-renders all of them.
+Bump ``RENDER_VERSION`` when the layout below changes.
+
+``iter_reports_zip`` builds the "all reports" ZIP: reports are rendered on a
+process pool (one process per core by default) and each one is written into
+the ZIP stream as soon as it is ready, with only a small window of reports
+in flight, so memory stays flat however many students there are.
+"""
+import glob
+import hashlib
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from student_store import HIDDEN_COLUMNS
+
+RENDER_VERSION = '1'
+TASK_SIZE = 25  # reports per pool task
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+
+def row_hash(student):
+    """Stable hash of the fields that appear in the report."""
+    fields = sorted((str(k), _text(v)) for k, v in student.items() if k not in HIDDEN_COLUMNS)
+    raw = json.dumps([RENDER_VERSION, fields], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def render_report(student, student_id, email_col=None):
+    """Render one student's report with ReportLab; returns the PDF bytes."""
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import A4
+    except ImportError:
+        raise RuntimeError('reportlab is required to generate PDFs. Install it: pip install reportlab')
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    x = 50
+    y = height - 50
+    c.setFont('Helvetica-Bold', 16)
+    title = student.get('name') or (student.get(email_col) if email_col else None) or student_id
+    c.drawString(x, y, f"Student Report: {_text(title)}")
+    y -= 30
+    c.setFont('Helvetica', 12)
+    for k, v in student.items():
+        if k in HIDDEN_COLUMNS:
+            continue
+        c.drawString(x, y, f"{str(k).capitalize()}: {_text(v)}")
+        y -= 18
+        if y < 50:
+            c.showPage()
+            y = height - 50
+            c.setFont('Helvetica', 12)
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+class ReportCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def _id_key(student_id):
+        return hashlib.sha256(str(student_id).strip().encode('utf-8')).hexdigest()[:16]
+
+    def path_for(self, student_id, digest):
+        return os.path.join(self.cache_dir, f'{self._id_key(student_id)}-{digest}.pdf')
+
+    def get(self, student, student_id, email_col=None):
+        """Return ``(path, digest)`` for the report, rendering it on a miss."""
+        digest = row_hash(student)
+        path = self.path_for(student_id, digest)
+        if not os.path.exists(path):
+            self.store(path, render_report(student, student_id, email_col))
+        return path, digest
+
+    def store(self, path, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # concurrent renders of the same report both produce the same bytes
+        os.replace(tmp, path)
+
+    def invalidate(self, student_id):
+        """Delete every cached report of ``student_id``; returns how many."""
+        paths = glob.glob(os.path.join(self.cache_dir, f'{self._id_key(student_id)}-*.pdf'))
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(paths)
+
+
+def render_batch(cache_dir, batch, email_col=None):
+    """Pool task: ``[(student_id, pdf bytes)]`` for ``[(student_id, student)]``.
+
+    Reports come from the cache or are rendered into it.  Tasks carry a batch
+    of students because a single report renders in a few milliseconds, about
+    what shipping one task to a worker process costs.
+    """
+    cache = ReportCache(cache_dir)
+    out = []
+    for student_id, student in batch:
+        path, _ = cache.get(student, student_id, email_col)
+        with open(path, 'rb') as f:
+            out.append((student_id, f.read()))
+    return out
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only stream ZipFile writes into; drained after every entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStats:
+    def __init__(self):
+        self.reports = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.reports / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def iter_rows(df):
+    """Row dicts of ``df`` one at a time (``to_dict('records')`` builds them all)."""
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(columns, values))
+
+
+def _zip_name(student_id):
+    return 'student_' + re.sub(r'[^A-Za-z0-9_.-]', '_', str(student_id).strip()) + '.pdf'
+
+
+def iter_reports_zip(students, id_col, email_col, cache_dir, workers=None, stats=None, progress=None):
+    """Yield a ZIP of every student's report in chunks.
+
+    ``students`` is an iterable of row dicts.  Batches of ``TASK_SIZE``
+    reports come back from the pool in completion order, with at most
+    ``4 * workers`` batches rendered ahead of the ZIP writer.
+    ``progress(stats)`` is called after every batch.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else ZipStats()
+    sink = _ZipSink()
+    window = 4 * workers
+    # spawn: safe even when the caller is a multi-threaded web server
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool, \
+            zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        pending = set()
+        rows = iter(students)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                batch = [(s[id_col], s) for s in itertools.islice(rows, TASK_SIZE)]
+                if not batch:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(render_batch, cache_dir, batch, email_col))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for student_id, data in future.result():
+                    zf.writestr(_zip_name(student_id), data)
+                stats.reports += len(future.result())
+                chunk = sink.drain()
+                stats.bytes += len(chunk)
+                yield chunk
+                if progress is not None:
+                    progress(stats)
+    # central directory, written on close
+    chunk = sink.drain()
+    stats.bytes += len(chunk)
+    yield chunk
@@ -0,0 +1,91 @@
+"""File formats the student dataset can be stored in.
+
+CSV stays the default.  Feather (Arrow IPC) and Parquet are columnar and
+avoid text parsing entirely; both are read with ``memory_map=True`` so the OS
+pages the file in instead of copying it through Python.  They need
+``pyarrow`` (``pip install pyarrow``), which is only imported when used.
+
+The backend is picked from the data file's extension:
+``.csv`` -> csv, ``.feather`` / ``.arrow`` -> feather, ``.parquet`` -> parquet.
+"""
+import os
+
+import pandas as pd
+
+
+class CSVBackend:
+    name = 'csv'
+    # rows can be appended to the data file itself
+    appendable = True
+
+    def read(self, path):
+        return pd.read_csv(path)
+
+    def write(self, df, path):
+        df.to_csv(path, index=False)
+
+
+class FeatherBackend:
+    name = 'feather'
+    appendable = False
+
+    def read(self, path):
+        from pyarrow import feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def write(self, df, path):
+        from pyarrow import feather
+        feather.write_feather(_arrow_safe(df), path)
+
+
+class ParquetBackend:
+    name = 'parquet'
+    appendable = False
+
+    def read(self, path):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True).to_pandas()
+
+    def write(self, df, path):
+        import pyarrow.parquet as pq
+        import pyarrow as pa
+        pq.write_table(pa.Table.from_pandas(_arrow_safe(df), preserve_index=False), path)
+
+
+def _arrow_safe(df):
+    """Arrow needs one type per column; object columns mixing ints and
+    strings (e.g. ids after appends) are stored as strings."""
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda v: v if v is None or isinstance(v, str) or v != v else str(v))
+    return df
+
+
+BACKENDS = {
+    '.csv': CSVBackend,
+    '.feather': FeatherBackend,
+    '.arrow': FeatherBackend,
+    '.parquet': ParquetBackend,
+}
+
+
+def backend_for(path):
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        return BACKENDS[ext]()
+    except KeyError:
+        raise ValueError(f'Unsupported student data format: {path!r} '
+                         f'(expected one of {", ".join(sorted(BACKENDS))})')
+
+
+def convert(src, dest):
+    """One-shot conversion between formats, e.g. the existing CSV to Feather.
+
+    Column names are normalized the same way the app does on load.
+    Returns the number of rows written.
+    """
+    df = backend_for(src).read(src)
+    df.columns = df.columns.str.strip().str.lower()
+    backend_for(dest).write(df, dest)
+    return len(df)
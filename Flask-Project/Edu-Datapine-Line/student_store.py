@@ -0,0 +1,412 @@
+"""Process-wide cache of the student dataset.
+
+The data file (CSV by default, see ``student_storage``) is parsed once and
+kept in memory; every access only does an ``os.stat`` and reloads when the
+file changed (another worker or an external tool rewrote it).  Callers get the shared DataFrame and must treat it as
+read-only -- take ``.copy()`` before modifying and write back with ``save()``.
+
+Each load also resolves the email/id columns and builds normalized
+``email -> row`` and ``id -> row`` hash indexes, so point lookups are O(1)
+instead of a string comparison over the whole column.  The /students search
+runs against one precomputed lowercased column holding every searchable
+field, built lazily once per snapshot (``search``).
+
+New registrations are appended to the end of the file (``append``) under an
+exclusive lock on ``<data file>.lock``, so concurrent gunicorn workers never
+lose each other's rows.  When another process appended, only the new tail of the
+file is parsed.  Whole-file rewrites (``save``, ``compact``) go through a temp
+file and ``os.replace`` under the same lock.
+"""
+import csv
+import io
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+from student_storage import backend_for
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def normalize_email(value):
+    return str(value).strip().lower()
+
+
+def normalize_id(value):
+    return str(value).strip()
+
+
+# fields never searched or shown
+HIDDEN_COLUMNS = ('password',)
+# joins fields in the search column so a query cannot match across two fields
+_FIELD_SEP = '\x1f'
+
+
+def build_search_text(df):
+    """One lowercased string per row: all searchable columns joined."""
+    cols = [c for c in df.columns if c not in HIDDEN_COLUMNS]
+    if not cols:
+        return pd.Series([''] * len(df), index=df.index, dtype=object)
+    text = df[cols[0]].astype(str)
+    for col in cols[1:]:
+        text = text + _FIELD_SEP + df[col].astype(str)
+    return text.str.lower()
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock held on a ``.lock`` file next to ``path``."""
+    with open(path + '.lock', 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _Snapshot:
+    """A loaded frame together with everything derived from it.
+
+    Rows added by ``append`` are indexed immediately but only concatenated
+    onto the DataFrame the next time ``df`` is read, so a burst of
+    registrations costs one concat instead of one per row.  Both happen under
+    the snapshot's own lock: ``df`` is read on the lock-free ``snapshot()``
+    path, and a row indexed but not yet merged would otherwise be lost.
+    """
+
+    def __init__(self, df, signature):
+        self._df = df
+        self._pending = []
+        self._rows_lock = threading.Lock()
+        self._search_text = None
+        self.signature = signature
+        self.email_col = next((c for c in df.columns if 'email' in c), None)
+        self.id_col = next((c for c in df.columns if c == 'id' or 'id' in c), None)
+        self.by_email = self._index(self.email_col, normalize_email)
+        self.by_id = self._index(self.id_col, normalize_id)
+        self.next_label = (df.index.max() + 1) if len(df.index) else 0
+        self.max_id = None
+        if self.id_col is not None and not df.empty:
+            max_id = pd.to_numeric(df[self.id_col], errors='coerce').max()
+            self.max_id = int(max_id) if pd.notna(max_id) else None
+
+    def _index(self, col, normalize):
+        if col is None or self._df.empty:
+            return {}
+        keys = self._df[col].map(normalize)
+        # first occurrence wins, like the old ``matched.iloc[0]``
+        keys = keys[~keys.duplicated(keep='first')]
+        return dict(zip(keys, keys.index))
+
+    @property
+    def df(self):
+        if self._pending:
+            with self._rows_lock:
+                self._merge_pending()
+        return self._df
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        rows = pd.DataFrame([r for _, r in pending],
+                            index=[label for label, _ in pending], columns=self._df.columns)
+        if self._search_text is not None:
+            self._search_text = pd.concat([self._search_text, build_search_text(rows)])
+        self._df = pd.concat([self._df, rows])
+        # cleared only now: until _df has the rows, lock-free readers must
+        # keep seeing them as pending and wait for this merge
+        self._pending = []
+
+    def searchable(self):
+        """``(df, search_text)`` of the same rows, taken together.
+
+        Reading ``df`` and the search column separately could merge rows
+        appended in between, leaving a mask longer than the frame.
+        """
+        with self._rows_lock:
+            self._merge_pending()
+            if self._search_text is None:
+                self._search_text = build_search_text(self._df)
+            return self._df, self._search_text
+
+    def add_rows(self, rows):
+        with self._rows_lock:
+            self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        for row in rows:
+            label = self.next_label
+            self.next_label += 1
+            self._pending.append((label, row))
+            if self.email_col and row.get(self.email_col) is not None:
+                self.by_email.setdefault(normalize_email(row[self.email_col]), label)
+            if self.id_col and row.get(self.id_col) is not None:
+                self.by_id.setdefault(normalize_id(row[self.id_col]), label)
+                try:
+                    numeric = int(row[self.id_col])
+                except (TypeError, ValueError):
+                    continue
+                self.max_id = numeric if self.max_id is None else max(self.max_id, numeric)
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class StudentStore:
+    """Cached student data stored in ``path`` (format chosen by extension).
+
+    For CSV, appends go straight into the data file.  Columnar formats cannot
+    be appended to cheaply, so new rows go to a ``<path>.log.csv`` append log
+    that is merged on load and folded into the data file by ``compact()``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.backend = backend_for(path)
+        self.log_path = path if self.backend.appendable else path + '.log.csv'
+        self._lock = threading.RLock()
+        self._snapshot = None
+
+    def _stat(self):
+        """``(data file, append log)`` signatures, or None if there is no data."""
+        log = _file_signature(self.log_path)
+        if self.log_path == self.path:
+            return (None, log) if log is not None else None
+        base = _file_signature(self.path)
+        if base is None and log is None:
+            return None
+        return (base, log)
+
+    def _load(self):
+        if self.log_path == self.path:
+            df = self.backend.read(self.path)
+        else:
+            df = self.backend.read(self.path) if os.path.exists(self.path) else pd.DataFrame()
+            if os.path.exists(self.log_path):
+                log = pd.read_csv(self.log_path, dtype=str, keep_default_na=False)
+                log.columns = log.columns.str.strip().str.lower()
+                df = pd.concat([df, log], ignore_index=True) if not df.empty else log
+        # normalize
+        df.columns = df.columns.str.strip().str.lower()
+        return df
+
+    def _read_tail(self, snap, start, signature):
+        """Parse rows appended to the log after byte ``start`` and add them to ``snap``."""
+        log_sig = signature[1]
+        with open(self.log_path, 'rb') as fh:
+            fh.seek(start)
+            tail = fh.read(log_sig[2] - start)
+        # a writer may be mid-row; leave an unterminated last line for next time
+        complete = tail.rfind(b'\n') + 1
+        columns = list(snap.df.columns)
+        text = tail[:complete].decode('utf-8')
+        rows = [dict(zip(columns, rec)) for rec in csv.reader(io.StringIO(text, newline='')) if rec]
+        snap.add_rows(rows)
+        if complete == len(tail):
+            snap.signature = signature
+        else:
+            snap.signature = (signature[0], (log_sig[0], None, start + complete))
+
+    def _only_appended(self, old, new):
+        """True when the data file is unchanged and the log just grew."""
+        if old is None or new is None or old[0] != new[0]:
+            return False
+        old_log, new_log = old[1], new[1]
+        return (old_log is not None and new_log is not None
+                and old_log[0] == new_log[0] and new_log[2] > old_log[2])
+
+    def snapshot(self):
+        signature = self._stat()
+        snap = self._snapshot
+        if snap is not None and snap.signature == signature:
+            return snap
+        with self._lock:
+            # stat again: the file may have grown while we waited for the lock,
+            # and a stale (shorter) signature would get its tail read twice
+            signature = self._stat()
+            snap = self._snapshot
+            if snap is not None and snap.signature == signature:
+                return snap
+            if snap is not None and len(snap.df.columns) and self._only_appended(snap.signature, signature):
+                # another worker appended rows: parse just those
+                self._read_tail(snap, snap.signature[1][2], signature)
+                return snap
+            while True:
+                df = self._load() if signature is not None else pd.DataFrame()
+                after = self._stat()
+                if after == signature:
+                    break
+                signature = after  # another process wrote during the read
+            snap = self._snapshot = _Snapshot(df, signature)
+        return snap
+
+    def frame(self):
+        """Return the current DataFrame (empty if there is no data yet)."""
+        return self.snapshot().df
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _replace_file(self, df):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        ext = os.path.splitext(self.path)[1]
+        fd, tmp = tempfile.mkstemp(prefix='.students-', suffix=ext, dir=directory)
+        os.close(fd)
+        try:
+            self.backend.write(df, tmp)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if self.log_path != self.path and os.path.exists(self.log_path):
+            # everything in the log is now part of the data file
+            os.remove(self.log_path)
+
+    def save(self, df):
+        """Rewrite the whole data file from ``df`` and make it the cached frame."""
+        with self._lock, file_lock(self.path):
+            self._replace_file(df)
+            self._snapshot = _Snapshot(df, self._stat())
+
+    def compact(self):
+        """Rewrite the data file from the current data, folding in the append
+        log and dropping exact duplicate rows."""
+        with self._lock, file_lock(self.path):
+            self._snapshot = None
+            df = self.snapshot().df.drop_duplicates().reset_index(drop=True)
+            self._replace_file(df)
+            self._snapshot = _Snapshot(df, self._stat())
+            return len(df)
+
+    def append(self, row, email=None):
+        """Append one student without rewriting the data file.
+
+        ``row`` maps (normalized) column names to values.  If ``email`` is
+        given the append is refused -- returning None -- when it is already
+        registered.  A missing id is allocated from the cached id counter.
+        Returns the row as written.
+        """
+        with self._lock, file_lock(self.path):
+            snap = self.snapshot()  # picks up other workers' appends
+            if email is not None and normalize_email(email) in snap.by_email:
+                return None
+            row = dict(row)
+            id_col = snap.id_col or 'id'
+            if not row.get(id_col):
+                row[id_col] = str(snap.max_id + 1) if snap.max_id is not None else (
+                    '1' if snap.df.empty else uuid.uuid4().hex[:8])
+
+            columns = list(snap.df.columns)
+            if snap.signature is None or not columns or set(row) - set(columns):
+                # no data yet or new columns: needs a full rewrite
+                df = snap.df
+                new_df = pd.DataFrame([row])
+                df = pd.concat([df, new_df], ignore_index=True) if not df.empty else new_df
+                self._replace_file(df)
+                self._snapshot = _Snapshot(df, self._stat())
+                return row
+
+            needs_header = not os.path.exists(self.log_path)
+            needs_newline = False
+            if not needs_header:
+                with open(self.log_path, 'rb') as fh:
+                    fh.seek(0, os.SEEK_END)
+                    if fh.tell():
+                        fh.seek(-1, os.SEEK_END)
+                        needs_newline = fh.read(1) not in (b'\n', b'\r')
+            with open(self.log_path, 'a', newline='', encoding='utf-8') as fh:
+                writer = csv.writer(fh, lineterminator='\n')
+                if needs_header:
+                    writer.writerow(columns)
+                if needs_newline:
+                    fh.write('\n')
+                writer.writerow(['' if row.get(c) is None else row.get(c) for c in columns])
+            snap.add_rows([{c: row.get(c) for c in columns}])
+            snap.signature = self._stat()
+            return row
+
+    def update(self, student_id, changes):
+        """Apply ``{column: value}`` to one student; returns False if not found.
+
+        The read-modify-write happens under the file lock, so it cannot drop
+        rows another worker appended in the meantime.
+        """
+        with self._lock, file_lock(self.path):
+            snap = self.snapshot()
+            idx = snap.by_id.get(normalize_id(student_id))
+            if idx is None:
+                return False
+            df = snap.df.copy()
+            for col, val in changes.items():
+                if col in df.columns and df[col].dtype != object:
+                    # form values are strings; newer pandas refuses them in an int/float column
+                    df[col] = df[col].astype(object)
+                df.at[idx, col] = val
+            self._replace_file(df)
+            self._snapshot = _Snapshot(df, self._stat())
+            return True
+
+    def is_empty(self):
+        return self.snapshot().df.empty
+
+    @property
+    def columns(self):
+        return list(self.snapshot().df.columns)
+
+    @property
+    def email_col(self):
+        return self.snapshot().email_col
+
+    @property
+    def id_col(self):
+        return self.snapshot().id_col
+
+    def find_by_email(self, email):
+        """Return the student row as a dict, or None."""
+        snap = self.snapshot()
+        idx = snap.by_email.get(normalize_email(email))
+        return snap.df.loc[idx].to_dict() if idx is not None else None
+
+    def find_by_id(self, student_id):
+        snap = self.snapshot()
+        idx = snap.by_id.get(normalize_id(student_id))
+        return snap.df.loc[idx].to_dict() if idx is not None else None
+
+    def search(self, q):
+        """Rows where any non-password field contains ``q`` (case-insensitive,
+        literal substring match)."""
+        q = str(q).lower()
+        if not q:
+            return self.frame()
+        df, text = self.snapshot().searchable()
+        if df.empty:
+            return df
+        return df[text.str.contains(q, regex=False).values]
+
+    def index_of_id(self, student_id):
+        """Return the DataFrame index label of a student id, or None."""
+        return self.snapshot().by_id.get(normalize_id(student_id))
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+_dir = tempfile.mkdtemp()
+os.environ.setdefault('STUDENT_CSV_PATH', os.path.join(_dir, 'students.csv'))
+os.environ.setdefault('STUDENT_REPORT_CACHE', os.path.join(_dir, 'report_cache'))
+
+import app as edu
+
+ADMIN = {'email': 'admin@gmail.com', 'id': 'admin', 'name': 'Administrator', 'is_admin': True}
+
+
+class ReportDownloadTest(unittest.TestCase):
+    def setUp(self):
+        with open(edu.DATA_PATH, 'w', newline='') as f:
+            f.write('id,name,email,password\n1,Asha,asha@example.com,x\n2,Ravi,ravi@example.com,y\n')
+        edu.store.invalidate()
+        edu.app.testing = True
+        self.client = edu.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = ADMIN
+
+    def test_matching_etag_gets_304(self):
+        first = self.client.get('/students/1/download/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.mimetype, 'application/pdf')
+        etag = first.headers['ETag']
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+
+        again = self.client.get('/students/1/download/', headers={'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers['ETag'], etag)
+        self.assertEqual(again.data, b'')
+
+    def test_edit_changes_etag(self):
+        etag = self.client.get('/students/2/download/').headers['ETag']
+        self.assertTrue(edu.store.update('2', {'name': 'Ravi Kumar'}))
+        changed = self.client.get('/students/2/download/', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from student_db import SQLStudentStore, import_csv
+
+
+class ImportCSVTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.csv = os.path.join(self.dir, 'students.csv')
+        self.store = SQLStudentStore('sqlite:///' + os.path.join(self.dir, 'students.db'))
+
+    def tearDown(self):
+        self.store.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, text):
+        with open(self.csv, 'w', newline='') as f:
+            f.write(text)
+
+    def test_blank_emails_are_not_duplicates(self):
+        self.write('id,name,email\n1,A,a@example.com\n2,B,\n3,C,  \n')
+        self.assertEqual(import_csv(self.store, self.csv), (3, 0))
+        self.assertEqual(self.store.find_by_id('3')['name'], 'C')
+
+    def test_blank_ids_are_not_duplicates(self):
+        self.write('id,name,email\n,A,a@example.com\n,B,b@example.com\n')
+        self.assertEqual(import_csv(self.store, self.csv), (2, 0))
+        self.assertEqual(self.store.find_by_email('b@example.com')['name'], 'B')
+
+    def test_repeated_keys_keep_first_row(self):
+        self.write('id,name,email\n1,A,a@example.com\n2,B,A@Example.com \n1,C,c@example.com\n')
+        self.assertEqual(import_csv(self.store, self.csv), (1, 2))
+        self.assertEqual(self.store.find_by_email('a@example.com')['name'], 'A')
+        self.assertIsNone(self.store.find_by_email('c@example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from student_storage import backend_for, convert
+from student_store import StudentStore
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+@unittest.skipUnless(HAVE_PYARROW, 'pyarrow is not installed')
+class FeatherStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.csv = os.path.join(self.dir, 'students.csv')
+        pd.DataFrame([
+            {'id': 1, 'name': 'Asha', 'email': 'asha@example.com', 'score': 91.5, 'password': 'x'},
+            {'id': 2, 'name': 'Ravi', 'email': 'ravi@example.com', 'score': None, 'password': 'y'},
+        ]).to_csv(self.csv, index=False)
+        self.path = os.path.join(self.dir, 'students.feather')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_round_trip(self):
+        self.assertEqual(backend_for(self.path).name, 'feather')
+        convert(self.csv, self.path)
+        original = pd.read_csv(self.csv)
+        loaded = StudentStore(self.path).frame()
+        pd.testing.assert_frame_equal(loaded.reset_index(drop=True), original, check_dtype=False)
+
+    def test_appends_go_to_log_until_compact(self):
+        convert(self.csv, self.path)
+        store = StudentStore(self.path)
+        row = store.append({'name': 'Meera', 'email': 'meera@example.com', 'password': 'z'},
+                           email='meera@example.com')
+        self.assertEqual(row['id'], '3')
+        self.assertTrue(os.path.exists(self.path + '.log.csv'))
+        self.assertEqual(StudentStore(self.path).find_by_email('meera@example.com')['name'], 'Meera')
+
+        self.assertEqual(store.compact(), 3)
+        self.assertFalse(os.path.exists(self.path + '.log.csv'))
+        fresh = StudentStore(self.path)
+        self.assertEqual(len(fresh.frame()), 3)
+        self.assertEqual(fresh.find_by_id('3')['email'], 'meera@example.com')
+
+
+if __name__ == '__main__':
+    unittest.main()
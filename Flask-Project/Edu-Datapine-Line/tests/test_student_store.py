@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from student_store import StudentStore
+
+CSV = 'id,name,email,password\n1,Asha,asha@example.com,x\n2,Ravi,ravi@example.com,y\n'
+
+
+class StudentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'students.csv')
+        with open(self.path, 'w', newline='') as f:
+            f.write(CSV)
+        self.store = StudentStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_concurrent_append_then_find_by_email(self):
+        self.store.frame()
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            # reads merge the pending rows on the lock-free snapshot path
+            while not done.is_set():
+                self.store.frame()
+
+        def writer(n):
+            for i in range(40):
+                email = f'w{n}-{i}@example.com'
+                self.store.append({'name': f'W{n}', 'email': email, 'password': 'p'}, email=email)
+                try:
+                    if self.store.find_by_email(email) is None:
+                        errors.append(email)
+                except KeyError as e:
+                    errors.append(repr(e))
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in readers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        done.set()
+        for t in readers:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.store.frame()), 2 + 4 * 40)
+        self.assertEqual(len(StudentStore(self.path).frame()), 2 + 4 * 40)
+
+    def test_append_refuses_registered_email_and_allocates_id(self):
+        row = self.store.append({'name': 'Meera', 'email': 'meera@example.com', 'password': 'z'},
+                                email='meera@example.com')
+        self.assertEqual(row['id'], '3')
+        self.assertIsNone(self.store.append({'name': 'Dup', 'email': 'ASHA@example.com'},
+                                            email='ASHA@example.com'))
+
+    def test_tail_reload_after_external_append(self):
+        snap = self.store.snapshot()
+        with open(self.path, 'a', newline='') as f:
+            f.write('3,Kiran,kiran@example.com,z\n')
+        student = self.store.find_by_email('kiran@example.com')
+        self.assertEqual(student['name'], 'Kiran')
+        # only the new tail was parsed into the existing snapshot
+        self.assertIs(self.store.snapshot(), snap)
+        self.assertEqual(len(self.store.frame()), 3)
+
+    def test_unterminated_tail_line_waits_for_the_rest(self):
+        self.store.frame()
+        with open(self.path, 'a', newline='') as f:
+            f.write('3,Kiran,kiran@exa')
+        self.assertIsNone(self.store.find_by_email('kiran@example.com'))
+        with open(self.path, 'a', newline='') as f:
+            f.write('mple.com,z\n')
+        self.assertEqual(self.store.find_by_email('kiran@example.com')['name'], 'Kiran')
+
+    def test_update_then_compact(self):
+        self.store.append({'name': 'Meera', 'email': 'meera@example.com', 'password': 'z'})
+        self.assertTrue(self.store.update('2', {'name': 'Ravi Kumar', 'id': 2}))
+        self.assertFalse(self.store.update('99', {'name': 'Nobody'}))
+        # an exact duplicate row, dropped by compact
+        with open(self.path, 'a', newline='') as f:
+            f.write('1,Asha,asha@example.com,x\n')
+        self.assertEqual(self.store.compact(), 3)
+
+        fresh = StudentStore(self.path)
+        self.assertEqual(fresh.find_by_id('2')['name'], 'Ravi Kumar')
+        self.assertEqual(fresh.find_by_email('meera@example.com')['name'], 'Meera')
+        self.assertEqual(len(fresh.frame()), 3)
+
+
+class StudentSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'students.csv')
+        with open(self.path, 'w', newline='') as f:
+            f.write('id,name,email,password\n'
+                    '1,Asha,asha@example.com,secret\n'
+                    '2,Ravi (R.K.),ravi@example.com,y\n'
+                    '3,Meera,m.e@example.org,z\n')
+        self.store = StudentStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def names(self, q):
+        return list(self.store.search(q)['name'])
+
+    def test_query_is_literal_not_regex(self):
+        self.assertEqual(self.names('(r.k.)'), ['Ravi (R.K.)'])
+        self.assertEqual(self.names('.org'), ['Meera'])
+        self.assertEqual(self.names('a.*a'), [])
+        self.assertEqual(self.names('['), [])
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.names('ASHA'), ['Asha'])
+        self.assertEqual(self.names('Example.COM'), ['Asha', 'Ravi (R.K.)'])
+
+    def test_password_not_searched(self):
+        self.assertEqual(self.names('secret'), [])
+
+    def test_no_match_across_fields(self):
+        # id "1" followed by name "Asha", and name followed by email
+        self.assertEqual(self.names('1asha'), [])
+        self.assertEqual(self.names('ashaasha'), [])
+
+    def test_empty_query_returns_everything(self):
+        self.assertEqual(len(self.store.search('')), 3)
+
+    def test_search_during_appends(self):
+        errors = []
+        done = threading.Event()
+
+        def searcher():
+            while not done.is_set():
+                try:
+                    found = self.store.search('example')
+                    if len(found) < 2:
+                        errors.append(len(found))
+                except Exception as e:  # a mask/frame length mismatch
+                    errors.append(repr(e))
+                    return
+
+        def writer(n):
+            for i in range(40):
+                email = f'w{n}-{i}@example.net'
+                self.store.append({'name': f'W{n}', 'email': email, 'password': 'p'}, email=email)
+
+        searchers = [threading.Thread(target=searcher) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in searchers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        done.set()
+        for t in searchers:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.store.search('example.net')), 4 * 40)
+
+
+if __name__ == '__main__':
+    unittest.main()
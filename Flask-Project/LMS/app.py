@@ -1,9 +1,22 @@
+import io
 import os
-
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from customer.models import db, Customer, Book
-from send_mail import send_mail
-from sqlalchemy import or_
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, abort,
+                   Response, stream_with_context, send_file)
+from customer.models import db, Customer, Book, Loan, PdfJob
+import mail_queue
+from sqlalchemy import or_, update
+import search_index
+import db_profile
+import migrations
+import book_import
+import data_export
+import pdf_store
+import pdf_pipeline
+from pagination import paginate, page_size
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import generate_password_hash
 from functools import wraps
 
@@ -11,19 +24,36 @@ app = Flask(__name__)
 # use absolute paths to avoid SQLite "unable to open database file" on Windows
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'static', 'pdfs')
+# uploaded PDFs: streamed in, size-capped and stored by sha256; see pdf_store.py
+pdf_store.init_app(app, pdf_endpoints=('upload_pdf', 'add_book', 'update_book'),
+                   default_dir=os.path.join(BASE_DIR, 'instance', 'pdf_store'))
 # use local sqlite by default to avoid external MySQL access issues
 db_dir = os.path.join(BASE_DIR, 'instance')
 os.makedirs(db_dir, exist_ok=True)
 db_path = os.path.join(db_dir, 'lms.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('LMS_DATABASE_URI', f'sqlite:///{db_path}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = "your_secret_key"
+app.config['LOAN_DAYS'] = int(os.environ.get('LMS_LOAN_DAYS', '14'))
+
+# WAL + pragmas + pool sizing, see db_profile.py
+db_profile.configure(app)
 
 # Initialize SQLAlchemy
 db.init_app(app)
+db_profile.apply(app, db)
+
+# create/upgrade the schema; see migrations.py
+migrations.init_app(app)
+
+# outbound mail goes through the outbox; see mail_queue.py
+mail_queue.init_app(app)
+
+# full-text search over title/author/isbn (falls back to ILIKE without FTS5)
+search_index.setup(app, db)
 
-with app.app_context():
-    db.create_all()
+# thumbnails + text of uploaded PDFs, made by a background process pool
+pdf_pipeline.init_app(app)
 
 # ------------------- HELPER DECORATORS -------------------
 def login_required(f):
@@ -44,23 +74,88 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def store_pdf(pdf):
+    """Save an uploaded PDF in the content-addressed store; returns its URL or None.
+
+    The file's content decides, not its name: anything without the PDF
+    signature is refused.
+    """
+    if not (pdf and pdf.filename):
+        return None
+    try:
+        digest, _ = pdf_store.save_stream(pdf.stream, app.config['PDF_STORE_DIR'], app.config['PDF_MAX_BYTES'])
+    except ValueError:
+        flash(f'{pdf.filename} is not a PDF file.', 'danger')
+        return None
+    pdf_pipeline.enqueue_pdf(digest)
+    return url_for('serve_pdf', digest=digest)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    flash(f'Upload too large (PDFs up to {app.config["PDF_MAX_BYTES"] // (1024 * 1024)} MB).', 'danger')
+    return redirect(request.referrer or url_for('home'))
+
+
+def send_stored(digest, suffix, mimetype):
+    if not pdf_store.is_digest(digest):
+        abort(404)
+    path = pdf_store.path_for(app.config['PDF_STORE_DIR'], digest, suffix)
+    if not os.path.exists(path):
+        abort(404)
+    # conditional=True: If-None-Match -> 304 and Range -> 206
+    resp = send_file(path, mimetype=mimetype, conditional=True, etag=digest + suffix,
+                     max_age=pdf_store.MAX_AGE)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+
+@app.route('/pdf/<digest>.pdf')
+def serve_pdf(digest):
+    return send_stored(digest, '.pdf', 'application/pdf')
+
+
+@app.route('/pdf/<digest>.png')
+def serve_pdf_thumbnail(digest):
+    return send_stored(digest, '.png', 'image/png')
+
+
+@app.route('/pdf/<digest>.txt')
+def serve_pdf_text(digest):
+    return send_stored(digest, '.txt', 'text/plain')
+
+
+@app.cli.command('pdf-store-migrate')
+def pdf_store_migrate():
+    """Move PDFs referenced as /static/pdfs/... into the content-addressed store."""
+    moved = 0
+    with app.test_request_context():  # for url_for outside a request
+        prefix = url_for('static', filename='pdfs/')
+        for book in Book.query.filter(Book.pdf_url.like(prefix + '%')):
+            path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(book.pdf_url[len(prefix):]))
+            if not os.path.isfile(path):
+                print(f'book {book.id}: {path} missing, left as is')
+                continue
+            digest, _ = pdf_store.save_file(path, app.config['PDF_STORE_DIR'])
+            book.pdf_url = url_for('serve_pdf', digest=digest)
+            moved += 1
+    db.session.commit()
+    print(f'{moved} book(s) now point at the PDF store')
+
+
 # PDF Upload Route
 @app.route('/upload_pdf', methods=['GET', 'POST'])
 @login_required
 def upload_pdf():
-    from werkzeug.utils import secure_filename
     pdf_url = None
     if request.method == 'POST':
         pdf = request.files.get('pdf')
-        if pdf and pdf.filename.endswith('.pdf'):
-            filename = secure_filename(pdf.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            os.makedirs(upload_folder, exist_ok=True)
-            pdf_path = os.path.join(upload_folder, filename)
-            pdf.save(pdf_path)
-            pdf_url = url_for('static', filename=f'pdfs/{filename}')
+        pdf_url = store_pdf(pdf)
+        if pdf_url:
+            db.session.commit()  # the processing job
             flash('PDF uploaded successfully!', 'success')
-        else:
+        elif not (pdf and pdf.filename):
             flash('Please select a valid PDF file.', 'danger')
     return render_template('upload_pdf.html', pdf_url=pdf_url)
 
@@ -87,14 +182,11 @@ def customer_reg():
             name=name, email=email, password=password, gender=gender, phone=mobile
         )
         db.session.add(new_customer)
-        db.session.commit()
 
-        try:
-            subject = "Welcome to My Library"
-            body = f"Hi {name},\n\nThank you for registering at our library.\n\nRegards,\nLibrary Team"
-            send_mail(email, subject, body)
-        except Exception:
-            pass
+        subject = "Welcome to My Library"
+        body = f"Hi {name},\n\nThank you for registering at our library.\n\nRegards,\nLibrary Team"
+        mail_queue.enqueue_mail(email, subject, body, commit=False)
+        db.session.commit()
 
         return redirect(url_for("home"))
     return render_template("customer_reg.html")
@@ -132,6 +224,19 @@ def logout():
 
 
 # ✅ Dashboard
+@app.route('/admin/dashboard')
+@admin_required
+def admin_dashboard():
+    recent_jobs = (PdfJob.query.filter(PdfJob.status != 'done')
+                   .order_by(PdfJob.created_at.desc()).limit(20).all())
+    return render_template('admin_dashboard.html', customers=Customer.query.count(), books=Book.query.count(),
+                           job_counts=pdf_pipeline.job_counts(), recent_jobs=recent_jobs)
+
+
+# admin_dashboard.html / base.html link here (same as send_mail.py's admin app)
+app.add_url_rule('/admin/logout', 'admin_logout', logout)
+
+
 @app.route("/dashboard")
 @login_required
 def dashboard():
@@ -142,8 +247,9 @@ def dashboard():
 @app.route("/all_customers")
 @admin_required
 def all_customers():
-    customers = Customer.query.all()
-    return render_template("all_customer.html", customers=customers)
+    page = paginate(Customer.query, (Customer.id,),
+                    cursor=request.args.get('cursor'), per_page=page_size(request.args.get('per_page')))
+    return render_template("all_customer.html", customers=page.items, page=page)
 
 
 # ✅ Delete All Customers (admin only)
@@ -151,6 +257,9 @@ def all_customers():
 @admin_required
 def delete_all_customers():
     try:
+        # ondelete='SET NULL' is not enforced by SQLite (no PRAGMA foreign_keys);
+        # unlink the ledger here so a reused customer id cannot inherit loans
+        Loan.query.filter(Loan.customer_id.isnot(None)).update({Loan.customer_id: None})
         Customer.query.delete()
         db.session.commit()
     except Exception:
@@ -183,8 +292,65 @@ def search():
 @app.route('/books')
 @admin_required
 def books():
-    all_books = Book.query.order_by(Book.title).all()
-    return render_template('books.html', books=all_books)
+    page = paginate(Book.query, (Book.title, Book.id),
+                    cursor=request.args.get('cursor'), per_page=page_size(request.args.get('per_page')))
+    return render_template('books.html', books=page.items, page=page)
+
+
+@app.route('/import_books', methods=['POST'])
+@admin_required
+def import_books():
+    upload = request.files.get('file')
+    try:
+        fmt = book_import.format_for(upload.filename if upload else '')
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('books'))
+    # decode the upload as it is read instead of loading it into memory
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    result = book_import.import_books(db.session, book_import.iter_records(stream, fmt),
+                                      fts=app.config.get('BOOK_FTS_ENABLED'))
+    flash(result.summary(), 'success' if result.inserted else 'warning')
+    for message in result.errors:
+        flash(message, 'warning')
+    return redirect(url_for('books'))
+
+
+@app.cli.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=book_import.DEFAULT_BATCH_SIZE, show_default=True)
+def import_books_command(path, batch_size):
+    """Bulk-load books from a .csv or .jsonl file."""
+    def progress(result):
+        click.echo(f'  {result.seen:,} rows read, {result.inserted:,} imported ({result.rate:,.0f} rows/s)')
+
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        result = book_import.import_books(db.session, book_import.iter_records(f, book_import.format_for(path)),
+                                          batch_size=batch_size, fts=app.config.get('BOOK_FTS_ENABLED'),
+                                          progress=progress)
+    click.echo(result.summary())
+    for message in result.errors:
+        click.echo(message, err=True)
+
+
+@app.route('/export/<table>.<fmt>')
+@admin_required
+def export_table(table, fmt):
+    if table not in data_export.TABLES or fmt not in data_export.FORMATS:
+        abort(404)
+    body = stream_with_context(data_export.iter_export(db.session, table, fmt))
+    return Response(body, mimetype=data_export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'})
+
+
+@app.cli.command('export')
+@click.argument('table', type=click.Choice(sorted(data_export.TABLES)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(data_export.FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='file to write (default stdout)')
+def export_command(table, fmt, output):
+    """Stream the customers or books table as CSV or NDJSON."""
+    for chunk in data_export.iter_export(db.session, table, fmt):
+        output.write(chunk)
 
 
 # ✅ Our Collection — User must be logged in
@@ -192,23 +358,33 @@ def books():
 @login_required
 def our_collection():
     q = request.args.get('q', '').strip()
-    if q:
+    cursor = request.args.get('cursor')
+    per_page = page_size(request.args.get('per_page'))
+    page = None
+    if q and app.config.get('BOOK_FTS_ENABLED'):
+        # ranked search results: best matches only, no cursor
+        ids = search_index.search_book_ids(db.session, q, include_text=app.config['PDF_TEXT_SEARCH'])
+        by_id = {b.id: b for b in Book.query.filter(Book.id.in_(ids))} if ids else {}
+        books = [by_id[i] for i in ids if i in by_id]
+    elif q:
         filters = [
             Book.title.ilike(f"%{q}%"),
             Book.author.ilike(f"%{q}%"),
             Book.isbn.ilike(f"%{q}%")
         ]
-        books = Book.query.filter(or_(*filters)).order_by(Book.title).all()
+        page = paginate(Book.query.filter(or_(*filters)), (Book.title, Book.id), cursor=cursor, per_page=per_page)
+        books = page.items
     else:
-        books = Book.query.order_by(Book.title).all()
-    return render_template('our_collection.html', books=books, user=session.get('user'))
+        page = paginate(Book.query, (Book.title, Book.id), cursor=cursor, per_page=per_page)
+        books = page.items
+    thumbs = pdf_pipeline.ready_digests({b.pdf_digest for b in books})
+    return render_template('our_collection.html', books=books, page=page, user=session.get('user'), thumbs=thumbs)
 
 
 
 @app.route('/add_book', methods=['GET', 'POST'])
 @admin_required
 def add_book():
-    from werkzeug.utils import secure_filename
     pdf_url = None
     if request.method == 'POST':
         title = request.form.get('title')
@@ -219,19 +395,14 @@ def add_book():
         except ValueError:
             copies = 1
 
-        pdf = request.files.get('pdf')
-        if pdf and pdf.filename.endswith('.pdf'):
-            filename = secure_filename(pdf.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            os.makedirs(upload_folder, exist_ok=True)
-            pdf_path = os.path.join(upload_folder, filename)
-            pdf.save(pdf_path)
-            pdf_url = url_for('static', filename=f'pdfs/{filename}')
-        else:
-            pdf_url = None
+        pdf_url = store_pdf(request.files.get('pdf'))
 
         book = Book(title=title, author=author, isbn=isbn, copies=copies, available=copies, pdf_url=pdf_url)
         db.session.add(book)
+        db.session.flush()
+        if app.config.get('BOOK_FTS_ENABLED'):
+            search_index.index_book(db.session, book)
+        pdf_pipeline.attach_book(book)
         db.session.commit()
         return redirect(url_for('books'))
     return render_template('update_book.html', book=None, pdf_url=pdf_url)
@@ -241,7 +412,6 @@ def add_book():
 @admin_required
 def update_book(id):
     book = Book.query.get_or_404(id)
-    from werkzeug.utils import secure_filename
     if request.method == 'POST':
         book.title = request.form.get('title')
         book.author = request.form.get('author')
@@ -254,14 +424,12 @@ def update_book(id):
         diff = copies - book.copies
         book.copies = copies
         book.available = max(0, book.available + diff)
-        pdf = request.files.get('pdf')
-        if pdf and pdf.filename.endswith('.pdf'):
-            filename = secure_filename(pdf.filename)
-            upload_folder = app.config['UPLOAD_FOLDER']
-            os.makedirs(upload_folder, exist_ok=True)
-            pdf_path = os.path.join(upload_folder, filename)
-            pdf.save(pdf_path)
-            book.pdf_url = url_for('static', filename=f'pdfs/{filename}')
+        pdf_url = store_pdf(request.files.get('pdf'))
+        if pdf_url:
+            book.pdf_url = pdf_url
+            pdf_pipeline.attach_book(book)
+        if app.config.get('BOOK_FTS_ENABLED'):
+            search_index.index_book(db.session, book)
         db.session.commit()
         return redirect(url_for('books'))
     return render_template('update_book.html', book=book)
@@ -271,19 +439,67 @@ def update_book(id):
 @admin_required
 def delete_book(id):
     book = Book.query.get_or_404(id)
+    # keep the ledger: the loans stay in the history as 'Deleted book'
+    Loan.query.filter_by(book_id=id).update({Loan.book_id: None})
     db.session.delete(book)
+    if app.config.get('BOOK_FTS_ENABLED'):
+        search_index.remove_book(db.session, id)
     db.session.commit()
     return redirect(url_for('books'))
 
 
+def reserve_copy(book_id, commit=True):
+    """Take one available copy of a book; returns False if none are left.
+
+    A single conditional UPDATE, so concurrent requests can never push
+    ``available`` below zero. Aborts with 404 for an unknown book.
+    Pass ``commit=False`` to add more rows (e.g. the Loan) to the same
+    transaction.
+    """
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available > 0)
+        .values(available=Book.available - 1)
+    )
+    if commit:
+        db.session.commit()
+    if result.rowcount == 1:
+        return True
+    if db.session.get(Book, book_id) is None:
+        abort(404)
+    return False
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def current_customer_id():
+    customer = Customer.query.filter_by(email=session.get('user')).first()
+    return customer.id if customer else None
+
+
+def record_loan(book_id, kind):
+    """Reserve a copy and write the ledger entry in one transaction."""
+    if not reserve_copy(book_id, commit=False):
+        db.session.rollback()
+        return None
+    now = _utcnow()
+    loan = Loan(book_id=book_id, customer_id=current_customer_id(), kind=kind, created_at=now)
+    if kind == 'rent':
+        loan.status = 'active'
+        loan.due_date = now + timedelta(days=app.config['LOAN_DAYS'])
+    else:
+        loan.status = 'sold'
+    db.session.add(loan)
+    db.session.commit()
+    return loan
+
+
 @app.route('/buy_book/<int:id>')
 @login_required
 def buy_book(id):
-    book = Book.query.get_or_404(id)
-    if getattr(book, 'available', 0) > 0:
-        book.available -= 1
-        db.session.commit()
-    else:
+    if not record_loan(id, 'buy'):
         flash('Book not available to buy', 'warning')
     return redirect(url_for('our_collection'))
 
@@ -291,20 +507,90 @@ def buy_book(id):
 @app.route('/rent_book/<int:id>')
 @login_required
 def rent_book(id):
-    book = Book.query.get_or_404(id)
-    if getattr(book, 'available', 0) > 0:
-        book.available -= 1
-        db.session.commit()
-    else:
+    if not record_loan(id, 'rent'):
         flash('Book not available to rent', 'warning')
     return redirect(url_for('our_collection'))
 
 
+@app.route('/return_book/<int:loan_id>', methods=['POST'])
+@login_required
+def return_book(loan_id):
+    # closing the loan is conditional too, so a double submit returns only once
+    closing = (update(Loan)
+               .where(Loan.id == loan_id, Loan.status == 'active')
+               .values(status='returned', returned_at=_utcnow()))
+    if session.get('user') != 'admin@gmail.com':
+        customer_id = current_customer_id()
+        if customer_id is None:
+            # "customer_id == None" would match every unassigned loan
+            flash('No active loan to return.', 'warning')
+            return redirect(request.referrer or url_for('loan_history'))
+        closing = closing.where(Loan.customer_id == customer_id)
+    result = db.session.execute(closing)
+    if result.rowcount == 1:
+        book_id = db.session.query(Loan.book_id).filter(Loan.id == loan_id).scalar()
+        db.session.execute(update(Book).where(Book.id == book_id).values(available=Book.available + 1))
+        db.session.commit()
+        flash('Book returned. Thank you!', 'success')
+    else:
+        db.session.rollback()
+        flash('No active loan to return.', 'warning')
+    return redirect(request.referrer or url_for('loan_history'))
+
+
+@app.route('/my_loans')
+@login_required
+def loan_history():
+    customer_id = current_customer_id()
+    query = Loan.query.filter(Loan.customer_id == customer_id)
+    if customer_id is None:
+        query = query.filter(db.false())  # not a customer (e.g. admin): no loans of their own
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Loan.status == status)
+    page = paginate(query, (Loan.id,), cursor=request.args.get('cursor'),
+                    per_page=page_size(request.args.get('per_page')), descending=True)
+    return render_template('loans.html', loans=page.items, page=page, title='My Loans', now=_utcnow())
+
+
+@app.route('/overdue')
+@admin_required
+def overdue_loans():
+    now = _utcnow()
+    query = Loan.query.filter(Loan.status == 'active', Loan.due_date < now)
+    page = paginate(query, (Loan.id,), cursor=request.args.get('cursor'),
+                    per_page=page_size(request.args.get('per_page')))
+    return render_template('loans.html', loans=page.items, page=page, title='Overdue Loans', now=now)
+
+
+def ledger_availability():
+    """{book_id: available} derived from the ledger: copies - active rentals - sales."""
+    taken = dict(db.session.query(Loan.book_id, db.func.count())
+                 .filter(Loan.status.in_(('active', 'sold')))
+                 .group_by(Loan.book_id))
+    return {book_id: max(0, copies - taken.get(book_id, 0))
+            for book_id, copies in db.session.query(Book.id, Book.copies)}
+
+
+@app.cli.command('reconcile-availability')
+def reconcile_availability():
+    """Recompute Book.available from the loan ledger."""
+    changed = 0
+    for book_id, available in ledger_availability().items():
+        changed += db.session.execute(
+            update(Book).where(Book.id == book_id, Book.available != available).values(available=available)
+        ).rowcount
+    db.session.commit()
+    print(f'{changed} book(s) updated')
+
+
 # ✅ Customer update & delete
 @app.route("/delete_customer/<int:id>", methods=["POST"])
 @admin_required
 def delete_customer(id):
     customer = Customer.query.get_or_404(id)
+    # same transaction: SQLite reuses the id, the loans must not follow it
+    Loan.query.filter_by(customer_id=customer.id).update({Loan.customer_id: None})
     db.session.delete(customer)
     db.session.commit()
     return redirect(url_for("all_customers"))
@@ -328,7 +614,10 @@ def update_customer(id):
 @admin_required
 def delete_all_books():
     try:
+        Loan.query.filter(Loan.book_id.isnot(None)).update({Loan.book_id: None})
         Book.query.delete()
+        if app.config.get('BOOK_FTS_ENABLED'):
+            search_index.clear_index(db.session)
         db.session.commit()
         flash('All books deleted!', 'warning')
     except Exception:
@@ -356,16 +645,14 @@ def contact():
         body = f"From: {name or 'Anonymous'} <{email or 'no-reply'}>\n\n{message}"
 
         try:
-            success, resp = send_mail(
+            mail_queue.enqueue_mail(
                 os.environ.get('CONTACT_RECIPIENT', 'yashvirbbsc@gmail.com'),
                 subject,
                 body,
             )
-            if success:
-                flash('Your message has been sent. Thank you!', 'success')
-            else:
-                flash(f'Failed to send message: {resp}', 'danger')
+            flash('Your message has been sent. Thank you!', 'success')
         except Exception as e:
+            db.session.rollback()
             flash(f'Error while sending message: {e}', 'danger')
         return redirect(url_for('contact'))
     return render_template('contact.html')
@@ -393,7 +680,8 @@ def register():
             flash('Please fill all fields', 'warning')
             return redirect(url_for('register'))
 
-        if Customer.query.filter_by(email=email).first():
+        # served by ix_customer_email_lower
+        if Customer.query.filter(db.func.lower(Customer.email) == email.strip().lower()).first():
             flash('Email already registered', 'danger')
             return redirect(url_for('register'))
 
@@ -0,0 +1,169 @@
+"""Bulk catalog import from CSV or JSON Lines.
+
+Used by ``flask import-books FILE`` and the admin upload on the books page.
+The input is read one record at a time (never loaded whole), each record is
+validated, and ISBNs are checked against a set holding every ISBN already in
+the catalog plus the ones seen earlier in the file, so duplicates are skipped
+without a query per row.  Valid rows are written with one ``executemany``
+INSERT per batch, one transaction per batch, and each batch is added to the
+FTS index in the same transaction.
+
+Columns / keys (case-insensitive): ``title`` (required), ``author``, ``isbn``,
+``copies`` (default 1).  New books start with every copy available.
+"""
+import csv
+import json
+import os
+import time
+
+from sqlalchemy import func, insert, select, text
+
+from customer.models import Book
+import search_index
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_ERRORS_KEPT = 20
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'jsonl'}
+
+
+class ImportResult:
+    """Counters for one import run."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def seen(self):
+        return self.inserted + self.duplicates + self.invalid
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.seen / elapsed if elapsed > 0 else 0.0
+
+    def error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS_KEPT:
+            self.errors.append(f'line {line}: {message}')
+
+    def summary(self):
+        return (f'{self.inserted} imported, {self.duplicates} duplicate ISBN(s) skipped, '
+                f'{self.invalid} invalid row(s) ({self.rate:,.0f} rows/s)')
+
+
+def format_for(filename):
+    """``'csv'`` or ``'jsonl'`` from the file extension; ValueError otherwise."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f'unsupported file type {ext or filename!r}; use .csv or .jsonl')
+    return FORMATS[ext]
+
+
+def iter_records(stream, fmt):
+    """Yield ``(line_number, record)`` from a text stream.
+
+    A JSONL line that is not a JSON object is yielded as ``(line, None)``.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+
+
+def clean_record(record):
+    """Validate one record; returns the ``book`` row dict or raises ValueError."""
+    if record is None:
+        raise ValueError('not a JSON object')
+    record = {str(k).strip().lower(): v for k, v in record.items() if k is not None}
+
+    def field(name, limit):
+        value = record.get(name)
+        value = '' if value is None else str(value).strip()
+        if len(value) > limit:
+            raise ValueError(f'{name} longer than {limit} characters')
+        return value or None
+
+    title = field('title', 200)
+    if not title:
+        raise ValueError('missing title')
+    copies = record.get('copies')
+    if copies in (None, ''):
+        copies = 1
+    try:
+        copies = int(copies)
+    except (TypeError, ValueError):
+        raise ValueError(f'copies is not a number: {copies!r}')
+    if copies < 1:
+        raise ValueError('copies must be at least 1')
+    return {'title': title, 'author': field('author', 150), 'isbn': field('isbn', 50),
+            'copies': copies, 'available': copies}
+
+
+def import_books(session, records, batch_size=DEFAULT_BATCH_SIZE, fts=False, progress=None):
+    """Insert validated, de-duplicated ``records`` into ``book``.
+
+    ``records`` is an iterable of ``(line_number, record)`` as produced by
+    ``iter_records``.  With ``fts=True`` each batch is also added to the
+    search index.  ``progress(result)`` is called after every committed batch.
+    """
+    result = ImportResult()
+    known_isbns = set(session.execute(select(Book.isbn).where(Book.isbn.isnot(None))).scalars())
+    batch = []
+
+    def flush():
+        session.execute(insert(Book.__table__), batch)  # executemany
+        if fts:
+            # the INSERT holds SQLite's write lock until commit, so the batch's
+            # rowids are exactly the last len(batch) ids
+            last = session.execute(select(func.max(Book.id))).scalar()
+            _index_range(session, last - len(batch) + 1, last)
+        session.commit()
+        result.inserted += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(result)
+
+    try:
+        for line, record in records:
+            try:
+                row = clean_record(record)
+            except ValueError as e:
+                result.error(line, e)
+                continue
+            isbn = row['isbn']
+            if isbn is not None:
+                if isbn in known_isbns:
+                    result.duplicates += 1
+                    continue
+                known_isbns.add(isbn)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except Exception:
+        session.rollback()
+        raise
+    return result
+
+
+def _index_range(session, first_id, last_id):
+    session.execute(
+        text(f"INSERT INTO {search_index.FTS_TABLE} (rowid, title, author, isbn) "
+             "SELECT id, title, coalesce(author, ''), coalesce(isbn, '') FROM book "
+             "WHERE id BETWEEN :first AND :last"),
+        {'first': first_id, 'last': last_id},
+    )
@@ -1,9 +1,10 @@
 """Check books in DB and print rows for debugging."""
 from app import app
-from customer.models import Book
+from customer.models import db, Book
 
 with app.app_context():
-    books = Book.query.all()
-    print(f"Found {len(books)} books")
-    for b in books:
-        print(b.id, b.title, getattr(b, 'pdf_url', None))
+    print(f"Found {Book.query.count()} books")
+    # stream the rows instead of Book.query.all(); see data_export.py
+    rows = db.session.execute(db.select(Book.id, Book.title, Book.pdf_url).execution_options(yield_per=1000))
+    for book_id, title, pdf_url in rows:
+        print(book_id, title, pdf_url)
@@ -1,8 +1,15 @@
+import re
+
 from flask_sqlalchemy import SQLAlchemy
 
 db=SQLAlchemy()
 
+_PDF_URL_RE = re.compile(r'/pdf/([0-9a-f]{64})\.pdf$')
+
 class Customer(db.Model):
+    # case-insensitive email lookups (register duplicate check); see migrations.py
+    __table_args__ = (db.Index('ix_customer_email_lower', db.func.lower(db.text('email'))),)
+
     id=db.Column(db.Integer,primary_key=True)
     name=db.Column(db.String(100),nullable=False)
     email=db.Column(db.String(100),nullable=False,unique=True)
@@ -23,9 +30,85 @@ class Book(db.Model):
     - available: copies currently available
     """
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    author = db.Column(db.String(150), nullable=True)
+    title = db.Column(db.String(200), nullable=False, index=True)
+    author = db.Column(db.String(150), nullable=True, index=True)
     isbn = db.Column(db.String(50), unique=True, nullable=True)
     copies = db.Column(db.Integer, nullable=False, default=1)
     available = db.Column(db.Integer, nullable=False, default=1)
-    pdf_url = db.Column(db.String(300), nullable=True)
\ No newline at end of file
+    pdf_url = db.Column(db.String(300), nullable=True)
+
+    @property
+    def pdf_digest(self):
+        """sha256 of the PDF when it lives in the content-addressed store, else None."""
+        match = _PDF_URL_RE.search(self.pdf_url or '')
+        return match.group(1) if match else None
+
+class OutboxMessage(db.Model):
+    """Outgoing e-mail waiting for (or done with) delivery by mail_queue.
+
+    status is one of pending / sending / sent / failed.  While a worker holds
+    a message it is 'sending' and next_attempt_at is the lease expiry, so a
+    crashed worker's messages are picked up again automatically.
+    """
+    __tablename__ = 'outbox_message'
+    __table_args__ = (db.Index('ix_outbox_status_due', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(300), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+
+class Loan(db.Model):
+    """Ledger of rentals and purchases.
+
+    kind is 'rent' or 'buy'; status is 'active' (rented, not yet returned),
+    'returned' or 'sold'.  A book's availability can be rebuilt from it:
+    copies - active rentals - sales.  book_id / customer_id become NULL when
+    the book / customer is deleted; the loan itself stays in the history.
+    """
+    __tablename__ = 'loan'
+    __table_args__ = (
+        db.Index('ix_loan_customer_status', 'customer_id', 'status'),
+        db.Index('ix_loan_book_due', 'book_id', 'due_date'),
+        db.Index('ix_loan_status_due', 'status', 'due_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id', ondelete='SET NULL'), nullable=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='SET NULL'), nullable=True)
+    kind = db.Column(db.String(10), nullable=False, default='rent')
+    status = db.Column(db.String(10), nullable=False, default='active')
+    created_at = db.Column(db.DateTime, nullable=False)
+    due_date = db.Column(db.DateTime, nullable=True)
+    returned_at = db.Column(db.DateTime, nullable=True)
+
+    book = db.relationship('Book', lazy='joined')
+
+
+class PdfJob(db.Model):
+    """Thumbnail + text extraction work for one stored PDF (see pdf_pipeline).
+
+    One row per digest, so a PDF shared by several books is processed once.
+    status is pending / running / done / failed; while 'running',
+    next_attempt_at is the lease expiry, as in OutboxMessage.
+    """
+    __tablename__ = 'pdf_job'
+    __table_args__ = (db.Index('ix_pdf_job_status_due', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), nullable=False, unique=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    pages = db.Column(db.Integer, nullable=True)
+    text_chars = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
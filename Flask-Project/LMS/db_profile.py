@@ -0,0 +1,87 @@
+"""SQLite performance profile for the LMS database.
+
+``configure(app)`` fills in pool settings and the PRAGMA values (all
+overridable through app config or the environment); ``apply(db)`` hooks a
+``connect`` listener on the engine so every new connection gets them:
+
+==============================  ========================  ===============
+config key / env var            PRAGMA                    default
+==============================  ========================  ===============
+SQLITE_JOURNAL_MODE             journal_mode              WAL
+SQLITE_SYNCHRONOUS              synchronous               NORMAL
+SQLITE_BUSY_TIMEOUT_MS          busy_timeout              5000
+SQLITE_CACHE_SIZE               cache_size (neg. = KiB)   -20000
+SQLITE_MMAP_SIZE                mmap_size (bytes)         268435456
+SQLITE_TEMP_STORE               temp_store                MEMORY
+==============================  ========================  ===============
+
+WAL lets readers keep going while a write commits; with ``synchronous=NORMAL``
+a commit no longer fsyncs the main database file (a power cut can lose the
+last transactions, but never corrupts the file).
+
+Pooling: every gunicorn worker process gets its own pool, so
+``LMS_DB_POOL_SIZE`` should match the threads per worker (default 5) and
+``LMS_DB_MAX_OVERFLOW`` covers short bursts (default 10).
+"""
+import os
+
+from sqlalchemy import event
+
+PRAGMA_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': '5000',
+    'SQLITE_CACHE_SIZE': '-20000',
+    'SQLITE_MMAP_SIZE': str(256 * 1024 * 1024),
+    'SQLITE_TEMP_STORE': 'MEMORY',
+}
+
+_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('temp_store', 'SQLITE_TEMP_STORE'),
+)
+
+
+def configure(app):
+    """Set pragma and pool config on ``app``; call before ``db.init_app``."""
+    for key, default in PRAGMA_DEFAULTS.items():
+        app.config.setdefault(key, os.environ.get(key, default))
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and ':memory:' not in uri:
+        options.setdefault('pool_size', int(os.environ.get('LMS_DB_POOL_SIZE', '5')))
+        options.setdefault('max_overflow', int(os.environ.get('LMS_DB_MAX_OVERFLOW', '10')))
+        # sqlite3's own lock wait, in seconds; busy_timeout below is the same in ms
+        connect_args = options.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', int(app.config['SQLITE_BUSY_TIMEOUT_MS']) / 1000)
+        connect_args.setdefault('check_same_thread', False)
+
+
+def apply(app, db):
+    """Register the PRAGMA listener on the app's engine."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [(name, str(app.config[key])) for name, key in _PRAGMAS if app.config.get(key) not in (None, '')]
+    install_pragmas(engine, pragmas)
+
+
+def install_pragmas(engine, pragmas):
+    """Run ``PRAGMA name=value`` for each pair on every new connection."""
+    for name, value in pragmas:
+        if not (value.lstrip('-').isdigit() or value.isalpha()):
+            raise ValueError(f'bad value for PRAGMA {name}: {value!r}')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
@@ -0,0 +1,299 @@
+"""Persistent outbound mail queue for the LMS app.
+
+Requests only insert an ``OutboxMessage`` row (``enqueue_mail``) and return;
+a background ``MailWorker`` thread claims due messages in batches and sends
+them over one reused, authenticated SMTP session.  Failed sends are retried
+with exponential backoff and every message keeps its delivery status.
+
+SMTP settings come from the environment::
+
+    SMTP_HOST (smtp.gmail.com)  SMTP_PORT (587)  SMTP_STARTTLS (1)
+    SMTP_SENDER_EMAIL  SMTP_SENDER_PASSWORD
+
+For local testing point it at a debugging server, e.g.
+``python -m aiosmtpd -n -l localhost:1025`` with ``SMTP_HOST=localhost
+SMTP_PORT=1025 SMTP_STARTTLS=0 SMTP_SENDER_PASSWORD=``.  An empty password
+skips the login step; with no ``SMTP_SENDER_PASSWORD`` at all the worker
+logs an error and sends nothing, and the messages stay queued.
+
+The worker thread starts with the first queued message (or at startup when
+the outbox has a backlog).  Set ``LMS_MAIL_WORKER=0`` to keep the web process
+from starting it and run ``flask --app app mail-worker`` as a separate
+process instead.
+"""
+import multiprocessing
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import click
+from flask import current_app
+from sqlalchemy import update
+
+from customer.models import db, OutboxMessage
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30          # seconds before the first retry, doubled each time
+BACKOFF_MAX = 3600
+LEASE_SECONDS = 300        # how long a claimed message stays reserved
+POLL_INTERVAL = 5.0
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def smtp_settings():
+    return {
+        'host': os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', '587')),
+        'starttls': os.environ.get('SMTP_STARTTLS', '1') == '1',
+        'username': os.environ.get('SMTP_SENDER_EMAIL', 'yashvirbbsc@gmail.com'),
+        'password': os.environ.get('SMTP_SENDER_PASSWORD', ''),
+    }
+
+
+def smtp_configured():
+    """False while ``SMTP_SENDER_PASSWORD`` is not set at all.
+
+    Set it empty for a server without AUTH (see the module docstring).
+    """
+    return 'SMTP_SENDER_PASSWORD' in os.environ
+
+
+class SMTPSession:
+    """A lazily opened SMTP connection that is kept and reused between sends.
+
+    Connect + STARTTLS + AUTH happen once; after that each message is a
+    single MAIL/RCPT/DATA exchange.  A dropped connection is reopened once.
+    """
+
+    def __init__(self, host, port, username, password, starttls=True, timeout=30,
+                 idle_check=60, smtp_class=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.smtp_class = smtp_class
+        self._smtp = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    @property
+    def sender(self):
+        return self.username
+
+    def _connect(self):
+        smtp = self.smtp_class(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.password:
+            smtp.login(self.username, self.password)
+        self.connects += 1
+        return smtp
+
+    def _connection(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_check:
+            # servers drop idle sessions; probe before trusting it
+            try:
+                self._smtp.noop()
+            except smtplib.SMTPException:
+                self.close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def send(self, recipients, message):
+        for attempt in range(2):
+            try:
+                self._connection().sendmail(self.sender, recipients, message)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def build_message(sender, recipients, subject, body):
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = ",".join(recipients)
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg.as_string()
+
+
+def enqueue_mail(recipient, subject, body, commit=True):
+    """Store a message in the outbox; returns the OutboxMessage.
+
+    With ``commit=False`` the row joins the caller's transaction, so e.g. a
+    welcome mail is only queued if the registration itself commits.
+    """
+    recipients = [recipient] if isinstance(recipient, str) else list(recipient)
+    now = _now()
+    message = OutboxMessage(recipients=','.join(recipients), subject=subject, body=body,
+                            status='pending', attempts=0, created_at=now, next_attempt_at=now)
+    db.session.add(message)
+    if commit:
+        db.session.commit()
+    app = current_app._get_current_object()
+    if app.config.get('MAIL_WORKER_ENABLED'):
+        start_worker(app).wake()
+    return message
+
+
+def _claim_batch(limit):
+    """Reserve up to ``limit`` due messages for this worker."""
+    now = _now()
+    due = (OutboxMessage.query
+           .filter(OutboxMessage.status.in_(('pending', 'sending')),
+                   OutboxMessage.next_attempt_at <= now)
+           .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+           .limit(limit).with_entities(OutboxMessage.id).all())
+    claimed = []
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    for (message_id,) in due:
+        # conditional update: another worker process may have claimed it first
+        result = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == message_id,
+                   OutboxMessage.status.in_(('pending', 'sending')),
+                   OutboxMessage.next_attempt_at <= now)
+            .values(status='sending', next_attempt_at=lease)
+        )
+        if result.rowcount == 1:
+            claimed.append(message_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return OutboxMessage.query.filter(OutboxMessage.id.in_(claimed)).order_by(OutboxMessage.id).all()
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def process_outbox(session, limit=BATCH_SIZE):
+    """Send one batch of due messages through ``session``; returns (sent, failed)."""
+    sent = failed = 0
+    for message in _claim_batch(limit):
+        recipients = [r for r in message.recipients.split(',') if r]
+        message.attempts += 1
+        try:
+            session.send(recipients, build_message(session.sender, recipients, message.subject, message.body))
+        except (smtplib.SMTPException, OSError) as e:
+            failed += 1
+            message.last_error = str(e)
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = 'failed'
+            else:
+                message.status = 'pending'
+                message.next_attempt_at = _now() + timedelta(seconds=backoff(message.attempts))
+            if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                session.close()
+        else:
+            sent += 1
+            message.status = 'sent'
+            message.sent_at = _now()
+            message.last_error = None
+    db.session.commit()
+    return sent, failed
+
+
+class MailWorker(threading.Thread):
+    """Daemon thread draining the outbox for one app."""
+
+    def __init__(self, app, session=None, poll_interval=POLL_INTERVAL):
+        super().__init__(name='mail-worker', daemon=True)
+        self.app = app
+        # a session passed in is the caller's business; ours needs the settings
+        self.configured = session is not None or smtp_configured()
+        self.session = session or SMTPSession(**smtp_settings())
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run(self):
+        if not self.configured:
+            self.app.logger.error('SMTP_SENDER_PASSWORD is not set; mail stays queued, nothing is sent')
+            return
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    sent, failed = process_outbox(self.session)
+            except Exception as e:
+                self.app.logger.warning('mail worker error: %s', e)
+                sent = failed = 0
+            if sent or failed:
+                continue
+            # queue drained: release the SMTP session after a quiet period
+            if not self._wakeup.wait(self.poll_interval):
+                self.session.close()
+            self._wakeup.clear()
+        self.session.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(app):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = MailWorker(app)
+            _worker.start()
+    return _worker
+
+
+def init_app(app):
+    """Register the ``mail-worker`` command and, unless disabled, the worker thread."""
+
+    @app.cli.command('mail-worker')
+    @click.option('--once', is_flag=True, help='Send one batch and exit.')
+    def mail_worker_command(once):
+        """Deliver queued e-mail from the outbox."""
+        if not smtp_configured():
+            raise click.ClickException('SMTP_SENDER_PASSWORD is not set (set it empty for a server without AUTH)')
+        session = SMTPSession(**smtp_settings())
+        if once:
+            sent, failed = process_outbox(session)
+            session.close()
+            click.echo(f'sent {sent}, failed {failed}')
+            return
+        worker = MailWorker(app, session=session)
+        worker.run()
+
+    app.config.setdefault('MAIL_WORKER_ENABLED', os.environ.get('LMS_MAIL_WORKER', '1') == '1')
+    # not inside pdf_pipeline's pool processes, which re-import the main module
+    if app.config['MAIL_WORKER_ENABLED'] and multiprocessing.parent_process() is None:
+        with app.app_context():
+            backlog = OutboxMessage.query.filter(OutboxMessage.status.in_(('pending', 'sending'))).first()
+        if backlog is not None:
+            start_worker(app)
@@ -0,0 +1,241 @@
+"""Versioned schema migrations for the LMS database.
+
+``db.create_all()`` only creates tables that are missing; it never adds a
+column or an index to a table that already exists, which is how the old
+one-off ``db_migrate.py`` (pdf_url) came about.  Instead every schema change
+is a numbered step in ``MIGRATIONS`` and the ``schema_version`` table records
+which steps a database has had.  ``upgrade`` runs the missing ones in order at
+startup, and from the command line::
+
+    flask db-upgrade        # apply pending migrations
+    flask db-version        # show applied / pending versions
+
+Adding a migration: append a function decorated with ``@migration(n, ...)``
+using the next number.  Tables are created from frozen ``Table`` copies or
+plain DDL, never from the models.  Steps must be idempotent (``IF NOT EXISTS``, column
+checks) because databases created before this module already have some of
+the objects.  Never edit or renumber a step that has shipped.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        inspect, select, text)
+from sqlalchemy.exc import IntegrityError
+
+from customer.models import db
+
+MIGRATIONS = []
+
+_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    """Register ``fn(conn)`` as schema step ``version``."""
+    def register(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f'migration {version} is out of order')
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def _add_column_if_missing(conn, table, column, ddl):
+    if column not in [c['name'] for c in inspect(conn).get_columns(table)]:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+# The tables as each step created them.  They are frozen copies, not the
+# models: a step must create the same schema however the models change later
+# (a model change is a new step).
+_steps = MetaData()
+
+_customer_v1 = Table(
+    'customer', _steps,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('email', String(100), nullable=False, unique=True),
+    Column('password', String(100), nullable=True),
+    Column('phone', String(15), unique=True, nullable=True),
+    Column('gender', String(10), nullable=False),
+)
+
+_book_v1 = Table(
+    'book', _steps,
+    Column('id', Integer, primary_key=True),
+    Column('title', String(200), nullable=False),
+    Column('author', String(150), nullable=True),
+    Column('isbn', String(50), unique=True, nullable=True),
+    Column('copies', Integer, nullable=False),
+    Column('available', Integer, nullable=False),
+    Column('pdf_url', String(300), nullable=True),
+)
+
+_outbox_message_v2 = Table(
+    'outbox_message', _steps,
+    Column('id', Integer, primary_key=True),
+    Column('recipients', Text, nullable=False),
+    Column('subject', String(300), nullable=False),
+    Column('body', Text, nullable=False),
+    Column('status', String(10), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('last_error', Text, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('next_attempt_at', DateTime, nullable=False),
+    Column('sent_at', DateTime, nullable=True),
+    Index('ix_outbox_status_due', 'status', 'next_attempt_at'),
+)
+
+_loan_v2 = Table(
+    'loan', _steps,
+    Column('id', Integer, primary_key=True),
+    Column('book_id', Integer, ForeignKey('book.id', ondelete='CASCADE'), nullable=False),
+    Column('customer_id', Integer, ForeignKey('customer.id', ondelete='SET NULL'), nullable=True),
+    Column('kind', String(10), nullable=False),
+    Column('status', String(10), nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('due_date', DateTime, nullable=True),
+    Column('returned_at', DateTime, nullable=True),
+    Index('ix_loan_customer_status', 'customer_id', 'status'),
+    Index('ix_loan_book_due', 'book_id', 'due_date'),
+    Index('ix_loan_status_due', 'status', 'due_date'),
+)
+
+_pdf_job_v4 = Table(
+    'pdf_job', _steps,
+    Column('id', Integer, primary_key=True),
+    Column('digest', String(64), nullable=False, unique=True),
+    Column('status', String(10), nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('last_error', Text, nullable=True),
+    Column('pages', Integer, nullable=True),
+    Column('text_chars', Integer, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('next_attempt_at', DateTime, nullable=False),
+    Column('finished_at', DateTime, nullable=True),
+    Index('ix_pdf_job_status_due', 'status', 'next_attempt_at'),
+)
+
+
+@migration(1, 'customer and book tables')
+def _base_tables(conn):
+    _steps.create_all(conn, tables=[_customer_v1, _book_v1])
+    # databases from before pdf_url existed (formerly db_migrate.py)
+    _add_column_if_missing(conn, 'book', 'pdf_url', 'VARCHAR(300) NULL')
+
+
+@migration(2, 'mail outbox and loan ledger')
+def _outbox_and_loans(conn):
+    _steps.create_all(conn, tables=[_outbox_message_v2, _loan_v2])
+
+
+@migration(3, 'indexes on book title/author and lower(customer.email)')
+def _secondary_indexes(conn):
+    # title: catalog listing is ORDER BY (title, id); SQLite appends the rowid
+    # (= book.id) to every index entry, so this one index serves the keyset seek
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_book_title ON book (title)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_book_author ON book (author)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_customer_email_lower ON customer (lower(email))'))
+
+
+@migration(4, 'pdf processing jobs')
+def _pdf_jobs(conn):
+    _steps.create_all(conn, tables=[_pdf_job_v4])
+
+
+@migration(5, 'keep loans of deleted books (nullable loan.book_id)')
+def _loan_book_nullable(conn):
+    if next(c for c in inspect(conn).get_columns('loan') if c['name'] == 'book_id')['nullable']:
+        return
+    # SQLite cannot drop NOT NULL in place: rebuild the table and copy the rows
+    for name in ('ix_loan_customer_status', 'ix_loan_book_due', 'ix_loan_status_due'):
+        conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    conn.execute(text('ALTER TABLE loan RENAME TO loan_v4'))
+    conn.execute(text(
+        'CREATE TABLE loan ('
+        'id INTEGER NOT NULL, '
+        'book_id INTEGER, '
+        'customer_id INTEGER, '
+        'kind VARCHAR(10) NOT NULL, '
+        'status VARCHAR(10) NOT NULL, '
+        'created_at DATETIME NOT NULL, '
+        'due_date DATETIME, '
+        'returned_at DATETIME, '
+        'PRIMARY KEY (id), '
+        'FOREIGN KEY(book_id) REFERENCES book (id) ON DELETE SET NULL, '
+        'FOREIGN KEY(customer_id) REFERENCES customer (id) ON DELETE SET NULL)'
+    ))
+    columns = 'id, book_id, customer_id, kind, status, created_at, due_date, returned_at'
+    conn.execute(text(f'INSERT INTO loan ({columns}) SELECT {columns} FROM loan_v4'))
+    conn.execute(text('DROP TABLE loan_v4'))
+    conn.execute(text('CREATE INDEX ix_loan_customer_status ON loan (customer_id, status)'))
+    conn.execute(text('CREATE INDEX ix_loan_book_due ON loan (book_id, due_date)'))
+    conn.execute(text('CREATE INDEX ix_loan_status_due ON loan (status, due_date)'))
+
+
+def applied_versions(conn):
+    schema_version.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def pending(engine):
+    """``(version, description)`` for every migration not applied yet."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return [(v, d) for v, d, _ in MIGRATIONS if v not in done]
+
+
+def upgrade(engine, target=None):
+    """Apply pending migrations up to ``target`` (all by default).
+
+    Returns the versions applied by this call.  Each step runs in its own
+    transaction together with its ``schema_version`` row.  The row is written
+    first: that takes the write lock, so when several workers start at once
+    the others wait, then hit the primary key and skip the step.
+    """
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.connect() as conn:
+            if version in applied_versions(conn):
+                conn.commit()
+                continue
+            try:
+                conn.execute(schema_version.insert().values(
+                    version=version, description=description,
+                    applied_at=datetime.now(timezone.utc).replace(tzinfo=None),
+                ))
+            except IntegrityError:
+                conn.rollback()
+                continue
+            fn(conn)
+            conn.commit()
+        applied.append(version)
+    return applied
+
+
+def init_app(app):
+    """Bring the schema up to date and register the ``db-*`` CLI commands."""
+    with app.app_context():
+        upgrade(db.engine)
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Apply pending schema migrations."""
+        applied = upgrade(db.engine)
+        print(f'applied: {applied}' if applied else 'schema is up to date')
+
+    @app.cli.command('db-version')
+    def db_version():
+        """Show applied and pending schema migrations."""
+        with db.engine.begin() as conn:
+            done = sorted(applied_versions(conn))
+        print(f'current version: {done[-1] if done else 0}')
+        for version, description in pending(db.engine):
+            print(f'pending {version}: {description}')
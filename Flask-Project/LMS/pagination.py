@@ -0,0 +1,110 @@
+"""Keyset (cursor) pagination for listing pages.
+
+Instead of ``OFFSET n`` -- which makes SQLite walk and discard n rows, so deep
+pages get slower and slower -- each page remembers the sort key of its first
+and last row.  The next page is ``WHERE (title, id) > (:title, :id)`` and the
+previous page the same comparison reversed, both of which are answered by an
+index seek no matter how deep the page is.
+
+Cursors are opaque url-safe strings; a tampered or stale cursor just yields
+the first page.
+"""
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class Page:
+    """One page of results plus the cursors to move around."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a ``per_page`` argument, clamped to ``1..MAX_PAGE_SIZE``."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(key, direction):
+    raw = json.dumps({'k': list(key), 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, key_len):
+    """Return ``(key, direction)`` or ``(None, 'next')`` for a missing/bad cursor."""
+    if not cursor:
+        return None, 'next'
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key, direction = data['k'], data['d']
+    except (ValueError, KeyError, TypeError):
+        return None, 'next'
+    if not isinstance(key, list) or len(key) != key_len or direction not in ('next', 'prev'):
+        return None, 'next'
+    # only values a column can hold; lists/objects would reach the driver
+    if not all(v is None or isinstance(v, (str, int, float)) for v in key):
+        return None, 'next'
+    return key, direction
+
+
+def paginate(query, columns, cursor=None, per_page=DEFAULT_PAGE_SIZE, descending=False):
+    """Apply keyset pagination to ``query`` ordered by ``columns``.
+
+    ``columns`` must form a unique key, e.g. ``(Book.title, Book.id)``.
+    Each item's key is read back from the attributes of the same name.
+    With ``descending=True`` the listing runs newest/largest first.
+    """
+    key, direction = decode_cursor(cursor, len(columns))
+    key_expr = tuple_(*columns) if len(columns) > 1 else columns[0]
+    bound = (tuple(key) if len(columns) > 1 else key[0]) if key is not None else None
+    # walk in index order for 'next' on ascending listings, reversed otherwise
+    forward = (direction == 'next') != descending
+
+    if forward:
+        if key is not None:
+            query = query.filter(key_expr > bound)
+        query = query.order_by(*columns)
+    else:
+        if key is not None:
+            query = query.filter(key_expr < bound)
+        query = query.order_by(*[c.desc() for c in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    def key_of(item):
+        return [getattr(item, c.key) for c in columns]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == 'prev':
+            next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+            if has_more:
+                prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+        else:
+            if has_more:
+                next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+            if key is not None:
+                prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+    return Page(rows, next_cursor, prev_cursor)
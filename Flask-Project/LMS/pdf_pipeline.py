@@ -0,0 +1,314 @@
+"""Background thumbnails and text extraction for uploaded PDFs.
+
+Uploading only queues a ``PdfJob`` row for the PDF's digest (``enqueue_pdf``),
+so ``add_book`` stays as fast as before.  A ``PdfWorker`` thread claims due
+jobs in batches and hands them to a process pool: rendering and text
+extraction are CPU-bound, so they run in separate processes, while the
+thread keeps the database work.  Each job writes next to the PDF in the
+store::
+
+    <store>/<xx>/<digest>.png   first page, THUMB_WIDTH pixels wide
+    <store>/<xx>/<digest>.txt   text of all pages
+
+Both are served like the PDF itself (immutable, by digest).  With
+``PDF_TEXT_SEARCH`` on, the text of every book using the PDF goes into the
+``book_text_fts`` index so catalog search finds books by their contents.
+
+Rendering needs PyMuPDF (``pip install pymupdf``); without it jobs fail with
+a clear error and the rest of the app is unaffected.
+
+=====================  ====================  =======================
+config key             env var               default
+=====================  ====================  =======================
+PDF_WORKER_ENABLED     LMS_PDF_WORKER        1
+PDF_WORKERS            LMS_PDF_WORKERS       2 (processes)
+PDF_TEXT_SEARCH        LMS_PDF_TEXT_SEARCH   1
+=====================  ====================  =======================
+
+Like the mail worker, the thread starts with the first queued job (or at
+startup when jobs are waiting); with ``LMS_PDF_WORKER=0`` run
+``flask --app app pdf-worker`` as a separate process instead.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from customer.models import db, Book, PdfJob
+import pdf_store
+import search_index
+
+THUMB_WIDTH = 300
+TEXT_INDEX_LIMIT = 200_000  # characters of a PDF's text put in the search index
+MAX_ATTEMPTS = 3
+RETRY_SECONDS = 60
+LEASE_SECONDS = 600
+POLL_INTERVAL = 5.0
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _write_atomic(path, data):
+    tmp = path + '.part'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def render_pdf(pdf_path, thumb_path, text_path, width=THUMB_WIDTH):
+    """Make the thumbnail and text file for one PDF; returns ``(pages, chars)``.
+
+    Runs in a pool process, so it only touches files, never the database.
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf  # PyMuPDF < 1.24
+        except ImportError:
+            raise RuntimeError('PyMuPDF is not installed (pip install pymupdf)')
+
+    with pymupdf.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            raise ValueError('PDF has no pages')
+        first = doc[0]
+        zoom = width / first.rect.width
+        pixmap = first.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        _write_atomic(thumb_path, pixmap.tobytes('png'))
+        body = '\n'.join(page.get_text() for page in doc)
+        _write_atomic(text_path, body.encode('utf-8'))
+        return doc.page_count, len(body)
+
+
+def enqueue_pdf(digest, wake=True):
+    """Queue processing of a stored PDF (joins the caller's transaction).
+
+    Returns the PdfJob; an existing job for the same digest is reused.
+    """
+    job = PdfJob.query.filter_by(digest=digest).first()
+    if job is None:
+        now = _now()
+        job = PdfJob(digest=digest, status='pending', attempts=0, created_at=now, next_attempt_at=now)
+        db.session.add(job)
+    app = current_app._get_current_object()
+    if wake and app.config.get('PDF_WORKER_ENABLED'):
+        start_worker(app)
+        # wake it once the job row is committed, not before it can see it
+        db.session.info['pdf_worker_wake'] = True
+    return job
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    if session.info.pop('pdf_worker_wake', False) and _worker is not None:
+        _worker.wake()
+
+
+def attach_book(book):
+    """Call after ``book`` got a stored PDF (flushed, so it has an id).
+
+    When the same file was processed before for another book, its text is
+    indexed for this one straight away; otherwise the job does it when done.
+    """
+    digest = book.pdf_digest
+    if digest is None:
+        return
+    job = PdfJob.query.filter_by(digest=digest).first()
+    if job is not None and job.status == 'done':
+        _index_text(current_app._get_current_object(), digest, [book.id])
+
+
+def ready_digests(digests):
+    """The subset of ``digests`` whose thumbnail and text exist."""
+    digests = [d for d in digests if d]
+    if not digests:
+        return set()
+    return {d for (d,) in PdfJob.query.filter(PdfJob.digest.in_(digests), PdfJob.status == 'done')
+            .with_entities(PdfJob.digest)}
+
+
+def _index_text(app, digest, book_ids=None):
+    if not (app.config.get('PDF_TEXT_SEARCH') and app.config.get('BOOK_FTS_ENABLED')):
+        return
+    text_path = pdf_store.path_for(app.config['PDF_STORE_DIR'], digest, '.txt')
+    if not os.path.exists(text_path):
+        return
+    with open(text_path, encoding='utf-8') as f:
+        body = f.read(TEXT_INDEX_LIMIT)
+    if book_ids is None:
+        book_ids = [b.id for b in Book.query.filter(Book.pdf_url.like(f'%/{digest}.pdf'))
+                    .with_entities(Book.id)]
+    for book_id in book_ids:
+        search_index.index_book_text(db.session, book_id, body)
+
+
+def _claim_batch(limit):
+    """Reserve up to ``limit`` due jobs (conditional update, see mail_queue)."""
+    now = _now()
+    due = (PdfJob.query
+           .filter(PdfJob.status.in_(('pending', 'running')), PdfJob.next_attempt_at <= now)
+           .order_by(PdfJob.next_attempt_at, PdfJob.id)
+           .limit(limit).with_entities(PdfJob.id).all())
+    claimed = []
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    for (job_id,) in due:
+        result = db.session.execute(
+            update(PdfJob)
+            .where(PdfJob.id == job_id, PdfJob.status.in_(('pending', 'running')),
+                   PdfJob.next_attempt_at <= now)
+            .values(status='running', next_attempt_at=lease)
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return PdfJob.query.filter(PdfJob.id.in_(claimed)).order_by(PdfJob.id).all()
+
+
+def process_jobs(executor, limit):
+    """Run one batch of due jobs on ``executor``; returns (done, failed)."""
+    app = current_app._get_current_object()
+    store_dir = app.config['PDF_STORE_DIR']
+    futures = {}
+    for job in _claim_batch(limit):
+        job.attempts += 1
+        paths = [pdf_store.path_for(store_dir, job.digest, suffix) for suffix in ('.pdf', '.png', '.txt')]
+        futures[executor.submit(render_pdf, *paths)] = job
+
+    done = failed = 0
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            job.pages, job.text_chars = future.result()
+        except Exception as e:
+            failed += 1
+            job.last_error = f'{type(e).__name__}: {e}'
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = 'failed'
+                job.finished_at = _now()
+            else:
+                job.status = 'pending'
+                job.next_attempt_at = _now() + timedelta(seconds=RETRY_SECONDS * job.attempts)
+        else:
+            done += 1
+            job.status = 'done'
+            job.last_error = None
+            job.finished_at = _now()
+            _index_text(app, job.digest)
+        db.session.commit()
+    return done, failed
+
+
+def make_executor(workers):
+    # spawn, not fork: the web process has threads (mail/pdf workers, server)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def job_counts():
+    """``{status: count}`` for the admin dashboard."""
+    return dict(db.session.query(PdfJob.status, db.func.count()).group_by(PdfJob.status))
+
+
+class PdfWorker(threading.Thread):
+    """Daemon thread feeding due PdfJobs to a process pool."""
+
+    def __init__(self, app, workers=None, poll_interval=POLL_INTERVAL):
+        super().__init__(name='pdf-worker', daemon=True)
+        self.app = app
+        self.workers = workers or app.config['PDF_WORKERS']
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run(self):
+        executor = None
+        try:
+            while not self._stopping.is_set():
+                done = failed = 0
+                try:
+                    with self.app.app_context():
+                        if PdfJob.query.filter(PdfJob.status.in_(('pending', 'running'))).first() is not None:
+                            executor = executor or make_executor(self.workers)
+                            done, failed = process_jobs(executor, self.workers * 2)
+                except Exception as e:
+                    self.app.logger.warning('pdf worker error: %s', e)
+                if done or failed:
+                    continue
+                # idle: give the worker processes back after a quiet period
+                if not self._wakeup.wait(self.poll_interval) and executor is not None:
+                    executor.shutdown()
+                    executor = None
+                self._wakeup.clear()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(app):
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = PdfWorker(app)
+            _worker.start()
+    return _worker
+
+
+def init_app(app):
+    """Register the ``pdf-*`` commands and, unless disabled, the worker thread."""
+    app.config.setdefault('PDF_WORKER_ENABLED', os.environ.get('LMS_PDF_WORKER', '1') == '1')
+    app.config.setdefault('PDF_WORKERS', int(os.environ.get('LMS_PDF_WORKERS', '2')))
+    app.config.setdefault('PDF_TEXT_SEARCH', os.environ.get('LMS_PDF_TEXT_SEARCH', '1') == '1')
+
+    @app.cli.command('pdf-worker')
+    @click.option('--once', is_flag=True, help='Process one batch and exit.')
+    @click.option('--workers', type=int, default=None, help='Pool processes (default PDF_WORKERS).')
+    def pdf_worker_command(once, workers):
+        """Make thumbnails and extract text for queued PDFs."""
+        workers = workers or app.config['PDF_WORKERS']
+        if once:
+            with make_executor(workers) as executor:
+                done, failed = process_jobs(executor, workers * 2)
+            click.echo(f'done {done}, failed {failed}')
+            return
+        PdfWorker(app, workers=workers).run()
+
+    @app.cli.command('pdf-backfill')
+    def pdf_backfill_command():
+        """Queue every stored book PDF that has no job yet."""
+        queued = 0
+        for book in Book.query.filter(Book.pdf_url.isnot(None)):
+            digest = book.pdf_digest
+            if digest and PdfJob.query.filter_by(digest=digest).first() is None:
+                enqueue_pdf(digest, wake=False)
+                db.session.flush()
+                queued += 1
+        db.session.commit()
+        click.echo(f'{queued} PDF(s) queued; run "flask pdf-worker" to process them')
+
+    # pool processes are spawned, i.e. re-import the main module (app.py under
+    # "python app.py"); they must not start workers of their own
+    if app.config['PDF_WORKER_ENABLED'] and multiprocessing.parent_process() is None:
+        with app.app_context():
+            backlog = PdfJob.query.filter(PdfJob.status.in_(('pending', 'running'))).first()
+        if backlog is not None:
+            start_worker(app)
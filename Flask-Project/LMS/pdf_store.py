@@ -0,0 +1,172 @@
+"""Content-addressed storage for uploaded book PDFs.
+
+An upload is copied to a temp file in fixed-size chunks while its SHA-256 is
+computed, then renamed to ``<store>/<first two hex chars>/<digest>.pdf``.
+The same PDF uploaded twice is stored once, and two different files can never
+overwrite each other whatever they were called.  ``Book.pdf_url`` points at
+the ``serve_pdf`` route for the digest; since a digest's content never
+changes, responses carry the digest as ETag and a one-year immutable
+Cache-Control, and werkzeug's ``send_file`` answers Range requests (and uses
+X-Sendfile when ``USE_X_SENDFILE`` is on behind nginx/apache).
+
+Uploads are not buffered by werkzeug first: ``init_app`` installs a request
+class whose stream factory hands the multipart parser an ``IncomingPDF`` for
+the PDF upload routes, so each chunk is hashed and written to the temp file
+as it arrives.  The first bytes must be the PDF signature (``%PDF-``); a file
+that starts with anything else is dropped without writing to disk.  A part
+larger than ``PDF_MAX_BYTES`` aborts the request with 413, as does any
+request body over ``MAX_CONTENT_LENGTH``.
+
+=====================  ====================  ==========================
+config key             env var               default
+=====================  ====================  ==========================
+PDF_STORE_DIR          LMS_PDF_STORE_DIR     instance/pdf_store
+PDF_MAX_BYTES          LMS_PDF_MAX_MB        50 MB
+MAX_CONTENT_LENGTH     LMS_MAX_UPLOAD_MB     PDF_MAX_BYTES + 1 MB
+=====================  ====================  ==========================
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+CHUNK_SIZE = 64 * 1024
+MAX_AGE = 365 * 24 * 3600
+PDF_MAGIC = b'%PDF-'
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_digest(value):
+    return bool(_DIGEST_RE.match(value or ''))
+
+
+def path_for(store_dir, digest, suffix='.pdf'):
+    """Where the PDF (or, with another ``suffix``, a file derived from it) lives."""
+    if not is_digest(digest):
+        raise ValueError(f'not a sha256 digest: {digest!r}')
+    return os.path.join(store_dir, digest[:2], digest + suffix)
+
+
+class IncomingPDF:
+    """Write target for one uploaded file: a temp file in the store, hashed as written.
+
+    Quacks like the file werkzeug expects from a stream factory (write, then
+    seek/read).  ``commit()`` moves it to its digest path; ``close()`` without
+    a commit deletes it.
+    """
+
+    def __init__(self, store_dir, max_bytes=None):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        fd, self.path = tempfile.mkstemp(dir=store_dir, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha = hashlib.sha256()
+        self._head = b''
+        self.size = 0
+        self.is_pdf = None  # unknown until the first len(PDF_MAGIC) bytes arrive
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.close()  # the parser drops us on error, so nobody else will
+            raise RequestEntityTooLarge(f'PDF larger than {self.max_bytes // (1024 * 1024)} MB')
+        if self.is_pdf is None:
+            self._head += data[:len(PDF_MAGIC)]
+            if len(self._head) >= len(PDF_MAGIC):
+                self.is_pdf = self._head.startswith(PDF_MAGIC)
+        if self.is_pdf is False:
+            return len(data)  # let the parser drain the part, keep nothing
+        self._sha.update(data)
+        return self._file.write(data)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def flush(self):
+        self._file.flush()
+
+    def commit(self):
+        """Move the file into the store; returns ``(digest, created)``.
+
+        ``created`` is False when an identical file was already stored.
+        Raises ValueError if the upload is not a PDF.
+        """
+        if not self.is_pdf:
+            raise ValueError('not a PDF file')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        digest = self._sha.hexdigest()
+        target = path_for(self.store_dir, digest)
+        self.committed = True
+        if os.path.exists(target):
+            os.remove(self.path)
+            return digest, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # same filesystem, so the rename is atomic: readers see all or nothing
+        os.replace(self.path, target)
+        return digest, True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def save_stream(stream, store_dir, max_bytes=None, chunk_size=CHUNK_SIZE):
+    """Store the bytes of ``stream``; returns ``(digest, created)`` like ``IncomingPDF.commit``."""
+    if isinstance(stream, IncomingPDF):
+        return stream.commit()  # already streamed in by the request's stream factory
+    incoming = IncomingPDF(store_dir, max_bytes)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            incoming.write(chunk)
+        return incoming.commit()
+    finally:
+        incoming.close()
+
+
+def save_file(path, store_dir):
+    """Store an existing file (e.g. a legacy ``static/pdfs`` upload)."""
+    with open(path, 'rb') as f:
+        return save_stream(f, store_dir)
+
+
+class PDFUploadRequest(Request):
+    """Streams file parts of the PDF upload endpoints straight into the store."""
+
+    pdf_endpoints = frozenset()
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in self.pdf_endpoints:
+            config = current_app.config
+            return IncomingPDF(config['PDF_STORE_DIR'], config['PDF_MAX_BYTES'])
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def init_app(app, pdf_endpoints, default_dir):
+    """Set the upload config and stream uploads for ``pdf_endpoints``."""
+    app.config.setdefault('PDF_STORE_DIR', os.environ.get('LMS_PDF_STORE_DIR', default_dir))
+    app.config.setdefault('PDF_MAX_BYTES', int(os.environ.get('LMS_PDF_MAX_MB', '50')) * 1024 * 1024)
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        limit = os.environ.get('LMS_MAX_UPLOAD_MB')
+        app.config['MAX_CONTENT_LENGTH'] = (int(limit) * 1024 * 1024 if limit
+                                            else app.config['PDF_MAX_BYTES'] + 1024 * 1024)
+    app.request_class = type('LMSRequest', (PDFUploadRequest,),
+                             {'pdf_endpoints': frozenset(pdf_endpoints)})
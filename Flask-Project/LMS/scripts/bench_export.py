@@ -0,0 +1,71 @@
+"""Time-to-first-byte and memory of the streaming export (data_export.py).
+
+Seeds a throwaway database with N books, then pulls /export/books.<fmt>
+through the test client chunk by chunk, reporting when the first bytes
+arrived, the total rate and the peak Python heap (tracemalloc) while
+streaming.
+
+Usage:
+    python scripts/bench_export.py [--rows 1000000] [--format csv]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+os.environ['LMS_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('LMS_MAIL_WORKER', '0')
+
+import app as lms  # noqa: E402
+from customer.models import db, Book  # noqa: E402
+
+
+def seed(rows):
+    batch = 50000
+    with lms.app.app_context():
+        for start in range(0, rows, batch):
+            db.session.execute(db.insert(Book.__table__), [
+                {'title': f'Title {i}', 'author': f'Author {i % 997}', 'isbn': str(i), 'copies': 2, 'available': 2}
+                for i in range(start, min(start + batch, rows))
+            ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', default='csv', choices=['csv', 'ndjson'])
+    args = parser.parse_args()
+    seed(args.rows)
+
+    client = lms.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'admin@gmail.com'
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    resp = client.get(f'/export/books.{args.format}', buffered=False)
+    first = None
+    total = 0
+    for chunk in resp.response:
+        if first is None:
+            first = time.perf_counter() - start
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    resp.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{args.rows:,} rows, {total / 1e6:.1f} MB {args.format}')
+    print(f'first bytes after {first * 1000:.1f} ms, done in {elapsed:.2f}s '
+          f'({args.rows / elapsed:,.0f} rows/s), peak heap {peak / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Load test: SQLite read throughput while writes are in flight.
+
+Runs the same workload twice -- stock settings (rollback journal) and the
+db_profile settings (WAL etc.) -- on a throwaway database: reader threads
+page through the book listing while a writer thread keeps committing
+inventory updates.
+
+Usage:
+    python scripts/bench_sqlite_profile.py [--seconds 5] [--readers 4] [--books 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from sqlalchemy import create_engine, text
+
+import db_profile
+
+
+def make_engine(path, tuned):
+    engine = create_engine(f'sqlite:///{path}', pool_size=16, max_overflow=0,
+                           connect_args={'timeout': 5, 'check_same_thread': False})
+    if tuned:
+        pragmas = [(name, db_profile.PRAGMA_DEFAULTS[key]) for name, key in db_profile._PRAGMAS]
+    else:
+        pragmas = [('journal_mode', 'DELETE'), ('synchronous', 'FULL')]
+    db_profile.install_pragmas(engine, pragmas)
+    return engine
+
+
+def seed(engine, books):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE book (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, '
+                          'author VARCHAR(150), copies INTEGER NOT NULL, available INTEGER NOT NULL)'))
+        conn.execute(text('CREATE INDEX ix_book_title ON book (title, id)'))
+        conn.execute(text('INSERT INTO book (title, author, copies, available) VALUES (:t, :a, 5, 5)'),
+                     [{'t': f'Title {i:07d}', 'a': f'Author {i % 997}'} for i in range(books)])
+
+
+def run(tuned, seconds, readers, books):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = make_engine(path, tuned)
+    seed(engine, books)
+    stop = threading.Event()
+    reads, writes, errors = [0] * readers, [0], []
+
+    def reader(slot):
+        rng = random.Random(slot)
+        while not stop.is_set():
+            start = f'Title {rng.randrange(books):07d}'
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT id, title, available FROM book WHERE title > :t '
+                                      'ORDER BY title, id LIMIT 25'), {'t': start}).fetchall()
+                reads[slot] += 1
+            except Exception as e:
+                errors.append(e)
+
+    def writer():
+        rng = random.Random(-1)
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    for _ in range(20):
+                        conn.execute(text('UPDATE book SET available = (available + 1) % 6 WHERE id = :id'),
+                                     {'id': rng.randrange(1, books + 1)})
+                writes[0] += 1
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return sum(reads) / seconds, writes[0] / seconds, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--books', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'reads/s':>10} {'commits/s':>10} {'errors':>7}")
+    for label, tuned in (('stock', False), ('tuned', True)):
+        reads, writes, errors = run(tuned, args.seconds, args.readers, args.books)
+        print(f'{label:<10} {reads:>10.0f} {writes:>10.0f} {errors:>7}')
+
+
+if __name__ == '__main__':
+    main()
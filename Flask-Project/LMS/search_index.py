@@ -0,0 +1,124 @@
+"""SQLite FTS5 full-text index over the book catalog.
+
+The ``book_fts`` virtual table mirrors ``book.title``, ``book.author`` and
+``book.isbn`` using the book id as its rowid.  Routes that change books call
+``index_book`` / ``remove_book`` / ``clear_index`` inside the same session
+transaction, so the index commits (or rolls back) together with the book rows.
+
+When the database is not SQLite, or SQLite was built without FTS5, ``setup``
+leaves ``app.config['BOOK_FTS_ENABLED']`` False and callers fall back to the
+ILIKE search.
+
+A second table, ``book_text_fts``, holds the text extracted from each book's
+PDF (filled by pdf_pipeline).  ``search_book_ids(..., include_text=True)``
+appends its matches after the title/author/isbn matches.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+FTS_TABLE = 'book_fts'
+TEXT_FTS_TABLE = 'book_text_fts'
+SEARCH_LIMIT = 200
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def setup(app, db):
+    """Create the FTS table if possible and backfill it from ``book``."""
+    enabled = False
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                        "USING fts5(title, author, isbn, tokenize='unicode61')"
+                    ))
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TEXT_FTS_TABLE} "
+                        "USING fts5(body, tokenize='unicode61')"
+                    ))
+                    indexed = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+                    books = conn.execute(text("SELECT count(*) FROM book")).scalar()
+                    if indexed != books:
+                        _rebuild(conn)
+                enabled = True
+            except OperationalError:
+                enabled = False
+    app.config['BOOK_FTS_ENABLED'] = enabled
+    return enabled
+
+
+def _rebuild(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) "
+        "SELECT id, title, coalesce(author, ''), coalesce(isbn, '') FROM book"
+    ))
+
+
+def rebuild_index(session):
+    """Repopulate the whole index from the ``book`` table."""
+    _rebuild(session)
+
+
+def index_book(session, book):
+    """Insert or refresh the index entry for ``book`` (must have an id)."""
+    session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': book.id})
+    session.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) VALUES (:id, :title, :author, :isbn)"),
+        {'id': book.id, 'title': book.title or '', 'author': book.author or '', 'isbn': book.isbn or ''},
+    )
+
+
+def remove_book(session, book_id):
+    session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': book_id})
+    session.execute(text(f"DELETE FROM {TEXT_FTS_TABLE} WHERE rowid = :id"), {'id': book_id})
+
+
+def clear_index(session):
+    session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    session.execute(text(f"DELETE FROM {TEXT_FTS_TABLE}"))
+
+
+def index_book_text(session, book_id, body):
+    """Insert or replace the PDF text indexed for ``book_id``."""
+    session.execute(text(f"DELETE FROM {TEXT_FTS_TABLE} WHERE rowid = :id"), {'id': book_id})
+    session.execute(text(f"INSERT INTO {TEXT_FTS_TABLE} (rowid, body) VALUES (:id, :body)"),
+                    {'id': book_id, 'body': body})
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 prefix query: ``harry pot`` -> ``"harry"* "pot"*``.
+
+    Every token is quoted so user input can never inject FTS5 operators.
+    Returns None when ``q`` contains no searchable tokens.
+    """
+    tokens = _TOKEN_RE.findall(q or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def search_book_ids(session, q, limit=SEARCH_LIMIT, include_text=False):
+    """Return matching book ids, best match first.
+
+    With ``include_text`` books whose PDF text matches follow the catalog
+    matches.
+    """
+    match = build_match_query(q)
+    if match is None:
+        return []
+    ids = []
+    tables = (FTS_TABLE, TEXT_FTS_TABLE) if include_text else (FTS_TABLE,)
+    for table in tables:
+        rows = session.execute(
+            text(f"SELECT rowid FROM {table} WHERE {table} MATCH :match ORDER BY rank LIMIT :limit"),
+            {'match': match, 'limit': limit},
+        )
+        seen = set(ids)
+        ids.extend(r[0] for r in rows if r[0] not in seen)
+    return ids[:limit]
@@ -6,7 +6,7 @@ from typing import Iterable, Tuple, Union
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort
 from functools import wraps
 # ---------------------------------
 # Admin required decorator
@@ -333,11 +333,15 @@ def delete_book(id):
 def buy_book(id):
     if not session.get('user_name') and not session.get('admin'):
         return redirect(url_for('login'))
-    book = Book.query.get_or_404(id)
-    if book.available > 0:
-        book.available -= 1
-        db.session.commit()
+    # conditional UPDATE: concurrent purchases cannot oversell
+    result = db.session.execute(
+        db.update(Book).where(Book.id == id, Book.available > 0).values(available=Book.available - 1)
+    )
+    db.session.commit()
+    if result.rowcount == 1:
         flash('Purchase successful', 'success')
+    elif db.session.get(Book, id) is None:
+        abort(404)
     else:
         flash('Book not available', 'warning')
     return redirect(url_for('our_collection'))
@@ -0,0 +1,67 @@
+import io
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import book_import
+import search_index
+from customer.models import db, Book, Loan
+
+
+class BookImportTest(unittest.TestCase):
+    def setUp(self):
+        lms.app.testing = True
+        with lms.app.app_context():
+            Loan.query.delete()
+            Book.query.delete()
+            search_index.clear_index(db.session)
+            db.session.add(Book(title='Already Here', isbn='111', copies=1, available=1))
+            db.session.commit()
+            search_index.rebuild_index(db.session)
+            db.session.commit()
+        self.client = lms.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+
+    def test_csv_dedupes_validates_and_indexes(self):
+        data = ('Title,Author,ISBN,Copies\n'
+                'Dune,Herbert,222,3\n'
+                'Dune again,Herbert,222,1\n'   # repeats an ISBN from this file
+                'Old,Someone,111,1\n'          # ISBN already in the catalog
+                ',No Title,333,1\n'
+                'Bad Copies,X,444,many\n'
+                'Emma,Austen,,2\n')
+        with lms.app.app_context():
+            records = book_import.iter_records(io.StringIO(data), 'csv')
+            result = book_import.import_books(db.session, records, batch_size=2, fts=True)
+            self.assertEqual((result.inserted, result.duplicates, result.invalid), (2, 2, 2))
+            self.assertEqual(result.errors, ['line 5: missing title', "line 6: copies is not a number: 'many'"])
+            dune = Book.query.filter_by(isbn='222').one()
+            self.assertEqual((dune.copies, dune.available), (3, 3))
+            self.assertEqual(search_index.search_book_ids(db.session, 'austen'),
+                             [Book.query.filter_by(title='Emma').one().id])
+
+    def test_upload_route_jsonl(self):
+        data = b'{"title": "Beloved", "author": "Morrison", "isbn": "555"}\nnot json\n\n{"title": "Ulysses"}\n'
+        resp = self.client.post('/import_books', data={'file': (io.BytesIO(data), 'catalog.jsonl')},
+                                content_type='multipart/form-data')
+        self.assertEqual(resp.status_code, 302)
+        with lms.app.app_context():
+            self.assertEqual(Book.query.count(), 3)
+        with self.client.session_transaction() as sess:
+            messages = [m for _, m in sess['_flashes']]
+        self.assertTrue(messages[0].startswith('2 imported, 0 duplicate ISBN(s) skipped, 1 invalid'))
+        self.assertIn('line 2: not a JSON object', messages)
+
+    def test_rejects_unknown_extension(self):
+        self.client.post('/import_books', data={'file': (io.BytesIO(b'x'), 'books.xlsx')},
+                         content_type='multipart/form-data')
+        with lms.app.app_context():
+            self.assertEqual(Book.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
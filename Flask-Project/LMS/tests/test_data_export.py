@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import data_export
+from customer.models import db, Book, Customer, Loan
+
+
+class DataExportTest(unittest.TestCase):
+    def setUp(self):
+        lms.app.testing = True
+        with lms.app.app_context():
+            Loan.query.delete()
+            Book.query.delete()
+            Customer.query.delete()
+            db.session.add_all([Book(title=f'Book {i:04d}', isbn=str(i), copies=1, available=1)
+                                for i in range(data_export.CHUNK_ROWS + 5)])
+            db.session.add(Customer(name='Ana', email='ana@example.com', gender='f', password='secret-hash'))
+            db.session.commit()
+        self.client = lms.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+
+    def test_books_csv_is_streamed(self):
+        resp = self.client.get('/export/books.csv')
+        self.assertTrue(resp.is_streamed)
+        self.assertEqual(resp.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+        self.assertEqual(len(rows), data_export.CHUNK_ROWS + 5)
+        self.assertEqual(rows[0]['title'], 'Book 0000')
+
+    def test_customers_ndjson_has_no_passwords(self):
+        body = self.client.get('/export/customers.ndjson').get_data(as_text=True)
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(records[0]['email'], 'ana@example.com')
+        self.assertNotIn('password', records[0])
+        self.assertNotIn('secret-hash', body)
+
+    def test_unknown_table_and_non_admin(self):
+        self.assertEqual(self.client.get('/export/loans.csv').status_code, 404)
+        other = lms.app.test_client()
+        self.assertEqual(other.get('/export/books.csv').status_code, 302)
+
+    def test_cli_writes_file(self):
+        out = os.path.join(tempfile.mkdtemp(), 'books.ndjson')
+        result = lms.app.test_cli_runner().invoke(args=['export', 'books', '--format', 'ndjson', '-o', out])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(out, encoding='utf-8') as f:
+            self.assertEqual(sum(1 for _ in f), data_export.CHUNK_ROWS + 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
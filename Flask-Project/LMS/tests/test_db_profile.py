@@ -0,0 +1,25 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+from customer.models import db
+from sqlalchemy import text
+
+
+class SQLiteProfileTest(unittest.TestCase):
+    def test_pragmas_applied_on_connect(self):
+        with lms.app.app_context():
+            with db.engine.connect() as conn:
+                pragma = lambda name: conn.execute(text(f'PRAGMA {name}')).scalar()
+                self.assertEqual(pragma('journal_mode'), 'wal')
+                self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+                self.assertEqual(pragma('busy_timeout'), int(lms.app.config['SQLITE_BUSY_TIMEOUT_MS']))
+                self.assertEqual(pragma('cache_size'), int(lms.app.config['SQLITE_CACHE_SIZE']))
+                self.assertEqual(pragma('temp_store'), 2)  # MEMORY
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import threading
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+from customer.models import db, Book
+
+
+class InventoryConcurrencyTest(unittest.TestCase):
+    COPIES = 25
+    THREADS = 8
+    ATTEMPTS_PER_THREAD = 20
+
+    def setUp(self):
+        with lms.app.app_context():
+            Book.query.delete()
+            book = Book(title='Hot Release', copies=self.COPIES, available=self.COPIES)
+            db.session.add(book)
+            db.session.commit()
+            self.book_id = book.id
+
+    def test_no_oversell_under_concurrent_reservations(self):
+        successes = []
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def worker():
+            start.wait()
+            won = 0
+            try:
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    with lms.app.app_context():
+                        if lms.reserve_copy(self.book_id):
+                            won += 1
+            except Exception as e:  # surface DB errors from worker threads
+                errors.append(e)
+            successes.append(won)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(successes), self.COPIES)
+        with lms.app.app_context():
+            self.assertEqual(db.session.get(Book, self.book_id).available, 0)
+
+    def test_routes_stop_at_zero(self):
+        client = lms.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user'] = 'reader@example.com'
+        for _ in range(self.COPIES + 5):
+            self.assertEqual(client.get(f'/rent_book/{self.book_id}').status_code, 302)
+        with lms.app.app_context():
+            self.assertEqual(db.session.get(Book, self.book_id).available, 0)
+        self.assertEqual(client.get('/buy_book/999999').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+from customer.models import db, Book, Customer, Loan
+
+
+class LoanLedgerTest(unittest.TestCase):
+    def setUp(self):
+        lms.app.testing = True
+        with lms.app.app_context():
+            Loan.query.delete()
+            Book.query.delete()
+            Customer.query.delete()
+            reader = Customer(name='Reader', email='reader@example.com', gender='f')
+            book = Book(title='Ledger Book', copies=2, available=2)
+            db.session.add_all([reader, book])
+            db.session.commit()
+            self.book_id, self.reader_id = book.id, reader.id
+        self.client = lms.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'reader@example.com'
+
+    def available(self):
+        with lms.app.app_context():
+            return db.session.get(Book, self.book_id).available
+
+    def test_rent_and_return(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        self.client.get(f'/buy_book/{self.book_id}')
+        self.assertEqual(self.available(), 0)
+        with lms.app.app_context():
+            loans = Loan.query.order_by(Loan.id).all()
+            self.assertEqual([(l.kind, l.status, l.customer_id) for l in loans],
+                             [('rent', 'active', self.reader_id), ('buy', 'sold', self.reader_id)])
+            rent_id = loans[0].id
+            self.assertIsNotNone(loans[0].due_date)
+
+        html = self.client.get('/my_loans').get_data(as_text=True)
+        self.assertIn('Ledger Book', html)
+
+        self.client.post(f'/return_book/{rent_id}')
+        self.client.post(f'/return_book/{rent_id}')  # double submit is a no-op
+        self.assertEqual(self.available(), 1)
+        with lms.app.app_context():
+            self.assertEqual(db.session.get(Loan, rent_id).status, 'returned')
+            self.assertEqual(lms.ledger_availability()[self.book_id], 1)
+
+    def test_other_customer_cannot_return(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        with lms.app.app_context():
+            loan_id = Loan.query.one().id
+        other = lms.app.test_client()
+        with other.session_transaction() as sess:
+            sess['user'] = 'someone@example.com'
+        other.post(f'/return_book/{loan_id}')
+        self.assertEqual(self.available(), 1)
+
+    def test_deleted_customer_loans_do_not_follow_reused_id(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        admin.post(f'/delete_customer/{self.reader_id}')
+        with lms.app.app_context():
+            self.assertIsNone(Loan.query.one().customer_id)
+            # SQLite hands out the freed id again
+            newcomer = Customer(id=self.reader_id, name='New', email='new@example.com', gender='m')
+            db.session.add(newcomer)
+            db.session.commit()
+        new = lms.app.test_client()
+        with new.session_transaction() as sess:
+            sess['user'] = 'new@example.com'
+        self.assertNotIn('Ledger Book', new.get('/my_loans').get_data(as_text=True))
+        with lms.app.app_context():
+            loan_id = Loan.query.one().id
+        new.post(f'/return_book/{loan_id}')
+        self.assertEqual(self.available(), 1)
+
+    def test_delete_all_customers_unlinks_loans(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        admin.post('/delete_all_customers')
+        with lms.app.app_context():
+            self.assertEqual(Customer.query.count(), 0)
+            self.assertIsNone(Loan.query.one().customer_id)
+
+    def test_deleting_book_keeps_loan_history(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        self.client.get(f'/buy_book/{self.book_id}')
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        admin.post(f'/delete_book/{self.book_id}')
+        with lms.app.app_context():
+            self.assertIsNone(db.session.get(Book, self.book_id))
+            loans = Loan.query.order_by(Loan.id).all()
+            self.assertEqual([(l.kind, l.book_id, l.customer_id) for l in loans],
+                             [('rent', None, self.reader_id), ('buy', None, self.reader_id)])
+        html = self.client.get('/my_loans').get_data(as_text=True)
+        self.assertEqual(html.count('Deleted book'), 2)
+
+        with lms.app.app_context():
+            loan_id = Loan.query.filter_by(kind='rent').one().id
+        self.client.post(f'/return_book/{loan_id}')
+        with lms.app.app_context():
+            self.assertEqual(db.session.get(Loan, loan_id).status, 'returned')
+
+        admin.get(f'/rent_book/{self.book_id}')  # no such book any more
+        with lms.app.app_context():
+            self.assertEqual(Loan.query.count(), 2)
+
+    def test_delete_all_books_keeps_loan_history(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        admin.post('/delete_all_books')
+        with lms.app.app_context():
+            self.assertEqual(Book.query.count(), 0)
+            self.assertIsNone(Loan.query.one().book_id)
+
+    def test_user_without_customer_row_sees_no_unassigned_loans(self):
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        admin.get(f'/rent_book/{self.book_id}')  # admin is not a Customer: loan has no customer
+        ghost = lms.app.test_client()
+        with ghost.session_transaction() as sess:
+            sess['user'] = 'ghost@example.com'
+        self.assertNotIn('Ledger Book', ghost.get('/my_loans').get_data(as_text=True))
+        with lms.app.app_context():
+            loan_id = Loan.query.one().id
+        ghost.post(f'/return_book/{loan_id}')
+        self.assertEqual(self.available(), 1)
+        with lms.app.app_context():
+            self.assertEqual(db.session.get(Loan, loan_id).status, 'active')
+
+    def test_overdue_report(self):
+        self.client.get(f'/rent_book/{self.book_id}')
+        self.client.get(f'/rent_book/{self.book_id}')
+        with lms.app.app_context():
+            late = Loan.query.order_by(Loan.id).first()
+            late.due_date = lms._utcnow() - timedelta(days=1)
+            db.session.commit()
+        admin = lms.app.test_client()
+        with admin.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        html = admin.get('/overdue').get_data(as_text=True)
+        self.assertEqual(html.count('(overdue)'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import smtplib
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+os.environ['LMS_MAIL_WORKER'] = '0'
+
+import app as lms
+import mail_queue
+from customer.models import db, Customer, OutboxMessage
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records traffic instead of sending."""
+    instances = []
+    fail_next = 0
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.logins = 0
+        FakeSMTP.instances.append(self)
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        return 250, b'OK'
+
+    def sendmail(self, sender, recipients, message):
+        if FakeSMTP.fail_next:
+            FakeSMTP.fail_next -= 1
+            raise smtplib.SMTPDataError(451, b'try later')
+        self.sent.append((sender, recipients, message))
+
+    def quit(self):
+        pass
+
+
+class MailQueueTest(unittest.TestCase):
+    def setUp(self):
+        FakeSMTP.instances = []
+        FakeSMTP.fail_next = 0
+        self.client = lms.app.test_client()
+        lms.app.testing = True
+        lms.app.config['MAIL_WORKER_ENABLED'] = False
+        self.ctx = lms.app.app_context()
+        self.ctx.push()
+        OutboxMessage.query.delete()
+        Customer.query.delete()
+        db.session.commit()
+        self.session = mail_queue.SMTPSession('localhost', 1025, 'library@example.com', 'secret',
+                                              starttls=False, smtp_class=FakeSMTP)
+
+    def tearDown(self):
+        db.session.rollback()
+        self.ctx.pop()
+
+    def test_registration_only_queues_mail(self):
+        resp = self.client.post('/sign_up', data={
+            'full-name': 'Ann', 'email': 'ann@example.com', 'password': 'pw', 'gender': 'f', 'mobile': '123',
+        })
+        self.assertEqual(resp.status_code, 302)
+        msg = OutboxMessage.query.one()
+        self.assertEqual((msg.recipients, msg.status), ('ann@example.com', 'pending'))
+        self.assertEqual(FakeSMTP.instances, [])
+
+    def test_batch_reuses_one_session(self):
+        for i in range(5):
+            mail_queue.enqueue_mail(f'user{i}@example.com', 'Hi', 'Body')
+        self.assertEqual(mail_queue.process_outbox(self.session), (5, 0))
+        self.assertEqual(self.session.connects, 1)
+        self.assertEqual(FakeSMTP.instances[0].logins, 1)
+        self.assertEqual(len(FakeSMTP.instances[0].sent), 5)
+        self.assertEqual({m.status for m in OutboxMessage.query}, {'sent'})
+
+    def test_failure_backs_off_then_gives_up(self):
+        msg = mail_queue.enqueue_mail('bob@example.com', 'Hi', 'Body')
+        FakeSMTP.fail_next = 1
+        self.assertEqual(mail_queue.process_outbox(self.session), (0, 1))
+        db.session.refresh(msg)
+        self.assertEqual((msg.status, msg.attempts), ('pending', 1))
+        self.assertGreater(msg.next_attempt_at, mail_queue._now())
+        # not due yet
+        self.assertEqual(mail_queue.process_outbox(self.session), (0, 0))
+
+        FakeSMTP.fail_next = mail_queue.MAX_ATTEMPTS
+        for _ in range(mail_queue.MAX_ATTEMPTS - 1):
+            msg.next_attempt_at = mail_queue._now()
+            db.session.commit()
+            mail_queue.process_outbox(self.session)
+        db.session.refresh(msg)
+        self.assertEqual((msg.status, msg.attempts), ('failed', mail_queue.MAX_ATTEMPTS))
+        self.assertIn('try later', msg.last_error)
+
+    def test_missing_password_sends_nothing(self):
+        saved = os.environ.pop('SMTP_SENDER_PASSWORD', None)
+        try:
+            self.assertEqual(mail_queue.smtp_settings()['password'], '')
+            msg = mail_queue.enqueue_mail('bob@example.com', 'Hi', 'Body')
+            worker = mail_queue.MailWorker(lms.app)
+            with self.assertLogs(lms.app.logger, 'ERROR') as logs:
+                worker.run()
+            self.assertIn('SMTP_SENDER_PASSWORD', logs.output[0])
+            db.session.refresh(msg)
+            self.assertEqual((msg.status, msg.attempts), ('pending', 0))
+
+            os.environ['SMTP_SENDER_PASSWORD'] = ''  # a server without AUTH
+            self.assertTrue(mail_queue.MailWorker(lms.app).configured)
+        finally:
+            os.environ.pop('SMTP_SENDER_PASSWORD', None)
+            if saved is not None:
+                os.environ['SMTP_SENDER_PASSWORD'] = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import migrations
+from sqlalchemy import create_engine, inspect, text
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'm.db'))
+
+    def index_names(self, table):
+        with self.engine.connect() as conn:
+            return {r[0] for r in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=:t"), {'t': table})}
+
+    def test_fresh_database(self):
+        self.assertEqual(migrations.upgrade(self.engine), [v for v, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.upgrade(self.engine), [])
+        self.assertEqual(migrations.pending(self.engine), [])
+        self.assertTrue({'ix_book_title', 'ix_book_author'} <= self.index_names('book'))
+        self.assertIn('ix_customer_email_lower', self.index_names('customer'))
+
+    def test_upgrades_legacy_database(self):
+        # the schema before pdf_url, created by db.create_all() with no version table
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE customer (id INTEGER PRIMARY KEY, name VARCHAR(100), '
+                              'email VARCHAR(100) UNIQUE, gender VARCHAR(10), password VARCHAR(200))'))
+            conn.execute(text('CREATE TABLE book (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, '
+                              'author VARCHAR(150), isbn VARCHAR(50) UNIQUE, copies INTEGER NOT NULL, '
+                              'available INTEGER NOT NULL)'))
+            conn.execute(text("INSERT INTO book (title, copies, available) VALUES ('Old', 1, 1)"))
+        migrations.upgrade(self.engine)
+        columns = [c['name'] for c in inspect(self.engine).get_columns('book')]
+        self.assertIn('pdf_url', columns)
+        self.assertTrue(inspect(self.engine).has_table('loan'))
+        self.assertIn('ix_book_title', self.index_names('book'))
+        with self.engine.connect() as conn:
+            plan = ' '.join(str(r[-1]) for r in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM customer WHERE lower(email) = 'a@b.c'")))
+            self.assertEqual(conn.execute(text('SELECT title FROM book')).scalar(), 'Old')
+        self.assertIn('ix_customer_email_lower', plan)
+
+    def test_step_one_creates_no_secondary_indexes(self):
+        migrations.upgrade(self.engine, target=1)
+        self.assertEqual(self.index_names('book') & {'ix_book_title', 'ix_book_author'}, set())
+        self.assertNotIn('ix_customer_email_lower', self.index_names('customer'))
+
+    def test_migrated_schema_matches_models(self):
+        migrations.upgrade(self.engine)
+        schema = inspect(self.engine)
+        for table in lms.db.metadata.sorted_tables:
+            self.assertEqual({c['name'] for c in schema.get_columns(table.name)},
+                             set(table.columns.keys()), table.name)
+            self.assertLessEqual({ix.name for ix in table.indexes}, self.index_names(table.name),
+                                 table.name)
+            nullable = {c['name']: c['nullable'] for c in schema.get_columns(table.name)}
+            self.assertEqual(nullable, {c.name: c.nullable for c in table.columns}, table.name)
+
+    def test_loan_book_id_made_nullable_keeping_rows(self):
+        migrations.upgrade(self.engine, target=4)
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO book (id, title, copies, available) VALUES (7, 'Kept', 1, 0)"))
+            conn.execute(text("INSERT INTO loan (book_id, kind, status, created_at) "
+                              "VALUES (7, 'rent', 'active', '2024-01-01 00:00:00')"))
+        self.assertEqual(migrations.upgrade(self.engine), [5])
+        book_id = next(c for c in inspect(self.engine).get_columns('loan') if c['name'] == 'book_id')
+        self.assertTrue(book_id['nullable'])
+        self.assertEqual(self.index_names('loan'),
+                         {'ix_loan_customer_status', 'ix_loan_book_due', 'ix_loan_status_due'})
+        with self.engine.begin() as conn:
+            self.assertEqual(conn.execute(text('SELECT book_id, status FROM loan')).all(), [(7, 'active')])
+            conn.execute(text('UPDATE loan SET book_id = NULL'))
+
+    def test_target_version(self):
+        self.assertEqual(migrations.upgrade(self.engine, target=1), [1])
+        self.assertEqual([v for v, _ in migrations.pending(self.engine)][0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
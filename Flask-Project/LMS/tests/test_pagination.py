@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+from customer.models import db, Book
+from pagination import paginate, page_size, decode_cursor, encode_cursor, MAX_PAGE_SIZE
+
+
+class KeysetPaginationTest(unittest.TestCase):
+    def setUp(self):
+        self.ctx = lms.app.app_context()
+        self.ctx.push()
+        Book.query.delete()
+        # duplicate titles make sure the id tie-breaker is honoured
+        for i in range(23):
+            db.session.add(Book(title=f'Title {i // 2:02d}', copies=1, available=1))
+        db.session.commit()
+        self.expected = [(b.title, b.id) for b in Book.query.order_by(Book.title, Book.id)]
+
+    def tearDown(self):
+        db.session.rollback()
+        self.ctx.pop()
+
+    def keys(self, page):
+        return [(b.title, b.id) for b in page]
+
+    def test_walk_forward_and_back(self):
+        cols = (Book.title, Book.id)
+        pages = []
+        page = paginate(Book.query, cols, per_page=5)
+        self.assertIsNone(page.prev_cursor)
+        while True:
+            pages.append(page)
+            if not page.next_cursor:
+                break
+            page = paginate(Book.query, cols, cursor=page.next_cursor, per_page=5)
+        self.assertEqual([k for p in pages for k in self.keys(p)], self.expected)
+        self.assertEqual([len(p) for p in pages], [5, 5, 5, 5, 3])
+
+        back = paginate(Book.query, cols, cursor=pages[-1].prev_cursor, per_page=5)
+        self.assertEqual(self.keys(back), self.keys(pages[-2]))
+        first = paginate(Book.query, cols, cursor=pages[1].prev_cursor, per_page=5)
+        self.assertEqual(self.keys(first), self.keys(pages[0]))
+        self.assertIsNone(first.prev_cursor)
+
+    def test_bad_cursor_and_page_size(self):
+        self.assertEqual(decode_cursor('not-a-cursor', 2), (None, 'next'))
+        page = paginate(Book.query, (Book.title, Book.id), cursor='garbage', per_page=5)
+        self.assertEqual(self.keys(page), self.expected[:5])
+        self.assertEqual(page_size('1000'), MAX_PAGE_SIZE)
+        self.assertEqual(page_size('0'), 1)
+        self.assertEqual(page_size(None), 25)
+
+    def test_cursor_with_non_scalar_key(self):
+        bad = encode_cursor([[1], {'a': 2}], 'next')
+        self.assertEqual(decode_cursor(bad, 2), (None, 'next'))
+        page = paginate(Book.query, (Book.title, Book.id), cursor=bad, per_page=5)
+        self.assertEqual(self.keys(page), self.expected[:5])
+        self.assertEqual(decode_cursor(encode_cursor(['Title 03', None], 'prev'), 2),
+                         (['Title 03', None], 'prev'))
+
+
+if __name__ == '__main__':
+    unittest.main()
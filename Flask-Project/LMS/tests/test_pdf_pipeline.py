@@ -0,0 +1,107 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import pdf_pipeline
+import search_index
+from customer.models import db, Book, Loan, PdfJob
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+
+def make_pdf(text):
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@unittest.skipIf(pymupdf is None, 'PyMuPDF not installed')
+class PdfPipelineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = pdf_pipeline.make_executor(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        lms.app.testing = True
+        self.store = tempfile.mkdtemp()
+        lms.app.config['PDF_STORE_DIR'] = self.store
+        lms.app.config['PDF_WORKER_ENABLED'] = False
+        with lms.app.app_context():
+            Loan.query.delete()
+            Book.query.delete()
+            PdfJob.query.delete()
+            search_index.clear_index(db.session)
+            db.session.commit()
+        self.client = lms.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+
+    def tearDown(self):
+        shutil.rmtree(self.store)
+
+    def add(self, title, data):
+        self.client.post('/add_book', data={'title': title, 'copies': '1', 'pdf': (io.BytesIO(data), 'b.pdf')},
+                         content_type='multipart/form-data')
+        with lms.app.app_context():
+            return Book.query.filter_by(title=title).one()
+
+    def run_jobs(self):
+        with lms.app.app_context():
+            return pdf_pipeline.process_jobs(self.executor, 10)
+
+    def test_thumbnail_text_and_search(self):
+        data = make_pdf('photosynthesis chlorophyll')
+        book = self.add('Plain Cover', data)
+        with lms.app.app_context():
+            self.assertEqual(PdfJob.query.one().status, 'pending')
+        self.assertEqual(self.run_jobs(), (1, 0))
+
+        with lms.app.app_context():
+            job = PdfJob.query.one()
+            self.assertEqual((job.status, job.pages), ('done', 1))
+            self.assertEqual(search_index.search_book_ids(db.session, 'chlorophyll', include_text=True), [book.id])
+            self.assertEqual(search_index.search_book_ids(db.session, 'chlorophyll'), [])
+        resp = self.client.get(f'/pdf/{book.pdf_digest}.png')
+        self.assertEqual(resp.mimetype, 'image/png')
+        self.assertTrue(resp.data.startswith(b'\x89PNG'))
+        self.assertIn('immutable', resp.headers['Cache-Control'])
+        self.assertIn(b'photosynthesis', self.client.get(f'/pdf/{book.pdf_digest}.txt').data)
+        self.assertIn(f'/pdf/{book.pdf_digest}.png', self.client.get('/our_collection').get_data(as_text=True))
+
+        # the same file on another book: no new job, text indexed right away
+        twin = self.add('Twin', data)
+        with lms.app.app_context():
+            self.assertEqual(PdfJob.query.count(), 1)
+            self.assertIn(twin.id, search_index.search_book_ids(db.session, 'chlorophyll', include_text=True))
+
+    def test_broken_pdf_fails_and_shows_on_dashboard(self):
+        self.add('Broken', b'%PDF-1.4 this is not really a pdf')
+        with lms.app.app_context():
+            PdfJob.query.update({'attempts': pdf_pipeline.MAX_ATTEMPTS - 1})
+            db.session.commit()
+        self.assertEqual(self.run_jobs(), (0, 1))
+        with lms.app.app_context():
+            job = PdfJob.query.one()
+            self.assertEqual(job.status, 'failed')
+            self.assertTrue(job.last_error)
+        html = self.client.get('/admin/dashboard').get_data(as_text=True)
+        self.assertIn('failed: <strong>1</strong>', html)
+        self.assertIn(job.digest[:12], html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import pdf_store
+from customer.models import db, Book, Loan
+
+PDF = b'%PDF-1.4\n' + b'0123456789' * 1000 + b'\n%%EOF\n'
+
+
+class PdfStoreTest(unittest.TestCase):
+    def setUp(self):
+        lms.app.testing = True
+        self.store = tempfile.mkdtemp()
+        self.legacy = tempfile.mkdtemp()
+        lms.app.config['PDF_STORE_DIR'] = self.store
+        lms.app.config['UPLOAD_FOLDER'] = self.legacy
+        lms.app.config['PDF_WORKER_ENABLED'] = False
+        with lms.app.app_context():
+            Loan.query.delete()
+            Book.query.delete()
+            db.session.commit()
+        self.client = lms.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+
+    def tearDown(self):
+        shutil.rmtree(self.store)
+        shutil.rmtree(self.legacy)
+
+    def add(self, title, data, filename):
+        self.client.post('/add_book', data={'title': title, 'copies': '1', 'pdf': (io.BytesIO(data), filename)},
+                         content_type='multipart/form-data')
+        with lms.app.app_context():
+            return Book.query.filter_by(title=title).one().pdf_url
+
+    def stored_files(self):
+        return [f for _, _, files in os.walk(self.store) for f in files]
+
+    def test_same_pdf_is_stored_once(self):
+        first = self.add('One', PDF, 'book.pdf')
+        second = self.add('Two', PDF, 'copy.pdf')
+        other = self.add('Three', PDF + b' ', 'book.pdf')  # same name, different bytes
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_serving_etag_and_range(self):
+        url = self.add('One', PDF, 'book.pdf')
+        resp = self.client.get(url)
+        self.assertEqual(resp.data, PDF)
+        self.assertEqual(resp.mimetype, 'application/pdf')
+        self.assertIn('immutable', resp.headers['Cache-Control'])
+        etag = resp.headers['ETag']
+        resp.close()
+
+        resp = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.get(url, headers={'Range': 'bytes=0-7'})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.data, b'%PDF-1.4')
+        resp.close()
+
+        self.assertEqual(self.client.get('/pdf/' + 'a' * 64 + '.pdf').status_code, 404)
+        self.assertEqual(self.client.get('/pdf/..%2Fapp.pdf').status_code, 404)
+
+    def test_content_decides_not_the_name(self):
+        self.assertIsNone(self.add('Fake', b'<html>not a pdf</html>', 'fake.pdf'))
+        self.assertIsNotNone(self.add('Renamed', PDF, 'scan.bin'))
+        self.assertEqual(len(self.stored_files()), 1)  # no leftover .part file
+
+    def test_size_cap(self):
+        lms.app.config['PDF_MAX_BYTES'] = len(PDF) - 1
+        try:
+            resp = self.client.post('/upload_pdf', data={'pdf': (io.BytesIO(PDF), 'big.pdf')},
+                                    content_type='multipart/form-data')
+        finally:
+            lms.app.config['PDF_MAX_BYTES'] = 50 * 1024 * 1024
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self.stored_files(), [])
+        with self.client.session_transaction() as sess:
+            self.assertIn('Upload too large', sess['_flashes'][-1][1])
+
+    def test_streamed_upload_lands_in_store(self):
+        resp = self.client.post('/upload_pdf', data={'pdf': (io.BytesIO(PDF), 'a.pdf')},
+                                content_type='multipart/form-data')
+        self.assertIn(b'/pdf/', resp.data)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_migrate_legacy_static_pdf(self):
+        with open(os.path.join(self.legacy, 'old.pdf'), 'wb') as f:
+            f.write(PDF)
+        with lms.app.app_context():
+            db.session.add(Book(title='Legacy', copies=1, available=1, pdf_url='/static/pdfs/old.pdf'))
+            db.session.commit()
+        result = lms.app.test_cli_runner().invoke(args=['pdf-store-migrate'])
+        self.assertIn('1 book(s)', result.output)
+        with lms.app.app_context():
+            url = Book.query.filter_by(title='Legacy').one().pdf_url
+        self.assertTrue(pdf_store.is_digest(url.rsplit('/', 1)[1][:-4]))
+        self.assertEqual(self.client.get(url).data, PDF)
+
+
+if __name__ == '__main__':
+    unittest.main()
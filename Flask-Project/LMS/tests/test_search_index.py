@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('LMS_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test_lms.db'))
+
+import app as lms
+import search_index
+from customer.models import db, Book
+
+
+class BookSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.client = lms.app.test_client()
+        lms.app.testing = True
+        with self.client.session_transaction() as sess:
+            sess['user'] = 'admin@gmail.com'
+        with lms.app.app_context():
+            Book.query.delete()
+            search_index.clear_index(db.session)
+            db.session.commit()
+
+    def add(self, title, author, isbn):
+        return self.client.post('/add_book', data={'title': title, 'author': author, 'isbn': isbn, 'copies': '1'})
+
+    def search_ids(self, q):
+        with lms.app.app_context():
+            return search_index.search_book_ids(db.session, q)
+
+    def test_match_query_quotes_tokens(self):
+        self.assertEqual(search_index.build_match_query('harry pot'), '"harry"* "pot"*')
+        self.assertEqual(search_index.build_match_query('OR "* -'), '"OR"*')
+        self.assertIsNone(search_index.build_match_query('  -- '))
+
+    def test_index_follows_add_update_delete(self):
+        self.assertTrue(lms.app.config['BOOK_FTS_ENABLED'])
+        self.add('Harry Potter', 'J. K. Rowling', '9780747532699')
+        self.add('The Hobbit', 'Tolkien', '9780261102217')
+        with lms.app.app_context():
+            hobbit = Book.query.filter_by(title='The Hobbit').first().id
+        self.assertEqual(len(self.search_ids('pott')), 1)
+        self.assertEqual(self.search_ids('tolk'), [hobbit])
+        self.assertEqual(self.search_ids('97802611'), [hobbit])
+
+        self.client.post(f'/update_book/{hobbit}', data={'title': 'The Silmarillion', 'author': 'Tolkien', 'copies': '1'})
+        self.assertEqual(self.search_ids('hobbit'), [])
+        self.assertEqual(self.search_ids('silma'), [hobbit])
+
+        self.client.post(f'/delete_book/{hobbit}')
+        self.assertEqual(self.search_ids('tolkien'), [])
+
+        self.client.post('/delete_all_books')
+        self.assertEqual(self.search_ids('harry'), [])
+
+    def test_our_collection_uses_index(self):
+        self.add('Dune', 'Frank Herbert', None)
+        self.add('Emma', 'Jane Austen', None)
+        html = self.client.get('/our_collection?q=herb').get_data(as_text=True)
+        self.assertIn('Dune', html)
+        self.assertNotIn('Emma', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+"""Model backends for chatbot.py, selected with ``CHATBOT_BACKEND``.
+
+=============  ==========================================  ===========================
+backend        model (``CHATBOT_MODEL``)                    needs
+=============  ==========================================  ===========================
+hf-endpoint    Hub repo id, remote inference (default)      langchain-huggingface
+llamacpp       path to a quantized GGUF file, local CPU     llama-cpp-python
+transformers   Hub repo id of a small chat model, local     transformers, torch
+stub           offline fake (stub_llm.py)                   -
+=============  ==========================================  ===========================
+
+Every backend returns an object with ``invoke(prompt)`` and
+``stream(prompt)`` whose results have ``.content``, like ``ChatHuggingFace``,
+plus a ``model_id`` used by the response cache.  Those that can generate
+for several prompts at once also have ``batch(prompts)`` (server.py uses
+it).  Local models are loaded once per process by ``load_model`` and reused
+for every turn; a quantized 1-7B GGUF model on llama.cpp answers without
+any network round trip.
+
+``CHATBOT_MAX_NEW_TOKENS`` caps reply length (local default 256, endpoint
+default its own) and ``CHATBOT_THREADS`` the CPU threads of the local
+backends (default: all cores).
+"""
+import os
+import threading
+
+DEFAULT_MODELS = {
+    "hf-endpoint": "mistralai/Mistral-7B-Instruct-v0.2",
+    "llamacpp": os.path.join(os.path.dirname(os.path.abspath(__file__)), "models",
+                             "mistral-7b-instruct-v0.2.Q4_K_M.gguf"),
+    "transformers": "Qwen/Qwen2.5-0.5B-Instruct",
+    "stub": "stub",
+}
+
+LOCAL_MAX_NEW_TOKENS = 256
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class LlamaCppChat:
+    """A GGUF model run in-process by llama.cpp."""
+
+    def __init__(self, model_path, max_new_tokens=256, threads=None, n_ctx=4096):
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise RuntimeError("the llamacpp backend needs llama-cpp-python (pip install llama-cpp-python)")
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"GGUF model not found: {model_path} (set CHATBOT_MODEL)")
+        self.model_id = "llamacpp:" + os.path.basename(model_path)
+        self.max_new_tokens = max_new_tokens
+        self._llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=threads or os.cpu_count(), verbose=False)
+        self._lock = threading.Lock()  # one generation at a time per model
+
+    def _messages(self, prompt):
+        return [{"role": "user", "content": prompt}]
+
+    def invoke(self, prompt):
+        with self._lock:
+            result = self._llm.create_chat_completion(self._messages(prompt), max_tokens=self.max_new_tokens)
+        return Message(result["choices"][0]["message"]["content"] or "")
+
+    def stream(self, prompt):
+        with self._lock:
+            for part in self._llm.create_chat_completion(self._messages(prompt), max_tokens=self.max_new_tokens,
+                                                         stream=True):
+                text = part["choices"][0]["delta"].get("content")
+                if text:
+                    yield Message(text)
+
+
+class TransformersChat:
+    """A small Hub chat model run on CPU with a transformers pipeline."""
+
+    def __init__(self, repo_id, max_new_tokens=256, threads=None):
+        try:
+            import torch
+            from transformers import pipeline
+        except ImportError:
+            raise RuntimeError("the transformers backend needs transformers and torch (pip install transformers torch)")
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_id = "transformers:" + repo_id
+        self.max_new_tokens = max_new_tokens
+        self._pipe = pipeline("text-generation", model=repo_id, device=-1, torch_dtype="auto")
+        self._lock = threading.Lock()
+
+    def _chat_text(self, prompt):
+        tokenizer = self._pipe.tokenizer
+        if getattr(tokenizer, "chat_template", None):
+            return tokenizer.apply_chat_template([{"role": "user", "content": prompt}],
+                                                 tokenize=False, add_generation_prompt=True)
+        return prompt
+
+    def _inputs(self, prompt):
+        return self._pipe.tokenizer(self._chat_text(prompt), return_tensors="pt")
+
+    def invoke(self, prompt):
+        return Message("".join(chunk.content for chunk in self.stream(prompt)))
+
+    def batch(self, prompts):
+        """Generate replies to several prompts in one padded forward pass."""
+        tokenizer = self._pipe.tokenizer
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"  # decoder-only: pad before the prompt
+        texts = [self._chat_text(p) for p in prompts]
+        inputs = tokenizer(texts, return_tensors="pt", padding=True)
+        with self._lock:
+            output = self._pipe.model.generate(**inputs, max_new_tokens=self.max_new_tokens, do_sample=False,
+                                               pad_token_id=tokenizer.pad_token_id)
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        return [Message(text) for text in tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+    def stream(self, prompt):
+        from transformers import TextIteratorStreamer
+
+        streamer = TextIteratorStreamer(self._pipe.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        inputs = self._inputs(prompt)
+        with self._lock:
+            worker = threading.Thread(target=self._pipe.model.generate, kwargs=dict(
+                **inputs, streamer=streamer, max_new_tokens=self.max_new_tokens, do_sample=False))
+            worker.start()
+            for text in streamer:
+                if text:
+                    yield Message(text)
+            worker.join()
+
+
+def _hf_endpoint(model, max_new_tokens, threads):
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    options = {"max_new_tokens": max_new_tokens} if max_new_tokens else {}
+    llm = HuggingFaceEndpoint(
+        repo_id=model,
+        task="text-generation",
+        **options,
+        # temperature=0.3,
+    )
+    chat = ChatHuggingFace(llm=llm)
+    return chat, model
+
+
+def _stub(model, max_new_tokens, threads):
+    from stub_llm import StubChatModel
+
+    return StubChatModel(base_latency=0.3, token_latency=0.03), "stub"
+
+
+def _local(cls):
+    def load(model, max_new_tokens, threads):
+        chat = cls(model, max_new_tokens=max_new_tokens or LOCAL_MAX_NEW_TOKENS, threads=threads)
+        return chat, chat.model_id
+    return load
+
+
+BACKENDS = {
+    "hf-endpoint": _hf_endpoint,
+    "llamacpp": _local(LlamaCppChat),
+    "transformers": _local(TransformersChat),
+    "stub": _stub,
+}
+
+
+def load_model(backend, model=None, max_new_tokens=None, threads=None):
+    """``(chat model, model id)`` for ``backend``, loaded once per process."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    model = model or DEFAULT_MODELS[backend]
+    key = (backend, model, max_new_tokens, threads)
+    with _load_lock:
+        if key not in _loaded:
+            _loaded[key] = BACKENDS[backend](model, max_new_tokens, threads)
+        return _loaded[key]
+
+
+def from_env():
+    """``load_model`` configured by the ``CHATBOT_*`` environment variables."""
+    threads = os.getenv("CHATBOT_THREADS")
+    max_new_tokens = os.getenv("CHATBOT_MAX_NEW_TOKENS")
+    return load_model(
+        os.getenv("CHATBOT_BACKEND", "hf-endpoint"),
+        model=os.getenv("CHATBOT_MODEL") or None,
+        max_new_tokens=int(max_new_tokens) if max_new_tokens else None,
+        threads=int(threads) if threads else None,
+    )
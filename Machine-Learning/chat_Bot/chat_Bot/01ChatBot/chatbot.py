@@ -1,33 +1,72 @@
+import atexit
+import os
+import time
 
-
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langchain_core.messages import SystemMessage, HumanMessage
 from dotenv import load_dotenv
 
+import backends
+import response_cache
+from history import ChatHistory, llm_summarizer
+from streaming import StatsLog, run_turn
+
 load_dotenv()
 
+# prompt budget in (estimated) tokens; older turns are summarized, see history.py
+MAX_PROMPT_TOKENS = int(os.getenv("CHATBOT_MAX_PROMPT_TOKENS", "2048"))
+SUMMARY_TOKENS = int(os.getenv("CHATBOT_SUMMARY_TOKENS", "256"))
+# "extractive" (free) or "llm" (one extra model call every few turns)
+SUMMARY_MODE = os.getenv("CHATBOT_SUMMARY", "extractive")
+# print the reply as it is generated (CHATBOT_STREAM=0: wait for all of it)
+STREAM = os.getenv("CHATBOT_STREAM", "1") == "1"
+# print time-to-first-token and tokens/sec after every streamed reply
+SHOW_STATS = os.getenv("CHATBOT_STATS", "0") == "1"
+# replies to repeated prompts come from disk (CHATBOT_CACHE=0 to disable)
+cache = response_cache.from_env()
+
 
-llm = HuggingFaceEndpoint(
-    repo_id="mistralai/Mistral-7B-Instruct-v0.2",
-    task="text-generation",
-    # max_new_tokens=256,
-    # temperature=0.3,
+# CHATBOT_BACKEND / CHATBOT_MODEL pick the model: the remote HF endpoint by
+# default, llama.cpp or transformers on the local CPU, or the offline stub;
+# see backends.py
+started = time.perf_counter()
+model, MODEL_ID = backends.from_env()
+print(f"model: {MODEL_ID} (ready in {time.perf_counter() - started:.1f} s)")
+
+chat_history = ChatHistory(
+    "You are a concise AI assistant.",
+    max_tokens=MAX_PROMPT_TOKENS,
+    summary_tokens=SUMMARY_TOKENS,
 )
+if SUMMARY_MODE == "llm":
+    chat_history.summarize = llm_summarizer(model)
+
+stats_log = StatsLog()
 
-model = ChatHuggingFace(llm=llm)
 
-chat_history = [SystemMessage(content="You are a concise AI assistant.")]
+def _on_exit():
+    if STREAM and SHOW_STATS:
+        print(stats_log.summary())
+    if cache is not None:
+        print(cache.stats)
+        cache.close()
+
+
+atexit.register(_on_exit)
 
 while True:
     user_input = input("You: -> ")
     if user_input.lower() == "exit":
         break
 
-    chat_history.append(HumanMessage(content=user_input))
-
-    prompt = "\n".join([msg.content for msg in chat_history])
-
-    result = model.invoke(prompt)
-    print("AI ->", result.content.strip())
-
-    chat_history.append(SystemMessage(content=result.content.strip()))
+    print("AI -> ", end="", flush=True)
+    try:
+        reply, stats = run_turn(model, chat_history, user_input, stream=STREAM,
+                                cache=cache, model_id=MODEL_ID)
+    except KeyboardInterrupt:
+        # Ctrl-C cancels this reply only; the turn is dropped from the history
+        print("\n(reply cancelled)")
+        continue
+    print()
+    if stats is not None:
+        stats_log.add(stats)
+        if SHOW_STATS:
+            print(f"   [{stats}]")
@@ -0,0 +1,168 @@
+"""Token-budgeted chat history for chatbot.py.
+
+Joining every message of the session into the prompt makes each turn slower
+than the last, and sooner or later the prompt no longer fits the model's
+context.  ``ChatHistory`` keeps the prompt under ``max_tokens``:
+
+* the newest messages are kept verbatim (the sliding window);
+* when the window overflows, the oldest messages are folded into a running
+  summary that is capped at ``summary_tokens``.
+
+Eviction is done in one go down to ``low_water`` of the budget, not one
+message per turn, so a (possibly expensive) summarizer runs only every few
+turns.  The prompt text is kept up to date as messages come and go: each
+message is counted once when added, and a turn never walks the whole
+session, so building the prompt costs the same on turn 200 as on turn 5.
+
+Token counts are estimated (``approx_tokens``: about 4 characters per token)
+unless a real tokenizer is passed as ``count_tokens``.
+"""
+import re
+from collections import deque
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def approx_tokens(text):
+    """Rough token count: ~4 characters per token for English text."""
+    return len(text) // 4 + 1
+
+
+def hf_token_counter(repo_id):
+    """Exact counts with the model's own tokenizer (needs ``transformers``)."""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(repo_id)
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def _gist(text, max_words=25):
+    """First sentence of ``text``, cut to ``max_words`` words."""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    words = first.split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+
+
+def extractive_summary(summary, evicted, max_tokens, count_tokens=approx_tokens):
+    """Default summarizer: one line per evicted message, oldest lines dropped.
+
+    ``evicted`` is a list of ``(role, text)``.  No model call, so it is free,
+    but it only remembers the gist (first sentence) of each message.
+    """
+    lines = summary.splitlines() if summary else []
+    lines += [f"{role}: {_gist(text)}" for role, text in evicted]
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def llm_summarizer(model):
+    """Summarizer that asks ``model`` to fold evicted messages into the summary."""
+    def summarize(summary, evicted, max_tokens, count_tokens=approx_tokens):
+        transcript = "\n".join(f"{role}: {text}" for role, text in evicted)
+        prompt = (
+            f"Update the summary of a conversation in at most {max_tokens * 3 // 4} words. "
+            "Keep names, facts and open questions.\n"
+            f"Current summary:\n{summary or '(none)'}\n"
+            f"New messages:\n{transcript}\n"
+            "Updated summary:"
+        )
+        return model.invoke(prompt).content.strip()
+    return summarize
+
+
+class ChatHistory:
+    """System prompt + running summary + sliding window, within ``max_tokens``."""
+
+    def __init__(self, system_prompt, max_tokens=2048, summary_tokens=256, low_water=0.75,
+                 count_tokens=approx_tokens, summarize=extractive_summary):
+        if summary_tokens >= max_tokens:
+            raise ValueError("summary_tokens must be smaller than max_tokens")
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.low_water = low_water
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.summary = ""
+        self.turns = 0
+        self.evicted = 0
+        self._system_tokens = count_tokens(system_prompt)
+        self._summary_tokens = 0
+        self._window = deque()  # (role, text, tokens)
+        self._window_tokens = 0
+        self._window_text = ""
+
+    @property
+    def tokens(self):
+        """Estimated size of ``prompt()`` in tokens."""
+        return self._system_tokens + self._summary_tokens + self._window_tokens
+
+    def add_user(self, text):
+        self._add("User", text)
+        self.turns += 1
+
+    def add_ai(self, text):
+        self._add("AI", text)
+
+    def _add(self, role, text):
+        tokens = self.count_tokens(text)
+        window_text = self._window_text
+        self._window.append((role, text, tokens))
+        self._window_tokens += tokens
+        self._window_text = f"{window_text}\n{text}" if window_text else text
+        if self.tokens > self.max_tokens:
+            try:
+                self._compact()
+            except BaseException:
+                # the summarizer failed; the history is as before the message
+                self._window.pop()
+                self._window_tokens -= tokens
+                self._window_text = window_text
+                raise
+
+    def _compact(self):
+        """Move the oldest messages into the summary until under the low-water mark."""
+        # the summary can grow back to summary_tokens, so leave room for it
+        target = int(self.max_tokens * self.low_water) - self._system_tokens - self.summary_tokens
+        evicted = []
+        cut = 0
+        remaining = self._window_tokens
+        for role, text, tokens in self._window:
+            if len(self._window) - len(evicted) <= 1 or remaining <= target:
+                break
+            remaining -= tokens
+            evicted.append((role, text))
+            cut += len(text) + 1
+        if not evicted:
+            return
+        # summarize first: if it raises (e.g. an LLM summarizer's network
+        # error), the evicted messages are still in the window
+        summary = self.summarize(self.summary, evicted, self.summary_tokens, self.count_tokens)
+        for _ in evicted:
+            self._window.popleft()
+        self._window_tokens = remaining
+        self._window_text = self._window_text[cut:]
+        self.evicted += len(evicted)
+        self.summary = summary
+        self._summary_tokens = self.count_tokens(summary) if summary else 0
+
+    def checkpoint(self):
+        """Opaque state to go back to with ``rollback`` (e.g. when a reply fails)."""
+        return (self.summary, self._summary_tokens, self.turns, self.evicted,
+                tuple(self._window), self._window_tokens, self._window_text)
+
+    def rollback(self, state):
+        (self.summary, self._summary_tokens, self.turns, self.evicted,
+         window, self._window_tokens, self._window_text) = state
+        self._window = deque(window)
+
+    def prompt(self):
+        parts = [self.system_prompt]
+        if self.summary:
+            parts.append(f"{SUMMARY_HEADER}\n{self.summary}")
+        if self._window_text:
+            parts.append(self._window_text)
+        return "\n".join(parts)
@@ -0,0 +1,198 @@
+"""On-disk cache of model replies, keyed by model id and normalized prompt.
+
+Users keep asking the same FAQ-style questions; a cached reply comes back in
+microseconds instead of a full endpoint round trip.  The key is the SHA-256
+of the model id and the prompt with whitespace collapsed and case folded.
+The prompt includes the history window and summary (history.py), so a reply
+is only reused when the whole context matches, not merely the last question.
+
+Entries live in a small SQLite file and are mirrored in an in-process LRU
+dict, so a repeated prompt is answered without touching the disk.  The file
+is kept under ``max_bytes`` by evicting the least recently used replies, and
+entries older than ``ttl`` seconds are treated as misses and dropped.
+Recency updates from hits are written in batches, not one write per hit.
+
+``CHATBOT_CACHE=0`` turns the cache off; ``CHATBOT_CACHE_DIR``,
+``CHATBOT_CACHE_MB`` and ``CHATBOT_CACHE_TTL`` (seconds) configure it.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+MEMORY_ENTRIES = 1024  # replies also kept in memory
+TOUCH_FLUSH_SECONDS = 5.0  # recency updates from hits are written this often
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(prompt):
+    return _WHITESPACE.sub(" ", prompt).strip().casefold()
+
+
+def cache_key(model_id, prompt):
+    raw = f"{model_id}\0{normalize(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (f"cache: {self.hits} hit(s), {self.misses} miss(es), "
+                f"hit rate {self.hit_rate:.0%}, {self.expired} expired, {self.evicted} evicted")
+
+
+class ResponseCache:
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, ttl=7 * 24 * 3600, memory_entries=MEMORY_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.stats = CacheStats()
+        self._memory = OrderedDict()  # key -> (reply, created)
+        self._touched = {}  # key -> last_used not yet written
+        self._flushed_at = time.time()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, reply TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, model_id, prompt):
+        """The cached reply for ``prompt``, or None."""
+        key = cache_key(model_id, prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._db.execute("SELECT reply, created FROM responses WHERE key = ?", (key,)).fetchone()
+                entry = tuple(row) if row else None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            reply, created = entry
+            if self.ttl and now - created > self.ttl:
+                self.stats.expired += 1
+                self.stats.misses += 1
+                self._delete(key)
+                return None
+            self.stats.hits += 1
+            self._remember(key, reply, created)
+            self._touched[key] = now
+            if now - self._flushed_at > TOUCH_FLUSH_SECONDS:
+                self._flush_touched()
+            return reply
+
+    def put(self, model_id, prompt, reply):
+        key = cache_key(model_id, prompt)
+        size = len(reply.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, reply, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_id, reply, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self._remember(key, reply, now)
+            self._flush_touched()
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _remember(self, key, reply, created):
+        self._memory[key] = (reply, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key):
+        self._memory.pop(key, None)
+        self._touched.pop(key, None)
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            self._bytes -= row[0]
+
+    def _flush_touched(self):
+        self._flushed_at = time.time()
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop expired replies, then least recently used ones down to 90% of ``max_bytes``."""
+        victims = []
+        if self.ttl:
+            victims += self._db.execute("SELECT key, size FROM responses WHERE created < ?",
+                                        (time.time() - self.ttl,)).fetchall()
+        remaining = self._bytes - sum(size for _, size in victims)
+        if remaining > self.max_bytes * 0.9:
+            gone = {key for key, _ in victims}
+            for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if remaining <= self.max_bytes * 0.9:
+                    break
+                if key not in gone:
+                    victims.append((key, size))
+                    remaining -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in victims])
+        for key, _ in victims:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+        self._bytes = remaining
+        self.stats.evicted += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._memory.clear()
+            self._touched.clear()
+            self._bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.close()
+
+
+def from_env():
+    """The ResponseCache configured by ``CHATBOT_CACHE*``, or None when disabled."""
+    if os.getenv("CHATBOT_CACHE", "1") != "1":
+        return None
+    cache_dir = os.getenv("CHATBOT_CACHE_DIR", DEFAULT_DIR)
+    return ResponseCache(
+        os.path.join(cache_dir, "responses.sqlite3"),
+        max_bytes=int(float(os.getenv("CHATBOT_CACHE_MB", "50")) * 1024 * 1024),
+        ttl=int(os.getenv("CHATBOT_CACHE_TTL", str(7 * 24 * 3600))),
+    )
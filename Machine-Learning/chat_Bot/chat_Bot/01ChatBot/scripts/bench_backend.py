@@ -0,0 +1,81 @@
+"""Latency and throughput of a chatbot backend (backends.py).
+
+Loads the model once, like chatbot.py does, then streams replies to a fixed
+set of prompts and reports load time, time-to-first-token, decode speed and
+per-reply latency.  The first reply is reported separately (warm-up).  Works
+with any backend, so local and remote models can be compared on the same
+prompts:
+
+Usage:
+    python scripts/bench_backend.py --backend stub
+    python scripts/bench_backend.py --backend llamacpp --model models/mistral-7b-instruct-v0.2.Q4_K_M.gguf
+    python scripts/bench_backend.py --backend transformers --model Qwen/Qwen2.5-0.5B-Instruct --turns 5
+    python scripts/bench_backend.py --backend hf-endpoint
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+import backends  # noqa: E402
+from streaming import stream_reply  # noqa: E402
+
+PROMPTS = [
+    "What is the difference between a list and a tuple in Python?",
+    "Explain overfitting in one paragraph.",
+    "How do I read a CSV file with pandas?",
+    "What does a learning rate control?",
+    "Give three uses of SQL window functions.",
+    "What is cross validation?",
+    "When should I use a random forest instead of logistic regression?",
+    "What is the bias-variance trade-off?",
+]
+SYSTEM = "You are a concise AI assistant."
+
+
+def pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="stub", choices=sorted(backends.BACKENDS))
+    parser.add_argument("--model", default=None, help="repo id or GGUF path (backend default otherwise)")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    model, model_id = backends.load_model(args.backend, args.model, args.max_new_tokens, args.threads)
+    load = time.perf_counter() - started
+    print(f"{model_id}: loaded in {load:.2f} s")
+
+    runs = []
+    for i in range(args.turns + 1):
+        prompt = f"{SYSTEM}\n{PROMPTS[i % len(PROMPTS)]}"
+        _, stats = stream_reply(model, prompt, out=None)
+        if i == 0:
+            print(f"warm-up: {stats}")
+        else:
+            runs.append(stats)
+
+    ttft = [s.ttft for s in runs if s.ttft is not None]
+    total = [s.total for s in runs]
+    tokens = sum(s.tokens for s in runs)
+    print(f"{len(runs)} replies, {tokens} tokens")
+    if ttft:
+        print(f"ttft        p50 {pct(ttft, 50):7.3f} s   p95 {pct(ttft, 95):7.3f} s")
+    print(f"reply       p50 {pct(total, 50):7.3f} s   p95 {pct(total, 95):7.3f} s")
+    print(f"decode      {statistics.mean(s.tokens_per_sec for s in runs):7.1f} tok/s per reply, "
+          f"{tokens / sum(total):.1f} tok/s overall")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Lookup latency of the response cache (response_cache.py).
+
+Fills a throwaway cache with N replies from the stub model, then times
+lookups: in-memory hits, hits from disk (a fresh ResponseCache on the same
+file), misses, and a model call for comparison.  With --max-kb set below
+the data size it also shows the LRU eviction keeping the file in budget.
+
+Usage:
+    python scripts/bench_cache.py [--entries 5000] [--lookups 20000] [--max-kb 0]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from response_cache import ResponseCache  # noqa: E402
+from stub_llm import StubChatModel  # noqa: E402
+
+MODEL_ID = "stub"
+
+
+def prompt_for(i):
+    return f"You are a concise AI assistant.\nQuestion {i}: what is the difference between list and tuple?"
+
+
+def timed(fn, keys):
+    started = time.perf_counter()
+    results = [fn(k) for k in keys]
+    return (time.perf_counter() - started) / len(keys), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--max-kb", type=int, default=0, help="cache size limit (0: no practical limit)")
+    args = parser.parse_args()
+
+    model = StubChatModel()
+    path = os.path.join(tempfile.mkdtemp(), "responses.sqlite3")
+    max_bytes = args.max_kb * 1024 if args.max_kb else 1 << 40
+    cache = ResponseCache(path, max_bytes=max_bytes, memory_entries=args.entries)
+
+    started = time.perf_counter()
+    for i in range(args.entries):
+        prompt = prompt_for(i)
+        cache.put(MODEL_ID, prompt, model.reply_for(prompt))
+    print(f"filled {args.entries} entries in {time.perf_counter() - started:.2f} s, "
+          f"{cache._bytes / 1024:.0f} KB on disk, {cache.stats.evicted} evicted")
+
+    rng = random.Random(0)
+    keys = [prompt_for(rng.randrange(args.entries)) for _ in range(args.lookups)]
+    memory, _ = timed(lambda p: cache.get(MODEL_ID, p), keys)
+    cache.close()
+
+    cold = ResponseCache(path, max_bytes=max_bytes, memory_entries=args.entries)
+    disk, found = timed(lambda p: cold.get(MODEL_ID, p), keys[:2000])
+    miss, _ = timed(lambda p: cold.get(MODEL_ID, p + " (new)"), keys[:2000])
+    cold.close()
+    call, _ = timed(lambda p: model.invoke(p).content, keys[:50])
+
+    print(f"memory hit  {memory * 1e6:9.1f} us")
+    print(f"disk hit    {disk * 1e6:9.1f} us   ({sum(r is not None for r in found)}/{len(found)} found)")
+    print(f"miss        {miss * 1e6:9.1f} us")
+    print(f"stub model  {call * 1e6:9.1f} us   (a real endpoint call is ~1 s)")
+    print(cache.stats)
+
+
+if __name__ == "__main__":
+    main()
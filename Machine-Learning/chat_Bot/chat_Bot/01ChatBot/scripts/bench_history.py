@@ -0,0 +1,111 @@
+"""Per-turn latency over long sessions: unbounded history vs ChatHistory.
+
+Plays scripted 200-turn sessions against the offline StubChatModel (whose
+latency grows with the prompt, like a real model's prefill) twice: once
+joining the whole history into every prompt, as chatbot.py used to, and once
+with the token-budgeted ChatHistory.  Prints per-turn latency early, midway
+and late in the session, and the prompt size on the last turn.
+
+Usage:
+    python scripts/bench_history.py [--turns 200] [--sessions 3] [--max-tokens 2048]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from history import ChatHistory, approx_tokens  # noqa: E402
+from stub_llm import StubChatModel  # noqa: E402
+
+SYSTEM = "You are a concise AI assistant."
+TOPICS = ["pandas", "gradient descent", "overfitting", "SQL joins", "random forests",
+          "feature scaling", "cross validation", "Flask routes", "embeddings", "p-values"]
+
+
+def user_messages(turns, seed):
+    rng = random.Random(seed)
+    for i in range(turns):
+        topic = rng.choice(TOPICS)
+        filler = " ".join(rng.choice(TOPICS) for _ in range(rng.randint(3, 30)))
+        yield f"Question {i}: can you explain {topic} briefly? Context: {filler}."
+
+
+class UnboundedHistory:
+    """The old chatbot.py behaviour: keep everything, re-join every turn."""
+
+    def __init__(self, system_prompt):
+        self.messages = [system_prompt]
+
+    def add_user(self, text):
+        self.messages.append(text)
+
+    add_ai = add_user
+
+    def prompt(self):
+        return "\n".join(self.messages)
+
+
+def run_session(history, model, turns, seed):
+    latencies, build = [], 0.0
+    prompt = ""
+    for text in user_messages(turns, seed):
+        started = time.perf_counter()
+        history.add_user(text)
+        prompt = history.prompt()
+        built = time.perf_counter()
+        reply = model.invoke(prompt).content
+        history.add_ai(reply)
+        latencies.append(time.perf_counter() - started)
+        build += built - started
+    return latencies, build, approx_tokens(prompt)
+
+
+def pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=2048)
+    parser.add_argument("--prompt-token-us", type=float, default=5.0,
+                        help="stub model cost per prompt token in microseconds")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} session(s) x {args.turns} turns, stub prefill "
+          f"{args.prompt_token_us:g} us/token, budget {args.max_tokens} tokens")
+    print(f"{'history':<12} {'turns':>9} {'mean ms':>8} {'p50 ms':>7} {'p99 ms':>7}")
+    for name in ("unbounded", "budgeted"):
+        per_turn = [[] for _ in range(args.turns)]
+        build = 0.0
+        last_tokens = []
+        for session in range(args.sessions):
+            model = StubChatModel(prompt_token_latency=args.prompt_token_us / 1e6)
+            history = (UnboundedHistory(SYSTEM) if name == "unbounded"
+                       else ChatHistory(SYSTEM, max_tokens=args.max_tokens))
+            latencies, built, tokens = run_session(history, model, args.turns, seed=session)
+            for i, latency in enumerate(latencies):
+                per_turn[i].append(latency)
+            build += built
+            last_tokens.append(tokens)
+
+        n = args.turns
+        for lo, hi in ((0, min(20, n)), (n // 2 - 10, n // 2 + 10), (max(0, n - 20), n)):
+            values = [v for turn in per_turn[max(0, lo):hi] for v in turn]
+            print(f"{name:<12} {f'{max(0, lo) + 1}-{hi}':>9} {statistics.mean(values) * 1000:8.2f} "
+                  f"{pct(values, 50) * 1000:7.2f} {pct(values, 99) * 1000:7.2f}")
+        total = sum(sum(turn) for turn in per_turn)
+        print(f"{name:<12} last prompt ~{max(last_tokens)} tokens, session {total / args.sessions:.2f} s, "
+              f"prompt building {build / args.sessions * 1000:.2f} ms/session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Load generator for the chatbot server (server.py).
+
+Runs N concurrent clients, each holding its own session for a number of
+turns, and reports p50/p99 latency, throughput and refused (503) requests.
+Without --url it starts the server in-process on the offline stub model,
+so scheduler settings can be compared without a real model:
+
+Usage:
+    python scripts/loadgen.py --clients 32 --turns 10 --max-batch 1
+    python scripts/loadgen.py --clients 32 --turns 10 --max-batch 8
+    python scripts/loadgen.py --url http://127.0.0.1:8000 --ws
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from server import make_app  # noqa: E402
+from stub_llm import StubChatModel  # noqa: E402
+
+QUESTIONS = ["what is pandas", "explain overfitting", "what is a learning rate", "how do SQL joins work",
+             "what is cross validation", "what are embeddings", "explain gradient descent"]
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.refused = 0
+        self.errors = 0
+
+
+async def http_client(http, url, turns, results, rng):
+    session_id = None
+    for turn in range(turns):
+        body = {"message": f"{rng.choice(QUESTIONS)}? (turn {turn})"}
+        if session_id:
+            body["session"] = session_id
+        started = time.perf_counter()
+        async with http.post(url + "/chat", json=body) as resp:
+            if resp.status == 503:
+                results.refused += 1
+                await asyncio.sleep(float(resp.headers.get("Retry-After", "1")))
+                continue
+            if resp.status != 200:
+                results.errors += 1
+                continue
+            session_id = (await resp.json())["session"]
+        results.latencies.append(time.perf_counter() - started)
+
+
+async def ws_client(http, url, turns, results, rng):
+    async with http.ws_connect(url + "/ws") as ws:
+        await ws.receive_json()  # {"session": ...}
+        for turn in range(turns):
+            started = time.perf_counter()
+            await ws.send_json({"message": f"{rng.choice(QUESTIONS)}? (turn {turn})"})
+            answer = await ws.receive_json()
+            if answer.get("error") == "busy":
+                results.refused += 1
+                await asyncio.sleep(answer.get("retry_after", 1))
+            elif "reply" in answer:
+                results.latencies.append(time.perf_counter() - started)
+            else:
+                results.errors += 1
+
+
+def pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+async def run(args):
+    runner = None
+    url = args.url
+    if url is None:
+        model = StubChatModel(base_latency=args.stub_ms / 1000, token_latency=0.001)
+        app = make_app(model, "stub", cache=None, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                       max_queue=args.max_queue, concurrency=args.concurrency)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+
+    results = Results()
+    client = ws_client if args.ws else http_client
+    connector = aiohttp.TCPConnector(limit=0)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as http:
+        await asyncio.gather(*(client(http, url, args.turns, results, random.Random(i))
+                               for i in range(args.clients)))
+        elapsed = time.perf_counter() - started
+        async with http.get(url + "/stats") as resp:
+            stats = await resp.json()
+    if runner is not None:
+        await runner.cleanup()
+
+    lat = results.latencies
+    print(f"{args.clients} clients x {args.turns} turns over {'WebSocket' if args.ws else 'HTTP'}: "
+          f"{len(lat)} ok, {results.refused} refused, {results.errors} errors in {elapsed:.2f} s "
+          f"({len(lat) / elapsed:.1f} replies/s)")
+    if lat:
+        print(f"latency p50 {pct(lat, 50) * 1000:.0f} ms, p99 {pct(lat, 99) * 1000:.0f} ms, "
+              f"max {max(lat) * 1000:.0f} ms")
+    print(f"server: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=None, help="existing server (default: in-process stub server)")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--ws", action="store_true", help="use the WebSocket endpoint")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--stub-ms", type=float, default=50, help="stub model fixed cost per call")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
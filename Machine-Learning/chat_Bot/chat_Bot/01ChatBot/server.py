@@ -0,0 +1,353 @@
+"""Multi-session chatbot server (asyncio + aiohttp).
+
+Serves the model chosen in backends.py to many users at once::
+
+    python server.py --port 8000
+
+    POST /chat          {"message": "...", "session": "<id>"?} -> {"session", "reply"}
+    GET  /ws            WebSocket; send {"message"}, receive {"reply"} (one session per socket)
+    DELETE /sessions/<id>
+    GET  /stats
+
+Each session has its own ChatHistory (history.py); turns of one session run
+one at a time.  Prompts from all sessions go through a ``BatchScheduler``:
+while the model is busy new prompts queue up, and the next call takes up to
+``max_batch`` of them at once through the backend's ``batch(prompts)``
+(batched generation for the transformers and stub backends; LangChain's
+thread-pooled ``batch`` for the HF endpoint).  Backends without ``batch``
+get one prompt per call.  At most ``concurrency`` model calls run at a time
+and at most ``max_queue`` prompts wait; beyond that requests are refused
+with 503 and ``Retry-After`` instead of piling up.
+
+Replies are looked up in the response cache first (response_cache.py,
+``CHATBOT_CACHE=0`` to disable).  ``scripts/loadgen.py`` measures latency
+under concurrent load.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import WSMsgType, web
+from dotenv import load_dotenv
+
+import backends
+import response_cache
+from history import ChatHistory
+
+SYSTEM_PROMPT = "You are a concise AI assistant."
+MAX_MESSAGE_CHARS = 8000
+MAX_SESSION_ID_CHARS = 64
+
+
+class Overloaded(Exception):
+    """The scheduler queue is full; the client should retry later."""
+
+
+class BatchScheduler:
+    """Groups concurrent prompts into batched model calls."""
+
+    def __init__(self, model, max_batch=8, max_wait=0.01, max_queue=256, concurrency=1):
+        self.model = model
+        self.batching = max_batch > 1 and callable(getattr(model, "batch", None))
+        self.max_batch = max_batch if self.batching else 1
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.queue = asyncio.Queue(max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="model")
+        self._slots = asyncio.Semaphore(concurrency)
+        self._task = None
+        self._calls = set()  # running _call tasks (the loop only keeps weak references)
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def full(self):
+        return self.queue.full()
+
+    async def submit(self, prompt):
+        """The model's reply to ``prompt``; raises Overloaded when the queue is full."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((prompt, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded()
+        self.requests += 1
+        return await future
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def _run(self):
+        while True:
+            # take a slot first: while every slot is busy, prompts pile up in
+            # the queue and the next call picks up as many as fit in a batch
+            await self._slots.acquire()
+            batch = [await self.queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)  # let concurrent callers join
+                self._drain(batch)
+            # callers that went away (cancelled) don't need a reply
+            batch = [(p, f) for p, f in batch if not f.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._call(batch))
+            self._calls.add(task)
+            task.add_done_callback(self._calls.discard)
+
+    async def _call(self, batch):
+        prompts = [p for p, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            if self.batching:
+                results = await loop.run_in_executor(self._executor, self.model.batch, prompts)
+            else:
+                results = [await loop.run_in_executor(self._executor, self.model.invoke, prompts[0])]
+            self.batches += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result.content.strip())
+        except Exception as e:
+            self.failed += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0,
+            "queued": self.queue.qsize(),
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "max_batch": self.max_batch,
+            "concurrency": self.concurrency,
+        }
+
+
+class Session:
+    def __init__(self, session_id, history):
+        self.id = session_id
+        self.history = history
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """Chat histories by session id; idle and surplus sessions are dropped."""
+
+    def __init__(self, max_sessions=10000, idle_seconds=3600, max_prompt_tokens=2048):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_prompt_tokens = max_prompt_tokens
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id=None):
+        """The session ``session_id``; a new one when it is unknown or expired."""
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            self._expire()
+            session_id = uuid.uuid4().hex
+            session = Session(session_id, ChatHistory(SYSTEM_PROMPT, max_tokens=self.max_prompt_tokens))
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    def drop(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) < self.max_sessions and oldest.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+MODEL_ID = web.AppKey("model_id", str)
+CACHE = web.AppKey("cache", response_cache.ResponseCache)
+SESSIONS = web.AppKey("sessions", SessionStore)
+SCHEDULER = web.AppKey("scheduler", BatchScheduler)
+
+
+async def chat_turn(app, session, message):
+    """Run one turn of ``session``; returns the reply."""
+    scheduler, cache, model_id = app[SCHEDULER], app[CACHE], app[MODEL_ID]
+    async with session.lock:
+        # refuse before touching the history; nothing below awaits until submit
+        if scheduler.full():
+            scheduler.rejected += 1
+            raise Overloaded()
+        checkpoint = session.history.checkpoint()
+        try:
+            session.history.add_user(message)
+            prompt = session.history.prompt()
+            reply = cache.get(model_id, prompt) if cache is not None else None
+            if reply is None:
+                reply = await scheduler.submit(prompt)
+                if cache is not None:
+                    cache.put(model_id, prompt, reply)
+            session.history.add_ai(reply)
+        except BaseException:
+            # failed, refused or the client went away: drop the unanswered message
+            session.history.rollback(checkpoint)
+            raise
+        return reply
+
+
+def _message(data):
+    message = data.get("message") if isinstance(data, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        raise web.HTTPBadRequest(text="message is required")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise web.HTTPRequestEntityTooLarge(max_size=MAX_MESSAGE_CHARS, actual_size=len(message))
+    return message
+
+
+def _session_id(value):
+    """A client-supplied session id: None or a short string."""
+    if value is None:
+        return None
+    if not isinstance(value, str) or len(value) > MAX_SESSION_ID_CHARS:
+        raise web.HTTPBadRequest(text="session must be a session id string")
+    return value
+
+
+async def chat_handler(request):
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="body must be JSON")
+    message = _message(data)
+    session_id = _session_id(data.get("session"))
+    busy = web.HTTPServiceUnavailable(text="server busy, retry shortly", headers={"Retry-After": "1"})
+    if request.app[SCHEDULER].full():
+        request.app[SCHEDULER].rejected += 1
+        raise busy  # before a new session is created for nothing
+    session = request.app[SESSIONS].get(session_id)
+    try:
+        reply = await chat_turn(request.app, session, message)
+    except Overloaded:
+        raise busy
+    return web.json_response({"session": session.id, "reply": reply})
+
+
+async def ws_handler(request):
+    session_id = _session_id(request.query.get("session"))
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    session = request.app[SESSIONS].get(session_id)
+    await ws.send_json({"session": session.id})
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            if msg.type == WSMsgType.ERROR:
+                break
+            continue
+        try:
+            message = _message(json.loads(msg.data))
+            reply = await chat_turn(request.app, session, message)
+        except Overloaded:
+            await ws.send_json({"error": "busy", "retry_after": 1})
+        except (json.JSONDecodeError, web.HTTPException) as e:
+            await ws.send_json({"error": getattr(e, "text", None) or "bad message"})
+        except Exception as e:
+            # e.g. the model call failed; report it and keep the socket open
+            await ws.send_json({"error": str(e) or type(e).__name__})
+        else:
+            await ws.send_json({"reply": reply})
+    return ws
+
+
+async def drop_session(request):
+    if not request.app[SESSIONS].drop(request.match_info["session_id"]):
+        raise web.HTTPNotFound()
+    return web.json_response({"ok": True})
+
+
+async def stats_handler(request):
+    stats = request.app[SCHEDULER].stats()
+    stats["sessions"] = len(request.app[SESSIONS])
+    cache = request.app[CACHE]
+    if cache is not None:
+        stats["cache_hit_rate"] = round(cache.stats.hit_rate, 3)
+    return web.json_response(stats)
+
+
+def make_app(model, model_id, cache=None, max_batch=8, max_wait=0.01, max_queue=256, concurrency=1,
+             max_sessions=10000, max_prompt_tokens=2048):
+    app = web.Application(client_max_size=64 * 1024)
+    app[MODEL_ID] = model_id
+    app[CACHE] = cache
+    app[SESSIONS] = SessionStore(max_sessions=max_sessions, max_prompt_tokens=max_prompt_tokens)
+
+    async def lifecycle(app):
+        # the queue and semaphore belong to the server's event loop
+        app[SCHEDULER] = BatchScheduler(model, max_batch, max_wait, max_queue, concurrency)
+        app[SCHEDULER].start()
+        yield
+        await app[SCHEDULER].stop()
+        if app[CACHE] is not None:
+            print(app[CACHE].stats)
+            app[CACHE].close()
+
+    app.cleanup_ctx.append(lifecycle)
+    app.router.add_post("/chat", chat_handler)
+    app.router.add_get("/ws", ws_handler)
+    app.router.add_delete("/sessions/{session_id}", drop_session)
+    app.router.add_get("/stats", stats_handler)
+    return app
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Multi-session chatbot server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=8, help="prompts per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="wait for a batch to fill")
+    parser.add_argument("--max-queue", type=int, default=256, help="queued prompts before 503")
+    parser.add_argument("--concurrency", type=int, default=1, help="model calls in flight")
+    args = parser.parse_args()
+
+    model, model_id = backends.from_env()
+    app = make_app(
+        model, model_id, cache=response_cache.from_env(),
+        max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000, max_queue=args.max_queue,
+        concurrency=args.concurrency,
+        max_prompt_tokens=int(os.getenv("CHATBOT_MAX_PROMPT_TOKENS", "2048")),
+    )
+    print(f"model: {model_id}")
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
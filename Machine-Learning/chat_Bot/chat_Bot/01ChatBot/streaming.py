@@ -0,0 +1,135 @@
+"""Print a reply token by token as the model streams it.
+
+``model.stream(prompt)`` (LangChain's Runnable interface, also implemented by
+``StubChatModel``) yields message chunks as the endpoint produces them, so
+the first words show up after the prefill instead of after the whole
+completion.  ``stream_reply`` / ``astream_reply`` return the full text plus a
+``TurnStats`` with time-to-first-token and decode speed.
+
+``run_turn`` is one REPL turn around it: cached reply, streamed or blocking
+call, and the history update once the reply is complete.
+"""
+import sys
+import time
+
+
+class TurnStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.tokens = 0  # chunks; the HF endpoint streams one token per chunk
+
+    def token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def ttft(self):
+        """Seconds from sending the prompt to the first token."""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def total(self):
+        return (self.finished_at or time.perf_counter()) - self.started
+
+    @property
+    def tokens_per_sec(self):
+        """Decode speed: tokens after the first one over the time they took."""
+        if self.first_token_at is None or self.tokens < 2:
+            return 0.0
+        elapsed = (self.finished_at or time.perf_counter()) - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        ttft = f"{self.ttft:.2f} s" if self.ttft is not None else "-"
+        return f"ttft {ttft}, {self.tokens} tokens, {self.tokens_per_sec:.1f} tok/s, total {self.total:.2f} s"
+
+
+def stream_reply(model, prompt, out=sys.stdout):
+    """Stream the reply to ``prompt`` into ``out``; returns ``(text, stats)``."""
+    stats = TurnStats()
+    parts = []
+    for chunk in model.stream(prompt):
+        if not chunk.content:
+            continue
+        stats.token()
+        # the reply is stripped like invoke()'s, so skip leading whitespace
+        text = chunk.content if parts else chunk.content.lstrip()
+        parts.append(chunk.content)
+        if out is not None and text:
+            out.write(text)
+            out.flush()
+    stats.finish()
+    return "".join(parts).strip(), stats
+
+
+async def astream_reply(model, prompt, on_token=None):
+    """Async variant over ``model.astream``; ``on_token(text)`` gets each chunk."""
+    stats = TurnStats()
+    parts = []
+    async for chunk in model.astream(prompt):
+        if not chunk.content:
+            continue
+        stats.token()
+        parts.append(chunk.content)
+        if on_token is not None:
+            await on_token(chunk.content)
+    stats.finish()
+    return "".join(parts).strip(), stats
+
+
+def run_turn(model, history, user_input, out=sys.stdout, stream=True, cache=None, model_id=None):
+    """Answer ``user_input`` in ``history``; returns ``(reply, stats)``.
+
+    ``stats`` is None unless the reply was streamed from the model.  The
+    reply is recorded only once it is complete: if the model fails or the
+    user interrupts it, the question is taken back out of the history too,
+    so it never holds a question without its answer.
+    """
+    checkpoint = history.checkpoint()
+    stats = None
+    try:
+        history.add_user(user_input)
+        prompt = history.prompt()
+        reply = cache.get(model_id, prompt) if cache is not None else None
+        cached = reply is not None
+        if cached:
+            out.write(reply)
+        elif stream:
+            reply, stats = stream_reply(model, prompt, out)
+        else:
+            reply = model.invoke(prompt).content.strip()
+            out.write(reply)
+        if cache is not None and not cached:
+            cache.put(model_id, prompt, reply)
+        history.add_ai(reply)
+    except BaseException:
+        history.rollback(checkpoint)
+        raise
+    return reply, stats
+
+
+class StatsLog:
+    """Per-turn stats of a session, summarized on exit."""
+
+    def __init__(self):
+        self.turns = []
+
+    def add(self, stats):
+        self.turns.append(stats)
+
+    def summary(self):
+        timed = [s for s in self.turns if s.ttft is not None]
+        if not timed:
+            return "no streamed turns"
+        ttfts = sorted(s.ttft for s in timed)
+        rate = sum(s.tokens_per_sec for s in timed) / len(timed)
+        return (f"{len(timed)} turn(s): median ttft {ttfts[len(ttfts) // 2]:.2f} s, "
+                f"max {ttfts[-1]:.2f} s, mean {rate:.1f} tok/s")
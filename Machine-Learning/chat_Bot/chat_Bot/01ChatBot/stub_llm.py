@@ -0,0 +1,76 @@
+"""Offline stand-in for ``ChatHuggingFace``, for benchmarks and offline runs.
+
+``StubChatModel.invoke(prompt)`` returns an object with ``.content`` like the
+real model, after sleeping as long as a model would roughly take: a fixed
+overhead, plus a cost per prompt token (prefill), plus a cost per generated
+token.  ``stream`` / ``astream`` yield the same reply one word-token at a
+time with the same timing.  ``batch(prompts)`` answers several prompts in
+one call the way batched generation does: prefill is paid per prompt, the
+decode steps are shared.  The reply is deterministic for a given prompt.
+"""
+import asyncio
+import hashlib
+import time
+
+from history import approx_tokens
+
+_WORDS = (
+    "the model answers with a short and concise reply about data science python "
+    "pandas training loss accuracy features learning rate batch size gradient"
+).split()
+
+
+class StubMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubChatModel:
+    def __init__(self, base_latency=0.002, prompt_token_latency=5e-6, reply_tokens=40,
+                 token_latency=0.0, count_tokens=approx_tokens):
+        self.base_latency = base_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.reply_tokens = reply_tokens
+        self.token_latency = token_latency
+        self.count_tokens = count_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def reply_for(self, prompt):
+        seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "big")
+        # ~4 characters per word, so reply_tokens words is about reply_tokens tokens
+        words = [_WORDS[(seed >> (i % 56)) % len(_WORDS)] for i in range(self.reply_tokens)]
+        return " ".join(words).capitalize() + "."
+
+    def invoke(self, prompt):
+        time.sleep(self._prefill(prompt) + self.token_latency * self.reply_tokens)
+        return StubMessage(self.reply_for(prompt))
+
+    def batch(self, prompts):
+        prefill = sum(self._prefill(p) - self.base_latency for p in prompts)
+        time.sleep(self.base_latency + prefill + self.token_latency * self.reply_tokens)
+        return [StubMessage(self.reply_for(p)) for p in prompts]
+
+    def _prefill(self, prompt):
+        tokens = self.count_tokens(prompt)
+        self.calls += 1
+        self.prompt_tokens += tokens
+        return self.base_latency + self.prompt_token_latency * tokens
+
+    def _chunks(self, prompt):
+        words = self.reply_for(prompt).split(" ")
+        return [words[0]] + [" " + w for w in words[1:]]
+
+    def stream(self, prompt):
+        time.sleep(self._prefill(prompt))
+        for i, text in enumerate(self._chunks(prompt)):
+            if i:
+                time.sleep(self.token_latency)
+            yield StubMessage(text)
+
+    async def astream(self, prompt):
+        await asyncio.sleep(self._prefill(prompt))
+        for i, text in enumerate(self._chunks(prompt)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield StubMessage(text)
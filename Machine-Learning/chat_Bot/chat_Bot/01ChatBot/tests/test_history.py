@@ -0,0 +1,72 @@
+import io
+import unittest
+
+from history import ChatHistory, extractive_summary
+from streaming import run_turn
+from stub_llm import StubChatModel
+
+
+class FlakySummarizer:
+    """``extractive_summary`` that raises while ``failing`` is set."""
+
+    def __init__(self):
+        self.failing = False
+
+    def __call__(self, summary, evicted, max_tokens, count_tokens):
+        if self.failing:
+            raise ConnectionError("summarizer unreachable")
+        return extractive_summary(summary, evicted, max_tokens, count_tokens)
+
+
+class CompactTest(unittest.TestCase):
+    def setUp(self):
+        self.summarize = FlakySummarizer()
+        self.history = ChatHistory("system", max_tokens=120, summary_tokens=30,
+                                   summarize=self.summarize)
+
+    def fill(self):
+        # stop just short of the budget, so the next message compacts
+        i = 0
+        while self.history.tokens + 12 <= self.history.max_tokens:
+            self.history.add_user(f"Message number {i}. " + "word " * 6)
+            i += 1
+
+    def test_compact_keeps_within_budget(self):
+        for i in range(30):
+            self.history.add_user(f"Question {i}. " + "word " * 8)
+            answer = f"Answer {i}. " + "word " * 8
+            self.history.add_ai(answer)
+            self.assertLessEqual(self.history.tokens, self.history.max_tokens)
+        self.assertGreater(self.history.evicted, 0)
+        self.assertIn("Question", self.history.summary)
+        self.assertTrue(self.history.prompt().endswith(answer))
+
+    def test_failed_summary_loses_nothing(self):
+        self.fill()
+        before = self.history.checkpoint()
+        prompt = self.history.prompt()
+
+        self.summarize.failing = True
+        with self.assertRaises(ConnectionError):
+            self.history.add_user("one more " * 5)
+        self.assertEqual(self.history.checkpoint(), before)
+        self.assertEqual(self.history.prompt(), prompt)
+
+        self.summarize.failing = False
+        self.history.add_user("one more " * 5)
+        self.assertGreater(self.history.evicted, 0)
+        self.assertIn("User: Message number", self.history.summary)
+
+    def test_run_turn_rolls_back_failed_summary(self):
+        self.fill()
+        prompt = self.history.prompt()
+        turns = self.history.turns
+        self.summarize.failing = True
+        with self.assertRaises(ConnectionError):
+            run_turn(StubChatModel(base_latency=0), self.history, "one more " * 5, out=io.StringIO())
+        self.assertEqual(self.history.prompt(), prompt)
+        self.assertEqual(self.history.turns, turns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import response_cache
+from response_cache import ResponseCache
+
+
+class Clock:
+    """Stands in for ``time.time``; every reading is a second later."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "responses.sqlite3")
+        self.clock = Clock()
+        patcher = mock.patch.object(response_cache.time, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open(self, **kwargs):
+        cache = ResponseCache(self.path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def keys_on_disk(self, cache):
+        return {k for (k,) in cache._db.execute("SELECT key FROM responses")}
+
+    def test_hit_ignores_whitespace_and_case(self):
+        cache = self.open()
+        cache.put("m", "User: Hello  there", "Hi!")
+        self.assertEqual(cache.get("m", "user: hello\nthere "), "Hi!")
+        self.assertIsNone(cache.get("other-model", "User: Hello there"))
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+
+    def test_ttl_expiry(self):
+        cache = self.open(ttl=100)
+        cache.put("m", "q", "answer")
+        self.assertEqual(cache.get("m", "q"), "answer")
+        self.clock.now += 100
+        self.assertIsNone(cache.get("m", "q"))
+        self.assertEqual(cache.stats.expired, 1)
+        self.assertEqual(self.keys_on_disk(cache), set())
+        self.assertEqual(cache._bytes, 0)
+
+    def test_expired_entries_go_first_when_evicting(self):
+        cache = self.open(max_bytes=1000, ttl=100)
+        cache.put("m", "old", "o" * 300)
+        self.clock.now += 200
+        cache.put("m", "a", "a" * 300)
+        cache.put("m", "b", "b" * 300)
+        cache.put("m", "c", "c" * 300)  # over the cap: the expired reply is enough
+        self.assertEqual(cache.stats.evicted, 1)
+        self.assertEqual(self.keys_on_disk(cache),
+                         {response_cache.cache_key("m", q) for q in "abc"})
+
+    def test_lru_eviction_under_byte_cap(self):
+        cache = self.open(max_bytes=1000)
+        for q in "abc":
+            cache.put("m", q, q * 300)
+        # a hit makes "a" the most recently used; the update is deferred...
+        self.assertEqual(cache.get("m", "a"), "a" * 300)
+        self.assertIn(response_cache.cache_key("m", "a"), cache._touched)
+        # ...and flushed before the next put evicts, so "b" goes, not "a"
+        cache.put("m", "d", "d" * 300)
+        self.assertEqual(cache.stats.evicted, 1)
+        self.assertEqual(cache._bytes, 900)
+        self.assertIsNone(cache.get("m", "b"))
+        for q in "acd":
+            self.assertEqual(cache.get("m", q), q * 300)
+
+    def test_evicts_down_to_low_water(self):
+        cache = self.open(max_bytes=1000)
+        for q in "abcde":
+            cache.put("m", q, q * 200)
+        cache.put("m", "f", "f" * 200)  # 1200 bytes: evict to <= 900
+        self.assertEqual(cache.stats.evicted, 2)
+        self.assertEqual(self.keys_on_disk(cache),
+                         {response_cache.cache_key("m", q) for q in "cdef"})
+
+    def test_reply_larger_than_cap_not_stored(self):
+        cache = self.open(max_bytes=100)
+        cache.put("m", "q", "x" * 101)
+        self.assertIsNone(cache.get("m", "q"))
+        self.assertEqual(cache._bytes, 0)
+
+    def test_reopen_reads_disk(self):
+        cache = ResponseCache(self.path)
+        cache.put("m", "q", "answer")
+        cache.close()
+        cache = self.open()
+        self.assertEqual(cache._bytes, len("answer"))
+        self.assertEqual(cache.get("m", "q"), "answer")
+
+
+class FromEnvTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_opt_out(self):
+        with mock.patch.dict(os.environ, {"CHATBOT_CACHE": "0", "CHATBOT_CACHE_DIR": self.dir}):
+            self.assertIsNone(response_cache.from_env())
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_settings(self):
+        env = {"CHATBOT_CACHE": "1", "CHATBOT_CACHE_DIR": self.dir,
+               "CHATBOT_CACHE_MB": "0.5", "CHATBOT_CACHE_TTL": "60"}
+        with mock.patch.dict(os.environ, env):
+            cache = response_cache.from_env()
+        self.addCleanup(cache.close)
+        self.assertEqual(cache.path, os.path.join(self.dir, "responses.sqlite3"))
+        self.assertEqual((cache.max_bytes, cache.ttl), (512 * 1024, 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
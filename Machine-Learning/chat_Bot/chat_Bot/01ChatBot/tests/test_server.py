@@ -0,0 +1,62 @@
+import unittest
+
+from aiohttp.test_utils import AioHTTPTestCase
+
+import server
+from stub_llm import StubChatModel
+
+
+class FlakyModel(StubChatModel):
+    """Stub whose calls fail while ``failing`` is set."""
+
+    failing = False
+
+    def batch(self, prompts):
+        if self.failing:
+            raise RuntimeError("model unavailable")
+        return super().batch(prompts)
+
+
+class ServerTest(AioHTTPTestCase):
+    async def get_application(self):
+        self.model = FlakyModel(base_latency=0)
+        return server.make_app(self.model, "stub", max_wait=0)
+
+    def history(self, session_id):
+        return self.app[server.SESSIONS].get(session_id).history
+
+    async def test_failed_turn_leaves_history_unchanged(self):
+        resp = await self.client.post("/chat", json={"message": "hello"})
+        self.assertEqual(resp.status, 200)
+        session_id = (await resp.json())["session"]
+        before = self.history(session_id).prompt()
+
+        self.model.failing = True
+        resp = await self.client.post("/chat", json={"message": "again", "session": session_id})
+        self.assertEqual(resp.status, 500)
+        self.assertEqual(self.history(session_id).prompt(), before)
+
+    async def test_session_must_be_a_string(self):
+        for session in (["a"], {"id": "a"}, 42, "x" * 65):
+            resp = await self.client.post("/chat", json={"message": "hello", "session": session})
+            self.assertEqual(resp.status, 400, session)
+        self.assertEqual(len(self.app[server.SESSIONS]), 0)
+        resp = await self.client.get("/ws", params={"session": "x" * 65})
+        self.assertEqual(resp.status, 400)
+
+    async def test_websocket_survives_model_error(self):
+        async with self.client.ws_connect("/ws") as ws:
+            session_id = (await ws.receive_json())["session"]
+            self.model.failing = True
+            await ws.send_json({"message": "hello"})
+            self.assertEqual(await ws.receive_json(), {"error": "model unavailable"})
+            self.assertNotIn("hello", self.history(session_id).prompt())
+
+            self.model.failing = False
+            await ws.send_json({"message": "hello"})
+            reply = (await ws.receive_json())["reply"]
+            self.assertTrue(self.history(session_id).prompt().endswith(f"\nhello\n{reply}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
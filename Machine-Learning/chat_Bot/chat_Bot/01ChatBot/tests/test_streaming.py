@@ -0,0 +1,93 @@
+import asyncio
+import io
+import unittest
+
+from history import ChatHistory
+from streaming import astream_reply, run_turn, stream_reply
+from stub_llm import StubChatModel
+
+
+class WatchedModel:
+    """Wraps the stub and records the history as it is while the reply streams."""
+
+    def __init__(self, model, history, fail_after=None):
+        self.model = model
+        self.history = history
+        self.fail_after = fail_after
+        self.seen = []
+
+    def stream(self, prompt):
+        for i, chunk in enumerate(self.model.stream(prompt)):
+            if i == self.fail_after:
+                raise RuntimeError("connection reset")
+            self.seen.append(self.history.prompt())
+            yield chunk
+
+
+class StreamReplyTest(unittest.TestCase):
+    def setUp(self):
+        self.model = StubChatModel(base_latency=0, token_latency=0)
+
+    def test_chunks_join_to_full_reply(self):
+        out = io.StringIO()
+        text, stats = stream_reply(self.model, "User: hello", out)
+        expected = self.model.reply_for("User: hello")
+        self.assertEqual(text, expected)
+        self.assertEqual(out.getvalue(), expected)
+
+    def test_stats_recorded(self):
+        _, stats = stream_reply(self.model, "User: hello", None)
+        self.assertIsNotNone(stats.ttft)
+        self.assertEqual(stats.tokens, self.model.reply_tokens)
+        self.assertIsNotNone(stats.finished_at)
+        self.assertGreaterEqual(stats.total, stats.ttft)
+
+    def test_astream_reply(self):
+        seen = []
+
+        async def on_token(text):
+            seen.append(text)
+
+        text, stats = asyncio.run(astream_reply(self.model, "User: hello", on_token))
+        self.assertEqual(text, self.model.reply_for("User: hello"))
+        self.assertEqual("".join(seen), text)
+        self.assertEqual(stats.tokens, self.model.reply_tokens)
+
+
+class RunTurnTest(unittest.TestCase):
+    def setUp(self):
+        self.model = StubChatModel(base_latency=0, token_latency=0)
+        self.history = ChatHistory("You are a helpful assistant.")
+
+    def test_history_updated_after_stream_completes(self):
+        watched = WatchedModel(self.model, self.history)
+        reply, stats = run_turn(watched, self.history, "hello", out=io.StringIO())
+
+        self.assertEqual(len(watched.seen), self.model.reply_tokens)
+        for prompt in watched.seen:
+            self.assertTrue(prompt.endswith("\nhello"))
+            self.assertNotIn(reply, prompt)
+        self.assertTrue(self.history.prompt().endswith(f"\nhello\n{reply}"))
+        self.assertEqual(stats.tokens, self.model.reply_tokens)
+
+    def test_failed_stream_rolls_back(self):
+        run_turn(self.model, self.history, "hello", out=io.StringIO())
+        before = self.history.prompt()
+        turns = self.history.turns
+
+        watched = WatchedModel(self.model, self.history, fail_after=3)
+        with self.assertRaises(RuntimeError):
+            run_turn(watched, self.history, "and then?", out=io.StringIO())
+        self.assertEqual(self.history.prompt(), before)
+        self.assertEqual(self.history.turns, turns)
+
+    def test_blocking_turn_has_no_stats(self):
+        out = io.StringIO()
+        reply, stats = run_turn(self.model, self.history, "hello", out=out, stream=False)
+        self.assertIsNone(stats)
+        self.assertEqual(out.getvalue(), reply)
+        self.assertTrue(self.history.prompt().endswith(reply))
+
+
+if __name__ == "__main__":
+    unittest.main()